@@ -0,0 +1,204 @@
+"""
+Benchmarks for InfraBox's own Python overhead, excluding Terraform itself.
+
+Each case is a callable timed by benchmarks.run. Fixtures such as synthetic
+environment trees are built once, outside the timed region.
+"""
+
+import contextlib
+import io
+import ipaddress
+import subprocess  # nosec B404
+import sys
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from cli.utils import INFRA_ROOT
+
+ENVIRONMENT_TREE_SIZES = (10, 1_000, 10_000)
+TEMPLATE_NAMES = ("main.tf.j2", "variables.tf.j2", "outputs.tf.j2", "provider.tf.j2")
+TEMPLATE_CONTEXT = {
+    "name_prefix": "Infrabox",
+    "environment": "dev",
+    "location": "westeurope",
+    "dns_zone_name": "infrabox-dev.com",
+    "admin_username": "azureuser",
+    "ssh_public_key_path": "~/.ssh/id_rsa_infrabox.pub",
+    "vnet_address_space": "10.0.0.0/16",
+    "subnet_address_space": "10.0.1.0/24",
+}
+# Outside 10.0.0.0/8, where the synthetic environments live, so the check
+# passes and walks the whole lookup path
+UNUSED_CIDR = "172.16.0.0/16"
+
+
+class Benchmark:
+    """A named callable, timed `repeat` times after an optional setup."""
+
+    def __init__(self, name, func, setup=None, repeat=5, single_shot=False):
+        self.name = name
+        self.func = func
+        self.setup = setup
+        self.repeat = repeat
+        # Cases too slow to loop are timed one call per repeat
+        self.single_shot = single_shot
+
+
+def quiet(func):
+    """Run func with its console output discarded."""
+
+    def wrapper():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return func()
+
+    return wrapper
+
+
+def cold_import():
+    # subprocess call is safe — no shell is involved and cmd is a fixed list
+    subprocess.run(  # nosec B603
+        [sys.executable, "-c", "import infrabox"], cwd=INFRA_ROOT, check=True
+    )
+
+
+def load_templates_case(tmp_root):
+    """Load every template into a fresh environment, as each new process does."""
+    from cli.infrastructure_templates import build_environment  # noqa: PLC0415
+    from cli.template_cache import TemplateBytecodeCache  # noqa: PLC0415
+
+    bytecode_cache = TemplateBytecodeCache(tmp_root / "template-cache")
+
+    def run():
+        environment = build_environment(bytecode_cache)
+        for name in TEMPLATE_NAMES:
+            environment.get_template(name)
+
+    return Benchmark("load templates (fresh environment)", run)
+
+
+def render_templates_cold(output_dir, cache_dir):
+    """Render every template in a fresh interpreter, as `initialize` does."""
+    script = (
+        "import sys\n"
+        "from pathlib import Path\n"
+        "from cli import template_cache\n"
+        "from cli.infrastructure_templates import render_template\n"
+        "template_cache.TEMPLATE_CACHE_DIR = Path(sys.argv[2])\n"
+        f"context = {TEMPLATE_CONTEXT!r}\n"
+        f"for name in {TEMPLATE_NAMES!r}:\n"
+        "    render_template(name, context, Path(sys.argv[1]) / name[:-3])\n"
+    )
+
+    def run():
+        # subprocess call is safe — no shell is involved and cmd is a fixed list
+        subprocess.run(  # nosec B603
+            [sys.executable, "-c", script, str(output_dir), str(cache_dir)],
+            cwd=INFRA_ROOT,
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+
+    return Benchmark("render templates (cold process)", run, single_shot=True)
+
+
+def build_environment_tree(root, count):
+    """Create `count` environments, each owning its own /24 VNet."""
+    for i in range(count):
+        env_dir = root / f"env{i:05d}"
+        env_dir.mkdir()
+        vnet = ipaddress.IPv4Network((0x0A000000 + (i << 8), 24))
+        (env_dir / "variables.tf").write_text(
+            'variable "vnet_address_space" {\n'
+            "  type    = list(string)\n"
+            f'  default = ["{vnet}"]\n'
+            "}\n"
+        )
+
+
+def parse_arguments_case():
+    from cli.parser import parse_arguments  # noqa: PLC0415
+
+    def run():
+        argv = sys.argv
+        sys.argv = ["infrabox.py", "create", "dev", "stage", "--jobs", "2"]
+        try:
+            return parse_arguments()
+        finally:
+            sys.argv = argv
+
+    return Benchmark("parse_arguments", run)
+
+
+def render_template_cases(output_dir):
+    from cli.infrastructure_templates import render_template  # noqa: PLC0415
+
+    return [
+        Benchmark(
+            f"render_template[{name}]",
+            quiet(
+                lambda name=name: render_template(
+                    name, TEMPLATE_CONTEXT, output_dir / name.removesuffix(".j2")
+                )
+            ),
+        )
+        for name in TEMPLATE_NAMES
+    ]
+
+
+def check_cidr_overlap_cases(tmp_root):
+    from cli.cidr_registry import REGISTRY_FILE_NAME  # noqa: PLC0415
+    from cli.utils import check_cidr_overlap  # noqa: PLC0415
+
+    cases = []
+    for size in ENVIRONMENT_TREE_SIZES:
+        environments_dir = tmp_root / f"environments-{size}"
+        environments_dir.mkdir()
+        build_environment_tree(environments_dir, size)
+
+        def check(environments_dir=environments_dir):
+            check_cidr_overlap(UNUSED_CIDR, "new", environments_dir)
+
+        def drop_registry(environments_dir=environments_dir):
+            (environments_dir / REGISTRY_FILE_NAME).unlink(missing_ok=True)
+
+        cases.append(
+            Benchmark(
+                f"check_cidr_overlap[{size} envs, cold]",
+                quiet(check),
+                setup=drop_registry,
+                repeat=3,
+                single_shot=True,
+            )
+        )
+        cases.append(Benchmark(f"check_cidr_overlap[{size} envs]", quiet(check)))
+    return cases
+
+
+def validate_cidr_case():
+    from cli.utils import validate_cidr  # noqa: PLC0415
+
+    return Benchmark("validate_cidr", lambda: validate_cidr("10.20.0.0/16"))
+
+
+@contextlib.contextmanager
+def benchmark_cases():
+    """Yield every benchmark, with its fixtures alive until the run ends."""
+    from cli import template_cache  # noqa: PLC0415
+
+    with tempfile.TemporaryDirectory(prefix="infrabox-bench-") as tmp:
+        tmp_root = Path(tmp)
+        output_dir = tmp_root / "rendered"
+        output_dir.mkdir()
+        # Keep the rendering benchmarks out of the repository's own cache
+        cache_dir = tmp_root / "template-cache"
+        with mock.patch.object(template_cache, "TEMPLATE_CACHE_DIR", cache_dir):
+            yield [
+                Benchmark("import infrabox (cold)", cold_import, single_shot=True),
+                parse_arguments_case(),
+                *render_template_cases(output_dir),
+                load_templates_case(tmp_root),
+                render_templates_cold(output_dir, cache_dir),
+                *check_cidr_overlap_cases(tmp_root),
+                validate_cidr_case(),
+            ]
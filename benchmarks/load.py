@@ -0,0 +1,288 @@
+"""
+Drive InfraBox commands for many environments at once against a fake
+`terraform` executable and report throughput, latency and peak memory.
+
+    python3 -m benchmarks.load create --envs 50 --jobs 8 --latency 0.2
+    python3 -m benchmarks.load initialize --envs 20 --fail-rate 0.1
+
+The commands run in this process through the real run_cmd path; only the
+Terraform binary is replaced. Environments live in a temporary directory,
+so the repository's own environments/ are never touched.
+"""
+
+import argparse
+import contextlib
+import json
+import math
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+import cli.commands.create as create_cmd
+import cli.commands.destroy as destroy_cmd
+import cli.commands.initialize as initialize_cmd
+from cli import locks, plugin_cache, template_cache, utils
+from cli.parallel import run_for_environments
+from cli.parser import parse_arguments as parse_command_line
+from cli.terraform_utils import PLAN_FAILED
+
+FAKE_TERRAFORM_DIR = Path(__file__).resolve().parent / "fake_terraform"
+COMMANDS = ("create", "destroy", "initialize")
+DEFAULT_CIDR_POOL = "10.0.0.0/8"
+BYTES_PER_MIB = 1024 * 1024
+
+
+class LoadRecorder:
+    """Collects the duration and outcome of every phase, per environment."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.durations = {}
+        self.failed = set()
+
+    def record(self, environment, seconds, ok):
+        with self._lock:
+            self.durations[environment] = self.durations.get(environment, 0) + seconds
+            if not ok:
+                self.failed.add(environment)
+
+    def timed(self, environment, func, succeeded=lambda _result: True):
+        start = time.perf_counter()
+        try:
+            result = func()
+        except BaseException:
+            self.record(environment, time.perf_counter() - start, ok=False)
+            raise
+        self.record(environment, time.perf_counter() - start, succeeded(result))
+        return result
+
+
+def environment_names(count):
+    return [f"load{i:04d}" for i in range(count)]
+
+
+def fake_terraform_environ(args):
+    environ = {
+        "PATH": f"{FAKE_TERRAFORM_DIR}{os.pathsep}{os.environ.get('PATH', '')}",
+        "FAKE_TF_LATENCY": str(args.latency),
+        "FAKE_TF_PLAN_EXIT": str(args.plan_exit),
+        "FAKE_TF_RESOURCES": str(args.resources),
+        "FAKE_TF_FAIL_RATE": str(args.fail_rate),
+    }
+    if args.fail_commands:
+        environ["FAKE_TF_FAIL_COMMANDS"] = args.fail_commands
+    return environ
+
+
+def answer_prompt(prompt):
+    # Accept every default and confirm the rollout
+    return "y" if "Proceed?" in prompt else ""
+
+
+@contextlib.contextmanager
+def sandbox(environments, args):
+    """Point InfraBox at a temporary tree and the fake terraform executable."""
+    with tempfile.TemporaryDirectory(
+        prefix="infrabox-load-"
+    ) as tmp, contextlib.ExitStack() as stack:
+        root = Path(tmp)
+        environments_dir = root / "environments"
+        environments_dir.mkdir()
+        for target, name, value in (
+            (utils, "ENVIRONMENTS_DIR", environments_dir),
+            (utils, "VALID_ENVIRONMENTS", set(environments)),
+            (initialize_cmd, "ENVIRONMENTS_DIR", environments_dir),
+            (locks, "LOCKS_DIR", root / ".infrabox" / "locks"),
+            (
+                template_cache,
+                "TEMPLATE_CACHE_DIR",
+                root / ".infrabox" / "template-cache",
+            ),
+            (plugin_cache, "PLUGIN_CACHE_DIR", root / ".infrabox" / "plugin-cache"),
+            (
+                plugin_cache,
+                "PLUGIN_CACHE_STATS_FILE",
+                root / ".infrabox" / "plugin-cache-stats.json",
+            ),
+        ):
+            stack.enter_context(mock.patch.object(target, name, value))
+        stack.enter_context(mock.patch.dict(os.environ, fake_terraform_environ(args)))
+        stack.enter_context(mock.patch("builtins.input", answer_prompt))
+        yield environments_dir
+
+
+def initialize_args(environment):
+    return SimpleNamespace(
+        environment=environment,
+        dry_run=False,
+        auto_cidr=DEFAULT_CIDR_POOL,
+        prefix_length=24,
+        subnet_prefix_length=26,
+        trace=None,
+    )
+
+
+def run_initialize(environments, args, recorder):
+    def initialize(environment):
+        recorder.timed(
+            environment,
+            lambda: initialize_cmd.run(initialize_args(environment)),
+        )
+
+    _results, errors = run_for_environments(initialize, environments, args.jobs)
+    for environment in errors:
+        recorder.failed.add(environment)
+
+
+def run_rollout(command_module, environments, args, recorder):
+    """Run create or destroy, timing each environment's plan and apply."""
+    plan_environment = command_module.plan_environment
+    terraform_apply = command_module.terraform_apply
+    env_names = {}
+
+    def timed_plan(environment, command_args, parallelism, **kwargs):
+        env_path, plan_file, status = recorder.timed(
+            environment,
+            lambda: plan_environment(environment, command_args, parallelism, **kwargs),
+            lambda plan: plan[2] != PLAN_FAILED,
+        )
+        env_names[env_path] = environment
+        return env_path, plan_file, status
+
+    def timed_apply(env_path, **kwargs):
+        return recorder.timed(
+            env_names[env_path],
+            lambda: terraform_apply(env_path, **kwargs),
+            lambda result: result is None or result.returncode == 0,
+        )
+
+    command_args = parse_command_line([args.command, "--all", "--jobs", str(args.jobs)])
+    # The generated environment names are not valid command line choices
+    command_args.environments = environments
+    command_args.all = False
+    with mock.patch.object(
+        command_module, "plan_environment", timed_plan
+    ), mock.patch.object(
+        command_module, "terraform_apply", timed_apply
+    ), contextlib.suppress(
+        SystemExit
+    ):
+        # Failed environments make a multi-environment rollout exit non-zero
+        command_module.run(command_args)
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[rank - 1]
+
+
+def peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_load(args):
+    environments = environment_names(args.envs)
+    recorder = LoadRecorder()
+    with sandbox(environments, args), open(
+        os.devnull, "w"
+    ) as devnull, contextlib.ExitStack() as stack:
+        if not args.verbose:
+            stack.enter_context(contextlib.redirect_stdout(devnull))
+            stack.enter_context(contextlib.redirect_stderr(devnull))
+
+        if args.command != "initialize":
+            # Environments must exist before they can be created or destroyed
+            run_initialize(environments, args, LoadRecorder())
+
+        start = time.perf_counter()
+        if args.command == "initialize":
+            run_initialize(environments, args, recorder)
+        else:
+            module = create_cmd if args.command == "create" else destroy_cmd
+            run_rollout(module, environments, args, recorder)
+        wall = time.perf_counter() - start
+
+    latencies = list(recorder.durations.values()) or [0.0]
+    return {
+        "command": args.command,
+        "environments": args.envs,
+        "jobs": args.jobs,
+        "wall_seconds": wall,
+        "throughput_per_second": args.envs / wall if wall else 0.0,
+        "p50_seconds": percentile(latencies, 0.50),
+        "p99_seconds": percentile(latencies, 0.99),
+        "failures": len(recorder.failed),
+        "peak_rss_bytes": peak_rss_bytes(),
+    }
+
+
+def print_report(report):
+    print(
+        f"INFRABOX: 📈 Load test: {report['command']}, {report['environments']}"
+        f" environments, {report['jobs']} jobs"
+    )
+    print(f"  Wall time    {report['wall_seconds']:.2f} s")
+    print(f"  Throughput   {report['throughput_per_second']:.2f} environments/s")
+    print(f"  Latency p50  {report['p50_seconds']:.3f} s")
+    print(f"  Latency p99  {report['p99_seconds']:.3f} s")
+    print(f"  Failures     {report['failures']}")
+    print(f"  Peak RSS     {report['peak_rss_bytes'] / BYTES_PER_MIB:.1f} MiB")
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("command", choices=COMMANDS)
+    parser.add_argument("--envs", type=int, default=10, help="Number of environments")
+    parser.add_argument("--jobs", type=int, default=4, help="Concurrent environments")
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Seconds each terraform call takes"
+    )
+    parser.add_argument(
+        "--plan-exit",
+        type=int,
+        choices=(0, 1, 2),
+        default=2,
+        help="Exit code of `plan -detailed-exitcode` (default: 2, changes)",
+    )
+    parser.add_argument(
+        "--resources", type=int, default=20, help="Resources per environment plan"
+    )
+    parser.add_argument(
+        "--fail-rate",
+        type=float,
+        default=0.0,
+        help="Probability that a terraform call fails",
+    )
+    parser.add_argument(
+        "--fail-commands",
+        help="Comma-separated terraform subcommands --fail-rate applies to",
+    )
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument(
+        "--verbose", action="store_true", help="Show InfraBox's own output"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    report = run_load(args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    return 1 if report["failures"] and not args.fail_rate else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
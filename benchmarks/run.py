@@ -0,0 +1,154 @@
+"""
+Run the InfraBox benchmarks and compare them with the stored baseline.
+
+    python3 -m benchmarks.run                     # compare, exit 1 on regression
+    python3 -m benchmarks.run --update-baseline   # record a new baseline
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+import timeit
+from pathlib import Path
+
+from benchmarks.cases import benchmark_cases
+
+BASELINE_FILE = Path(__file__).resolve().parent / "baseline.json"
+# A case regresses when its median exceeds the baseline by more than this
+DEFAULT_TOLERANCE = 0.30
+
+
+def time_benchmark(benchmark):
+    """Return the per-call duration in seconds of each repeat."""
+    if benchmark.single_shot:
+        timings = []
+        for _ in range(benchmark.repeat):
+            if benchmark.setup:
+                benchmark.setup()
+            start = time.perf_counter()
+            benchmark.func()
+            timings.append(time.perf_counter() - start)
+        return timings
+
+    if benchmark.setup:
+        benchmark.setup()
+    timer = timeit.Timer(benchmark.func)
+    number, _ = timer.autorange()
+    return [total / number for total in timer.repeat(benchmark.repeat, number)]
+
+
+def run_benchmarks(selected=None):
+    results = {}
+    with benchmark_cases() as benchmarks:
+        for benchmark in benchmarks:
+            if selected and not any(s in benchmark.name for s in selected):
+                continue
+            timings = time_benchmark(benchmark)
+            results[benchmark.name] = {
+                "median": statistics.median(timings),
+                "min": min(timings),
+            }
+            print(
+                f"  {benchmark.name}: {format_duration(results[benchmark.name]['median'])}"
+            )
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Return (name, median, baseline median, ratio, regressed) rows. Cases
+    missing from the baseline are reported but never regress.
+    """
+    rows = []
+    for name, result in results.items():
+        reference = baseline.get(name, {}).get("median")
+        ratio = result["median"] / reference if reference else None
+        regressed = ratio is not None and ratio > 1 + tolerance
+        rows.append((name, result["median"], reference, ratio, regressed))
+    return rows
+
+
+def format_duration(seconds):
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("µs", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def print_comparison(rows):
+    width = max(len(row[0]) for row in rows)
+    print(f"\n  {'Benchmark'.ljust(width)}  {'Median':>10}  {'Baseline':>10}  Change")
+    for name, median, reference, ratio, regressed in rows:
+        baseline_text = format_duration(reference) if reference else "-"
+        change = f"{(ratio - 1) * 100:+.0f}%" if ratio is not None else "new"
+        flag = "  ❌ regression" if regressed else ""
+        print(
+            f"  {name.ljust(width)}  {format_duration(median):>10}"
+            f"  {baseline_text:>10}  {change}{flag}"
+        )
+
+
+def load_baseline(path):
+    try:
+        return json.loads(Path(path).read_text())["results"]
+    except (OSError, ValueError, KeyError):
+        return {}
+
+
+def save_baseline(path, results):
+    baseline = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    Path(path).write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--baseline", default=BASELINE_FILE, help="Baseline results file"
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Store these results as the new baseline instead of comparing",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help=f"Allowed slowdown before a case fails (default: {DEFAULT_TOLERANCE:.0%})",
+    )
+    parser.add_argument(
+        "-k",
+        dest="selected",
+        action="append",
+        help="Only run benchmarks whose name contains this text (repeatable)",
+    )
+    args = parser.parse_args(argv)
+
+    print("INFRABOX: ⏱️ Running benchmarks...")
+    results = run_benchmarks(args.selected)
+
+    if args.update_baseline:
+        # A partial run only replaces the cases it ran
+        save_baseline(args.baseline, {**load_baseline(args.baseline), **results})
+        print(f"\nINFRABOX: 💾 Baseline written to {args.baseline}")
+        return 0
+
+    rows = compare(results, load_baseline(args.baseline), args.tolerance)
+    print_comparison(rows)
+    regressions = [row[0] for row in rows if row[4]]
+    if regressions:
+        print(f"\nINFRABOX: ❌ {len(regressions)} benchmark(s) regressed.")
+        return 1
+    print("\nINFRABOX: ✅ No regressions against the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
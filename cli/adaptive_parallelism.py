@@ -0,0 +1,92 @@
+import json
+import re
+import threading
+
+from cli.utils import env_state_dir
+
+# Terraform's own default for -parallelism
+DEFAULT_PARALLELISM = 10
+MIN_PARALLELISM = 1
+MAX_PARALLELISM = 64
+PARALLELISM_INCREASE = 2
+PARALLELISM_STATE_FILE = "parallelism.json"
+# Azure Resource Manager throttling as reported by the azurerm provider, in
+# the error forms of its autorest and go-azure-sdk clients and the ARM error
+# codes, so that resource names or attribute values never match
+THROTTLE_PATTERN = re.compile(
+    r"\bStatus(?:Code)?=429\b"
+    r"|\bunexpected status 429\b"
+    r"|\b429 Too Many Requests\b"
+    r"|\bTooManyRequests\b"
+    r"|\b\w*RequestsThrottled\b"
+    r"|\bRequestRateTooLarge\b"
+)
+
+
+class ThrottleCounter:
+    """Counts the output lines of a command that report API throttling."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def __call__(self, line):
+        if THROTTLE_PATTERN.search(line):
+            with self._lock:
+                self.count += 1
+
+
+def remembered_parallelism(env_path, default=None):
+    """
+    Return the parallelism adaptive mode settled on for an environment, or
+    `default` (Terraform's default if None) when there is none yet.
+    """
+    try:
+        state = json.loads(
+            (env_state_dir(env_path) / PARALLELISM_STATE_FILE).read_text()
+        )
+        return int(state["parallelism"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return default or DEFAULT_PARALLELISM
+
+
+def resolve_parallelism(env_path, parallelism=None, adaptive=False):
+    """
+    Return the -parallelism to run Terraform with: the remembered value in
+    adaptive mode, otherwise `parallelism` (None keeps Terraform's default).
+    """
+    if adaptive:
+        parallelism = remembered_parallelism(env_path, parallelism)
+        print(f"INFRABOX: ⚙️ Using adaptive -parallelism={parallelism}.")
+    return parallelism
+
+
+def next_parallelism(current, throttled, succeeded=True):
+    """
+    Halve the parallelism after throttling, raise it slowly after a successful
+    run and otherwise keep it.
+    """
+    if throttled:
+        return max(MIN_PARALLELISM, current // 2)
+    if succeeded:
+        return min(MAX_PARALLELISM, current + PARALLELISM_INCREASE)
+    return current
+
+
+def adapt_parallelism(env_path, current, throttled_lines, succeeded=True):
+    """Remember the parallelism the next run of an environment starts from."""
+    parallelism = next_parallelism(current, throttled_lines > 0, succeeded)
+    if throttled_lines:
+        print(
+            f"INFRABOX: 🐢 Throttling reported {throttled_lines} time(s);"
+            f" next run uses -parallelism={parallelism} (was {current})."
+        )
+    elif parallelism != current:
+        print(
+            f"INFRABOX: 🚀 No throttling; next run uses -parallelism={parallelism}"
+            f" (was {current})."
+        )
+    state_file = env_state_dir(env_path) / PARALLELISM_STATE_FILE
+    state_file.parent.mkdir(parents=True, exist_ok=True)
+    state_file.write_text(json.dumps({"parallelism": parallelism}))
+    return parallelism
@@ -0,0 +1,218 @@
+import asyncio
+import contextlib
+import signal
+import subprocess  # nosec B404
+import sys
+import threading
+from collections import deque
+
+from cli.utils import (
+    COMMAND_LOG_FILE_NAME,
+    OUTPUT_TAIL_LINES,
+    command_logger,
+    env_state_dir,
+    get_client_environ,
+    get_console,
+    get_output_prefix,
+)
+
+# How long a child gets to exit after SIGINT before it is killed
+INTERRUPT_GRACE_SECONDS = 10
+LOCK_POLL_SECONDS = 0.05
+# Longest output line read at once; Terraform can emit very long JSON lines
+STREAM_LIMIT_BYTES = 1024 * 1024
+
+
+class CommandTimeoutError(RuntimeError):
+    """Raised when a command runs longer than its timeout."""
+
+
+def run_sync(coroutine):
+    """Run a coroutine to completion on a fresh event loop."""
+    return asyncio.run(coroutine)
+
+
+async def _read_chunk(stream):
+    """
+    Read the next line of a stream, or the part of it that fits in its buffer
+    when the line is longer than STREAM_LIMIT_BYTES.
+    """
+    try:
+        return await stream.readuntil(b"\n")
+    except asyncio.IncompleteReadError as e:
+        return e.partial
+    except asyncio.LimitOverrunError as e:
+        return await stream.read(e.consumed or STREAM_LIMIT_BYTES)
+
+
+async def _pump(stream, name, echo, logger, tail, *, on_line=None):  # noqa: PLR0913
+    """Echo, log and keep the tail of a child's output stream, line by line."""
+    while True:
+        raw = await _read_chunk(stream)
+        if not raw:
+            return
+        line = raw.decode(errors="replace")
+        echo.write(line)
+        echo.flush()
+        logger.info("[%s] %s", name, line.rstrip("\n"))
+        tail.append(line)
+        if on_line is not None:
+            on_line(line)
+
+
+async def _copy(stream, sink):
+    """Copy a child's output stream to a binary file as is, unechoed and unlogged."""
+    while True:
+        chunk = await stream.read(STREAM_LIMIT_BYTES)
+        if not chunk:
+            return
+        sink.write(chunk)
+
+
+async def _interrupt(process):
+    """Ask the child to stop gracefully with SIGINT, then kill it."""
+    if process.returncode is not None:
+        return
+    with contextlib.suppress(ProcessLookupError):
+        process.send_signal(signal.SIGINT)
+    try:
+        await asyncio.wait_for(process.wait(), INTERRUPT_GRACE_SECONDS)
+    except asyncio.TimeoutError:  # noqa: UP041 - distinct from TimeoutError on 3.9
+        with contextlib.suppress(ProcessLookupError):
+            process.kill()
+        await process.wait()
+
+
+def _forwards_sigint():
+    """Signal handlers can only be installed from the main thread."""
+    return threading.current_thread() is threading.main_thread()
+
+
+@contextlib.contextmanager
+def _forward_sigint(process):
+    """
+    While the child runs, deliver Ctrl+C to it instead of raising
+    KeyboardInterrupt, so Terraform can stop cleanly and release its state.
+    The child must run in its own session, out of the terminal's foreground
+    process group: Terraform exits at once, without releasing its state lock,
+    on a second interrupt, so it must not get the terminal's SIGINT as well.
+    A daemon client's Ctrl+C arrives through its console instead.
+    """
+    console = get_console()
+    if console is not None:
+        with console.forward_interrupt(process):
+            yield
+        return
+    loop = asyncio.get_running_loop()
+    if not _forwards_sigint():
+        yield
+        return
+    loop.add_signal_handler(signal.SIGINT, process.send_signal, signal.SIGINT)
+    try:
+        yield
+    finally:
+        loop.remove_signal_handler(signal.SIGINT)
+
+
+async def run_cmd_async(  # noqa: PLR0913
+    cmd,
+    cwd,
+    dry_run=False,
+    capture_output=True,
+    env=None,
+    *,
+    timeout=None,
+    on_line=None,
+    stdout=None,
+):
+    """
+    Run a command in a specified directory on the event loop.
+
+    With capture_output the output is streamed live, teed to a rotating log
+    file and the returned CompletedProcess holds its last lines. Otherwise the
+    command writes straight to the terminal. The child is interrupted when the
+    call is cancelled or exceeds `timeout` seconds (CommandTimeoutError).
+    With `on_line`, the output is streamed and every line is passed to it.
+    With `stdout`, a binary file, the standard output is written to it instead
+    of being echoed, logged or kept, as it is data such as JSON that may hold
+    sensitive values; the messages about the command then go to stderr.
+    """
+    messages = sys.stdout if stdout is None else sys.stderr
+    print(f"\nINFRABOX: 📦 Running command: {' '.join(cmd)} in {cwd}", file=messages)
+    if dry_run:
+        print("INFRABOX: 🔍 Dry-run mode: command not executed.", file=messages)
+        return None
+
+    # Output written straight to the terminal would bypass the per-thread
+    # prefix and a daemon client's console, so stream it through Python.
+    stream = (
+        capture_output
+        or on_line is not None
+        or stdout is not None
+        or get_output_prefix() is not None
+        or get_console() is not None
+    )
+    pipe = asyncio.subprocess.PIPE if stream else None
+    if env is None:
+        env = get_client_environ()
+
+    # subprocess call is safe — no shell is involved and cmd is a validated list
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        cwd=cwd,
+        env=env,
+        stdout=pipe,
+        stderr=pipe,
+        limit=STREAM_LIMIT_BYTES,
+        start_new_session=_forwards_sigint(),
+    )
+
+    stdout_tail = deque(maxlen=OUTPUT_TAIL_LINES)
+    stderr_tail = deque(maxlen=OUTPUT_TAIL_LINES)
+    waiters = [process.wait()]
+    if stream:
+        logger = command_logger(env_state_dir(cwd) / COMMAND_LOG_FILE_NAME)
+        logger.info("$ %s (in %s)", " ".join(cmd), cwd)
+        waiters += [
+            (
+                _pump(
+                    process.stdout,
+                    "stdout",
+                    sys.stdout,
+                    logger,
+                    stdout_tail,
+                    on_line=on_line,
+                )
+                if stdout is None
+                else _copy(process.stdout, stdout)
+            ),
+            _pump(
+                process.stderr,
+                "stderr",
+                sys.stderr,
+                logger,
+                stderr_tail,
+                on_line=on_line,
+            ),
+        ]
+
+    with _forward_sigint(process):
+        try:
+            await asyncio.wait_for(asyncio.gather(*waiters), timeout)
+        except asyncio.TimeoutError:  # noqa: UP041 - distinct from TimeoutError on 3.9
+            raise CommandTimeoutError(
+                f"Command '{' '.join(cmd)}' timed out after {timeout} seconds"
+            ) from None
+        finally:
+            # A no-op once the child has exited; otherwise stop it whatever
+            # went wrong: a timeout, a cancellation or a failed pump
+            await _interrupt(process)
+
+    if stream:
+        logger.info("exit code %s", process.returncode)
+    return subprocess.CompletedProcess(
+        cmd,
+        process.returncode,
+        stdout="".join(stdout_tail) if stream else None,
+        stderr="".join(stderr_tail) if stream else None,
+    )
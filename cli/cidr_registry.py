@@ -0,0 +1,214 @@
+import bisect
+import ipaddress
+import json
+import os
+import re
+import threading
+from pathlib import Path
+
+REGISTRY_FILE_NAME = ".cidr_registry.json"
+REGISTRY_VERSION = 1
+CIDR_SOURCE_FILES = ("variables.tf", "main.tf")
+MAX_PREFIX_LENGTH = 32
+
+# `variable "vnet_address_space" { ... default = ["10.0.0.0/16"] }`
+VARIABLE_DEFAULT_PATTERN = re.compile(
+    r'variable\s+"(?:vnet|subnet)_address_space"\s*\{[^}]*?default\s*=\s*\[([^\]]*)\]',
+    re.DOTALL,
+)
+# `vnet_address_space = ["10.0.0.0/16"]` or `vnet_cidr = "10.0.0.0/16"`
+ASSIGNMENT_PATTERN = re.compile(
+    r"\b(?:vnet_cidr|subnet_cidr|vnet_address_space|subnet_address_prefixes)"
+    r'\s*=\s*(\[[^\]]*\]|"[^"]*")'
+)
+QUOTED_PATTERN = re.compile(r'"([^"]+)"')
+
+
+def extract_cidrs(content):
+    """Return the literal IPv4 CIDRs assigned to VNets and subnets in a .tf file."""
+    cidrs = []
+    matches = VARIABLE_DEFAULT_PATTERN.findall(content)
+    matches += ASSIGNMENT_PATTERN.findall(content)
+    for match in matches:
+        for value in QUOTED_PATTERN.findall(match):
+            try:
+                cidrs.append(str(ipaddress.IPv4Network(value, strict=True)))
+            except ValueError:
+                continue
+    return list(dict.fromkeys(cidrs))
+
+
+def network_range(cidr):
+    """Return the first and last address of a CIDR as integers."""
+    network = ipaddress.IPv4Network(cidr, strict=True)
+    return int(network.network_address), int(network.broadcast_address)
+
+
+class CidrRegistry:
+    """
+    A persistent index of the CIDRs allocated by every environment.
+
+    The manifest records, per environment, the mtimes of the files the CIDRs
+    were read from, so only environments whose files changed are re-read. All
+    allocations are kept in an interval index sorted by network address with
+    a running maximum of range ends, which makes overlap lookups logarithmic.
+    """
+
+    def __init__(self, environments_dir):
+        self.environments_dir = Path(environments_dir)
+        self.manifest_path = self.environments_dir / REGISTRY_FILE_NAME
+        self.environments = {}
+        self.index = []
+        self._starts = []
+        self._max_ends = []
+
+    @classmethod
+    def load(cls, environments_dir):
+        registry = cls(environments_dir)
+        registry.environments = registry._read_manifest()
+        if registry.refresh():
+            registry.save()
+        return registry
+
+    def _read_manifest(self):
+        try:
+            manifest = json.loads(self.manifest_path.read_text())
+        except (OSError, ValueError):
+            return {}
+        if manifest.get("version") != REGISTRY_VERSION:
+            return {}
+        self.index = [tuple(entry) for entry in manifest.get("index", [])]
+        self._build_lookup_arrays()
+        return manifest.get("environments", {})
+
+    def _source_mtimes(self, env_dir):
+        mtimes = {}
+        for name in CIDR_SOURCE_FILES:
+            try:
+                mtimes[name] = (env_dir / name).stat().st_mtime_ns
+            except OSError:
+                continue
+        return mtimes
+
+    def refresh(self):
+        """
+        Re-read the environments whose files changed since the manifest was
+        written. Returns True when anything changed.
+        """
+        seen, changed = set(), False
+        for env_dir in self.environments_dir.iterdir():
+            if not env_dir.is_dir() or env_dir.name.startswith("."):
+                continue
+            seen.add(env_dir.name)
+            mtimes = self._source_mtimes(env_dir)
+            entry = self.environments.get(env_dir.name)
+            if entry is not None and entry["mtimes"] == mtimes:
+                continue
+            cidrs = []
+            for name in mtimes:
+                cidrs.extend(extract_cidrs((env_dir / name).read_text()))
+            self.environments[env_dir.name] = {
+                "mtimes": mtimes,
+                "cidrs": list(dict.fromkeys(cidrs)),
+            }
+            changed = True
+
+        for name in set(self.environments) - seen:
+            del self.environments[name]
+            changed = True
+
+        if changed:
+            self._rebuild_index()
+        return changed
+
+    def reserve(self, environment, cidrs):
+        """
+        Record the CIDRs of an environment in memory only, so later lookups
+        and allocations see them before its files are written.
+        """
+        env_dir = self.environments_dir / environment
+        self.environments[environment] = {
+            "mtimes": self._source_mtimes(env_dir),
+            "cidrs": [str(ipaddress.IPv4Network(c, strict=True)) for c in cidrs],
+        }
+        self._rebuild_index()
+
+    def register(self, environment, cidrs):
+        """Record the CIDRs of a newly initialized environment and persist them."""
+        self.reserve(environment, cidrs)
+        self.save()
+
+    def _rebuild_index(self):
+        self.index = sorted(
+            (*network_range(cidr), name, cidr)
+            for name, entry in self.environments.items()
+            for cidr in entry["cidrs"]
+        )
+        self._build_lookup_arrays()
+
+    def _build_lookup_arrays(self):
+        self._starts = [start for start, _end, _env, _cidr in self.index]
+        self._max_ends, running = [], -1
+        for _start, end, _env, _cidr in self.index:
+            running = max(running, end)
+            self._max_ends.append(running)
+
+    def save(self):
+        manifest = {
+            "version": REGISTRY_VERSION,
+            "environments": self.environments,
+            "index": self.index,
+        }
+        tmp_path = self.manifest_path.with_suffix(
+            f".{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+        tmp_path.write_text(json.dumps(manifest))
+        os.replace(tmp_path, self.manifest_path)
+
+    def find_overlap(self, cidr, exclude_env=None):
+        """
+        Return (environment, cidr) of an allocation overlapping `cidr`, or None.
+
+        Only entries starting at or before the end of `cidr` can overlap, and
+        of those only ones whose running maximum end reaches its start, so the
+        scan stops as soon as no earlier entry can reach the new range.
+        """
+        start, end = network_range(cidr)
+        i = bisect.bisect_right(self._starts, end) - 1
+        while i >= 0 and self._max_ends[i] >= start:
+            _start, entry_end, env, entry_cidr = self.index[i]
+            if entry_end >= start and env != exclude_env:
+                return env, entry_cidr
+            i -= 1
+        return None
+
+    def allocate(self, pool, prefix_length, exclude_env=None):
+        """
+        Return the first free, aligned block of `prefix_length` inside `pool`.
+
+        Allocations are walked as sorted integer ranges, merging overlapping
+        ones on the fly, and the candidate jumps past each occupied range to
+        the next aligned boundary. Ranges ending before the pool are skipped
+        with a binary search on the running maximum of range ends.
+        """
+        pool = ipaddress.IPv4Network(pool, strict=True)
+        if not pool.prefixlen <= prefix_length <= MAX_PREFIX_LENGTH:
+            raise ValueError(
+                f"Prefix length /{prefix_length} does not fit in pool {pool}"
+            )
+        size = 1 << (MAX_PREFIX_LENGTH - prefix_length)
+        candidate = int(pool.network_address)
+        pool_end = int(pool.broadcast_address)
+
+        i = bisect.bisect_left(self._max_ends, candidate)
+        for start, end, env, _cidr in self.index[i:]:
+            if start > candidate + size - 1 or start > pool_end:
+                break
+            if env == exclude_env or end < candidate:
+                continue
+            # Round up to the next multiple of the block size
+            candidate = -(-(end + 1) // size) * size
+
+        if candidate + size - 1 > pool_end:
+            raise ValueError(f"No free /{prefix_length} block left in pool {pool}")
+        return str(ipaddress.IPv4Network((candidate, prefix_length)))
@@ -0,0 +1,69 @@
+from cli.locks import environment_locks
+from cli.plugin_cache import cache_stats, prune_cache
+from cli.terraform_utils import terraform_init_if_needed
+from cli.utils import ENVIRONMENTS_DIR
+
+BYTES_PER_UNIT = 1024
+
+
+def format_size(size_bytes):
+    size = float(size_bytes)
+    for unit in ("B", "KB", "MB"):
+        if size < BYTES_PER_UNIT:
+            return f"{size:.1f} {unit}"
+        size /= BYTES_PER_UNIT
+    return f"{size:.1f} GB"
+
+
+def warm(dry_run=False):
+    """
+    Install every environment's locked providers into the shared cache by
+    initializing it, as create would, so its next run can skip init.
+    """
+    for env_dir in sorted(ENVIRONMENTS_DIR.iterdir()):
+        if not env_dir.is_dir() or not any(env_dir.glob("*.tf")):
+            continue
+        print(f"INFRABOX: 🔥 Warming provider cache for environment '{env_dir.name}'")
+        with environment_locks([env_dir.name], purpose=f"cache warm {env_dir.name}"):
+            terraform_init_if_needed(env_dir, dry_run=dry_run)
+
+
+def stats():
+    summary = cache_stats()
+    hit_rate = summary["hit_rate"]
+    print(f"INFRABOX: 📦 Plugin cache: {summary['path']}")
+    print(f"INFRABOX: 💾 Size: {format_size(summary['size_bytes'])}")
+    print(f"INFRABOX: 🧩 Cached provider versions: {len(summary['providers'])}")
+    for address, version in summary["providers"]:
+        print(f"  - {address} {version}")
+    print(
+        f"INFRABOX: 🎯 Hit rate: "
+        f"{'n/a' if hit_rate is None else f'{hit_rate:.0%}'}"
+        f" ({summary['hits']} hits, {summary['misses']} misses)"
+    )
+
+
+def prune(dry_run=False):
+    evicted, freed = prune_cache(ENVIRONMENTS_DIR, dry_run=dry_run)
+    if not evicted:
+        print("INFRABOX: ✅ No unreferenced provider versions in the plugin cache.")
+        return
+
+    for address, version in evicted:
+        print(f"INFRABOX: 🧹 Evicting {address} {version}")
+    if dry_run:
+        print(
+            f"INFRABOX: 🔍 Dry-run mode: {format_size(freed)} would be freed,"
+            " nothing was removed."
+        )
+    else:
+        print(f"INFRABOX: ✅ Freed {format_size(freed)} from the plugin cache.")
+
+
+def run(args):
+    if args.action == "warm":
+        warm(dry_run=args.dry_run)
+    elif args.action == "stats":
+        stats()
+    elif args.action == "prune":
+        prune(dry_run=args.dry_run)
@@ -1,20 +1,26 @@
-from cli.terraform_utils import (
-    terraform_apply,
-    terraform_init,
-    terraform_state_has_changes,
-    terraform_validate,
-)
-from cli.utils import get_env_path, prompt_user_confirmation
+from cli.locks import environment_run_locks
+from cli.parallel import resolve_environments
+from cli.rollout import plan_environment, rollout
+from cli.terraform_utils import terraform_apply
 
 
 def run(args):
-    env_path = get_env_path(args.environment)
-
-    terraform_init(env_path, dry_run=args.dry_run)
-    terraform_validate(env_path, dry_run=args.dry_run)
-
-    if (
-        terraform_state_has_changes(env_path, destroy=True, dry_run=args.dry_run)
-        and prompt_user_confirmation()
-    ):
-        terraform_apply(env_path, destroy=True, dry_run=args.dry_run)
+    environments = resolve_environments(args)
+    # Resolved once while planning, so that the apply reuses the same value
+    parallelism = {}
+    with environment_run_locks(environments, args, "destroy"):
+        rollout(
+            environments,
+            lambda environment: plan_environment(
+                environment, args, parallelism, destroy=True
+            ),
+            lambda env_path, plan_file: terraform_apply(
+                env_path,
+                destroy=True,
+                dry_run=args.dry_run,
+                plan_file=plan_file,
+                parallelism=parallelism[env_path],
+                adaptive_parallelism=args.adaptive_parallelism,
+            ),
+            args,
+        )
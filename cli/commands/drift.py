@@ -0,0 +1,206 @@
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+from cli.async_engine import CommandTimeoutError
+from cli.commands.status import format_age
+from cli.locks import LockBusyError, file_lock
+from cli.parallel import resolve_environments, run_for_environments
+from cli.terraform_utils import (
+    TERRAFORM_CHANGES_DETECTED_CODE,
+    TERRAFORM_NO_CHANGES_DETECTED_CODE,
+    terraform_init_if_needed,
+    terraform_plan,
+)
+from cli.tracing import span
+from cli.utils import INFRABOX_STATE_DIR, get_env_path
+
+DRIFT_CACHE_FILE = INFRABOX_STATE_DIR / "drift.json"
+DRIFT_NONE = "no drift"
+DRIFT_DETECTED = "drift"
+DRIFT_FAILED = "failed"
+DRIFT_TIMED_OUT = "timed out"
+DRIFT_BUSY = "busy"
+DRIFT_LABELS = {
+    DRIFT_NONE: "✅ no drift",
+    DRIFT_DETECTED: "⚠️ drift detected",
+    DRIFT_FAILED: "❌ check failed",
+    DRIFT_TIMED_OUT: "⏱️ timed out",
+    DRIFT_BUSY: "🔒 skipped, another run holds it",
+}
+# Checks in --watch mode are spread over this fraction of the interval
+WATCH_JITTER = 0.1
+
+_cache_lock = threading.Lock()
+
+
+def load_drift_cache(cache_file=None):
+    """Return the last drift check result of every environment."""
+    try:
+        cache = json.loads((cache_file or DRIFT_CACHE_FILE).read_text())
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def record_drift_results(results, cache_file=None):
+    """Merge check results into the drift cache, replacing it atomically."""
+    cache_file = cache_file or DRIFT_CACHE_FILE
+    with _cache_lock:
+        cache = load_drift_cache(cache_file)
+        cache.update(results)
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = cache_file.with_name(
+            f".{cache_file.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+        tmp_file.write_text(json.dumps(cache, indent=2, sort_keys=True))
+        os.replace(tmp_file, cache_file)
+    return cache
+
+
+def check_drift(environment, timeout=None):
+    """
+    Run a refresh-only plan of one environment to see whether its real
+    infrastructure drifted from its state. Environments another InfraBox run
+    holds are skipped rather than waited for. The init and the plan share the
+    `timeout` deadline.
+    """
+    started = time.time()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    status, detail = DRIFT_FAILED, None
+    try:
+        with file_lock(environment, wait=False, purpose=f"drift {environment}"):
+            env_path = get_env_path(environment)
+            with span("terraform init", environment):
+                terraform_init_if_needed(env_path, timeout=timeout)
+            if deadline is not None:
+                timeout = max(0, deadline - time.monotonic())
+            with span("terraform plan", environment):
+                result = terraform_plan(env_path, timeout=timeout, refresh_only=True)
+        if result.returncode == TERRAFORM_NO_CHANGES_DETECTED_CODE:
+            status = DRIFT_NONE
+        elif result.returncode == TERRAFORM_CHANGES_DETECTED_CODE:
+            status = DRIFT_DETECTED
+        else:
+            detail = f"terraform plan exited with code {result.returncode}"
+    except LockBusyError as e:
+        status, detail = DRIFT_BUSY, str(e)
+    except CommandTimeoutError as e:
+        status, detail = DRIFT_TIMED_OUT, str(e)
+    except SystemExit as e:
+        detail = f"exit code {e.code}"
+    except Exception as e:  # noqa: BLE001
+        detail = str(e)
+
+    return {
+        "status": status,
+        "checked_at": started,
+        "duration": round(time.time() - started, 1),
+        "detail": detail,
+    }
+
+
+def check_environments(environments, jobs, timeout):
+    """Check several environments at once, at most `jobs` at a time."""
+    results, errors = run_for_environments(
+        lambda environment: check_drift(environment, timeout), environments, jobs
+    )
+    for environment, error in errors.items():
+        results[environment] = {
+            "status": DRIFT_FAILED,
+            "checked_at": time.time(),
+            "duration": None,
+            "detail": str(error),
+        }
+    return record_drift_results(results)
+
+
+def print_drift_table(environments, cache, now=None):
+    now = now or time.time()
+    print("\nINFRABOX: 🌊 Drift summary:")
+    width = max(len(environment) for environment in environments)
+    for environment in environments:
+        result = cache.get(environment)
+        if result is None:
+            print(f"  {environment.ljust(width)}  ⚪ never checked")
+            continue
+        line = (
+            f"  {environment.ljust(width)}"
+            f"  {DRIFT_LABELS.get(result['status'], result['status'])}"
+            f"  checked {format_age(now - result['checked_at'])}"
+        )
+        if result.get("duration") is not None:
+            line += f" in {result['duration']:.0f}s"
+        if result.get("detail") and result["status"] != DRIFT_BUSY:
+            line += f"  ({result['detail']})"
+        print(line)
+
+
+def drift_exit_code(environments, cache):
+    """1 if any check did not complete, 2 if any environment drifted, else 0."""
+    statuses = {
+        cache.get(environment, {}).get("status") for environment in environments
+    }
+    if statuses & {DRIFT_FAILED, DRIFT_TIMED_OUT}:
+        return 1
+    if DRIFT_DETECTED in statuses:
+        return 2
+    return 0
+
+
+def next_check(interval, now):
+    """When to check an environment next: one interval away, with jitter."""
+    return now + interval * random.uniform(
+        1 - WATCH_JITTER, 1 + WATCH_JITTER
+    )  # nosec B311
+
+
+def watch(environments, args):
+    """
+    Re-check every environment each interval. Each environment keeps its own
+    jittered schedule, so checks, and their provider API calls, are spread
+    out instead of all starting together.
+    """
+    now = time.time()
+    due = {
+        environment: now + args.watch * random.uniform(0, WATCH_JITTER)  # nosec B311
+        for environment in environments
+    }
+    print(
+        f"INFRABOX: 👀 Checking {len(environments)} environments for drift"
+        f" about every {args.watch:.0f}s (Ctrl+C to stop)"
+    )
+    try:
+        while True:
+            time.sleep(max(0.0, min(due.values()) - time.time()))
+            now = time.time()
+            batch = sorted(env for env, when in due.items() if when <= now)
+            cache = check_environments(batch, args.jobs, args.timeout)
+            for environment in batch:
+                due[environment] = next_check(args.watch, time.time())
+            print_drift_table(environments, cache)
+    except KeyboardInterrupt:
+        print("\nINFRABOX: 👋 Stopped watching for drift.")
+
+
+def run(args):
+    environments = resolve_environments(args)
+    if not environments:
+        print("INFRABOX: ⚠️ No initialized environments found.")
+        return
+
+    if args.cached:
+        print_drift_table(environments, load_drift_cache())
+        return
+    if args.watch:
+        watch(environments, args)
+        return
+
+    cache = check_environments(environments, args.jobs, args.timeout)
+    print_drift_table(environments, cache)
+    code = drift_exit_code(environments, cache)
+    if code:
+        sys.exit(code)
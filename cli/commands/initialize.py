@@ -1,33 +1,38 @@
+import contextlib
 import shutil
+import sys
 
+from cli.env_spec import load_environment_specs, read_spec
 from cli.infrastructure_templates import (
     generate_main_tf,
     generate_outputs_tf,
     generate_provider_tf,
     generate_variables_tf,
+    save_render_manifest,
 )
-from cli.terraform_utils import terraform_init, terraform_validate
+from cli.locks import LockBusyError, cidr_reservation_lock, environment_run_locks
+from cli.parallel import (
+    describe_error,
+    print_environment_report,
+    run_for_environments,
+)
+from cli.terraform_utils import terraform_init_if_needed, terraform_validate
+from cli.tracing import span
 from cli.utils import (
     ENVIRONMENTS_DIR,
+    VALID_ENVIRONMENTS,
+    allocate_environment_cidrs,
     check_cidr_overlap,
     prompt_with_default,
+    register_environment_cidrs,
     sanitize_input,
     validate_cidr,
 )
 
 
-def run(args):
-    environment = sanitize_input(args.environment.lower())
-    env_path = ENVIRONMENTS_DIR / environment
-
-    if env_path.exists():
-        print(
-            f"INFRABOX: ⚠️ Environment files for environment '{environment}' already exist. Aborting."
-        )
-        return
-
-    try:
-        # Prompt user for core environment values
+def prompt_environment_values(environment):
+    """Prompt for the core values of a new environment."""
+    with span("prompts", environment):
         name_prefix = prompt_with_default("Enter name prefix", "Infrabox")
         location = prompt_with_default("Enter Azure location", "westeurope")
         dns_zone_name = prompt_with_default(
@@ -37,63 +42,281 @@ def run(args):
         ssh_public_key_path = prompt_with_default(
             "Enter path to SSH public key", "~/.ssh/id_rsa_infrabox.pub"
         )
+    return {
+        "name_prefix": name_prefix,
+        "environment": environment,
+        "location": location,
+        "dns_zone_name": dns_zone_name,
+        "admin_username": admin_username,
+        "ssh_public_key_path": ssh_public_key_path,
+    }
+
 
+def prompt_cidrs(environment):
+    with span("prompts", environment):
         vnet_cidr = validate_cidr(prompt_with_default("Enter VNet CIDR", "10.0.0.0/16"))
         subnet_cidr = validate_cidr(
             prompt_with_default("Enter Subnet CIDR", "10.0.1.0/24")
         )
+    return vnet_cidr, subnet_cidr
+
 
-        # CIDR overlap checks
+def select_cidrs(args, environment, prompted_cidrs=None):
+    """
+    Allocate the VNet and subnet CIDRs from a pool, or check the prompted
+    ones for overlaps. Returns None if no usable CIDRs were found.
+    """
+    if args.auto_cidr:
         try:
-            check_cidr_overlap(vnet_cidr, environment, ENVIRONMENTS_DIR)
-            check_cidr_overlap(subnet_cidr, environment, ENVIRONMENTS_DIR)
+            with span("cidr allocation", environment):
+                vnet_cidr, subnet_cidr = allocate_environment_cidrs(
+                    validate_cidr(args.auto_cidr),
+                    args.prefix_length,
+                    args.subnet_prefix_length,
+                    environment,
+                    ENVIRONMENTS_DIR,
+                )
         except ValueError as e:
             print(f"INFRABOX: ❌ {e}")
-            return
+            return None
+        print(
+            f"INFRABOX: 🧮 Allocated VNet {vnet_cidr} and subnet {subnet_cidr} from pool {args.auto_cidr}"
+        )
+        return vnet_cidr, subnet_cidr
 
-        if not args.dry_run:
-            env_path.mkdir(parents=True)
-            print(f"INFRABOX: 📁 Created environment directory at {env_path}")
-
-        # Prepare context for rendering templates
-        context = {
-            "name_prefix": name_prefix,
-            "environment": environment,
-            "location": location,
-            "dns_zone_name": dns_zone_name,
-            "admin_username": admin_username,
-            "ssh_public_key_path": ssh_public_key_path,
-            "vnet_address_space": vnet_cidr,
-            "subnet_address_space": subnet_cidr,
-        }
-
-        # Render all Terraform files using jinja2 templates
-        generate_variables_tf(env_path, context, dry_run=args.dry_run)
-        generate_main_tf(env_path, context, dry_run=args.dry_run)
-        generate_outputs_tf(env_path, context, dry_run=args.dry_run)
-        generate_provider_tf(env_path, context, dry_run=args.dry_run)
+    vnet_cidr, subnet_cidr = prompted_cidrs
+
+    # CIDR overlap checks
+    try:
+        with span("cidr overlap check", environment):
+            check_cidr_overlap(vnet_cidr, environment, ENVIRONMENTS_DIR)
+            check_cidr_overlap(subnet_cidr, environment, ENVIRONMENTS_DIR)
+    except ValueError as e:
+        print(f"INFRABOX: ❌ {e}")
+        return None
+    return vnet_cidr, subnet_cidr
+
+
+def reserve_cidrs(args, purpose):
+    """
+    Hold the CIDR reservation lock until the new environments' files, which
+    claim their CIDRs, are written.
+    """
+    return cidr_reservation_lock(wait=getattr(args, "wait", True), purpose=purpose)
+
+
+def render_environment_files(environment, env_path, context, dry_run):
+    with span("render templates", environment):
+        generate_variables_tf(env_path, context, dry_run=dry_run)
+        generate_main_tf(env_path, context, dry_run=dry_run)
+        generate_outputs_tf(env_path, context, dry_run=dry_run)
+        generate_provider_tf(env_path, context, dry_run=dry_run)
+        if not dry_run:
+            save_render_manifest(env_path, context)
+
+
+def remove_environment(env_path):
+    if env_path.exists():
+        shutil.rmtree(env_path)
+        print(f"INFRABOX: 🧹 Removed environment directory {env_path} due to error.")
+
+
+def init_and_validate(environment, dry_run):
+    """
+    Run terraform init and validate for a rendered environment. Returns the
+    error that stopped it, or None.
+    """
+    env_path = ENVIRONMENTS_DIR / environment
+    try:
+        for phase, func in (
+            ("terraform init", terraform_init_if_needed),
+            ("terraform validate", terraform_validate),
+        ):
+            with span(phase, environment):
+                result = func(env_path, dry_run=dry_run)
+            if result is not None and result.returncode != 0:
+                return f"{phase} failed (exit code {result.returncode})"
+    except Exception as e:  # noqa: BLE001
+        return str(e)
+    return None
+
+
+@contextlib.contextmanager
+def exit_on_spec_error(spec_file):
+    try:
+        yield
+    except OSError as e:
+        print(f"INFRABOX: ❌ Could not read spec {spec_file}: {e}")
+        sys.exit(1)
+    except ValueError as e:
+        print(f"INFRABOX: ❌ Invalid spec {spec_file}:")
+        for problem in getattr(e, "problems", [str(e)]):
+            print(f"  - {problem}")
+        sys.exit(1)
+
+
+def spec_environments(args):
+    """Return the supported environments a spec file names, to lock them."""
+    with exit_on_spec_error(args.spec):
+        _, environments = read_spec(args.spec)
+    return [name for name in environments if name in VALID_ENVIRONMENTS]
+
+
+def load_spec_or_exit(args):
+    with exit_on_spec_error(args.spec), span("cidr overlap check"):
+        contexts = load_environment_specs(
+            args.spec,
+            ENVIRONMENTS_DIR,
+            args.auto_cidr,
+            args.prefix_length,
+            args.subnet_prefix_length,
+        )
+    print(f"INFRABOX: 🧮 Validated {len(contexts)} environments from {args.spec}")
+    return contexts
+
+
+def spec_environment_status(environment, context, results, errors, dry_run):
+    """
+    Register the CIDRs of an initialized environment, or roll back a failed
+    one. Returns its status line and whether it succeeded.
+    """
+    if environment in errors:
+        error = describe_error(errors[environment])
+    elif results[environment] is not None:
+        error = f"❌ {results[environment]}"
+    else:
+        if not dry_run:
+            register_environment_cidrs(
+                environment,
+                [context["vnet_address_space"], context["subnet_address_space"]],
+                ENVIRONMENTS_DIR,
+            )
+        return "✅ initialized", True
+
+    if not dry_run:
+        remove_environment(ENVIRONMENTS_DIR / environment)
+    return f"{error} (rolled back)", False
+
+
+def run_spec(args):
+    """
+    Initialize every environment of a spec file without prompting: validate
+    all of them up front, render them, then init and validate them in
+    parallel, rolling back the ones that fail.
+    """
+    environments = spec_environments(args)
+    with environment_run_locks(environments, args, "initialize"):
+        initialize_spec(args)
+
+
+def initialize_spec(args):
+    rendered = []
+    try:
+        with reserve_cidrs(args, f"initialize --spec {args.spec}"):
+            contexts = load_spec_or_exit(args)
+            for environment, context in contexts.items():
+                env_path = ENVIRONMENTS_DIR / environment
+                if not args.dry_run:
+                    env_path.mkdir(parents=True)
+                    rendered.append(env_path)
+                render_environment_files(environment, env_path, context, args.dry_run)
+
+        results, errors = run_for_environments(
+            lambda environment: init_and_validate(environment, args.dry_run),
+            list(contexts),
+            args.jobs,
+        )
+    except LockBusyError:
+        raise
+    except KeyboardInterrupt:
+        print("\nINFRABOX: ⚠️ Initialization interrupted by user.")
+        for env_path in rendered:
+            remove_environment(env_path)
+        return
+    except Exception as e:
+        print(f"INFRABOX: ❌ Unexpected error: {e}")
+        for env_path in rendered:
+            remove_environment(env_path)
+        raise
+
+    statuses, failed = {}, False
+    for environment, context in contexts.items():
+        statuses[environment], ok = spec_environment_status(
+            environment, context, results, errors, args.dry_run
+        )
+        failed = failed or not ok
+
+    print_environment_report(statuses)
+    if failed:
+        sys.exit(1)
+
+
+def run(args):
+    if getattr(args, "spec", None):
+        run_spec(args)
+        return
+
+    environment = sanitize_input(args.environment.lower())
+    with environment_run_locks([environment], args, "initialize"):
+        initialize_environment(environment, args)
+
+
+def initialize_environment(environment, args):
+    env_path = ENVIRONMENTS_DIR / environment
+
+    if env_path.exists():
+        print(
+            f"INFRABOX: ⚠️ Environment files for environment '{environment}' already exist. Aborting."
+        )
+        return
+
+    try:
+        # Prompt user for core environment values
+        context = prompt_environment_values(environment)
+        prompted_cidrs = None if args.auto_cidr else prompt_cidrs(environment)
+
+        with reserve_cidrs(args, f"initialize {environment}"):
+            cidrs = select_cidrs(args, environment, prompted_cidrs)
+            if cidrs is None:
+                return
+            vnet_cidr, subnet_cidr = cidrs
+
+            if not args.dry_run:
+                env_path.mkdir(parents=True)
+                print(f"INFRABOX: 📁 Created environment directory at {env_path}")
+
+            # Prepare context for rendering templates
+            context["vnet_address_space"] = vnet_cidr
+            context["subnet_address_space"] = subnet_cidr
+
+            # Render all Terraform files using jinja2 templates
+            render_environment_files(environment, env_path, context, args.dry_run)
+
+            if not args.dry_run:
+                with span("cidr registration", environment):
+                    register_environment_cidrs(
+                        environment, [vnet_cidr, subnet_cidr], ENVIRONMENTS_DIR
+                    )
 
         # Run Terraform initialization & validation
-        terraform_init(env_path, dry_run=args.dry_run)
-        terraform_validate(env_path, dry_run=args.dry_run)
+        with span("terraform init", environment):
+            terraform_init_if_needed(env_path, dry_run=args.dry_run)
+        with span("terraform validate", environment):
+            terraform_validate(env_path, dry_run=args.dry_run)
 
         if not args.dry_run:
             print(
                 f"INFRABOX: ✅ Initialization and validation complete for environment: {environment}"
                 f"\nINFRABOX: 📂 Environment files created at {env_path}."
             )
+    except LockBusyError:
+        raise
     except KeyboardInterrupt:
         print("\nINFRABOX: ⚠️ Initialization interrupted by user.")
-        if not args.dry_run and env_path.exists():
-            shutil.rmtree(env_path)
-            print(
-                f"INFRABOX: 🧹 Removed environment directory {env_path} due to error."
-            )
+        if not args.dry_run:
+            remove_environment(env_path)
     except Exception as e:
         print(f"INFRABOX: ❌ Unexpected error: {e}")
-        if not args.dry_run and env_path.exists():
-            shutil.rmtree(env_path)
-            print(
-                f"INFRABOX: 🧹 Removed environment directory {env_path} due to error."
-            )
+        if not args.dry_run:
+            remove_environment(env_path)
         raise
@@ -0,0 +1,52 @@
+import json
+import sqlite3
+import sys
+
+from cli.inventory import INDEXED, open_inventory, query_resources, update_inventory
+from cli.utils import ENVIRONMENTS_DIR
+
+
+def parse_filters(values):
+    """Turn NAME=VALUE and NAME filters into a mapping; NAME matches any value."""
+    filters = {}
+    for value in values or ():
+        name, separator, expected = value.partition("=")
+        filters[name] = expected if separator else None
+    return filters
+
+
+def print_resources(resources):
+    if not resources:
+        print("INFRABOX: 🔍 No matching resources.")
+        return
+    width = max(len(resource["environment"]) for resource in resources)
+    for resource in resources:
+        print(f"  {resource['environment'].ljust(width)}  {resource['address']}")
+    print(f"INFRABOX: 🔍 {len(resources)} matching resources.")
+
+
+def run(args):
+    try:
+        with open_inventory() as inventory:
+            changes = update_inventory(inventory, ENVIRONMENTS_DIR, force=args.rebuild)
+            resources = query_resources(
+                inventory,
+                resource_type=args.type,
+                module=args.module,
+                tags=parse_filters(args.tags),
+                attributes=parse_filters(args.attributes),
+                environments=args.environments,
+            )
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"INFRABOX: ❌ Could not update the inventory: {e}")
+        sys.exit(1)
+
+    if args.json:
+        print(json.dumps(resources, indent=2))
+        return
+    indexed = [
+        environment for environment, change in changes.items() if change == INDEXED
+    ]
+    if indexed:
+        print(f"INFRABOX: 🗂️ Indexed the state of {', '.join(indexed)}")
+    print_resources(resources)
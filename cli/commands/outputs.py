@@ -0,0 +1,106 @@
+import json
+import os
+import sys
+import threading
+
+from cli.terraform_utils import terraform_output_json
+from cli.tfstate import read_state_identity, state_file_path
+from cli.utils import env_state_dir, get_env_path
+
+OUTPUTS_CACHE_FILE = "outputs.json"
+# Sensitive outputs are cached as Terraform returns them, so keep the cache
+# as private as the state file it mirrors
+OUTPUTS_CACHE_MODE = 0o600
+
+
+def load_cached_outputs(env_path, identity):
+    """Return the cached outputs if they were read from this state, else None."""
+    try:
+        cache = json.loads((env_state_dir(env_path) / OUTPUTS_CACHE_FILE).read_text())
+    except (OSError, ValueError):
+        return None
+    if [cache.get("lineage"), cache.get("serial")] != list(identity):
+        return None
+    return cache.get("outputs")
+
+
+def save_cached_outputs(env_path, identity, outputs):
+    cache_file = env_state_dir(env_path) / OUTPUTS_CACHE_FILE
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = cache_file.with_name(
+        f".{cache_file.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+    )
+    lineage, serial = identity
+    fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, OUTPUTS_CACHE_MODE)
+    with os.fdopen(fd, "w") as f:
+        json.dump({"lineage": lineage, "serial": serial, "outputs": outputs}, f)
+    os.replace(tmp_file, cache_file)
+
+
+def environment_outputs(env_path):
+    """
+    Return an environment's outputs in the form of `terraform output -json`.
+
+    The outputs are cached under the lineage and serial of the state they
+    were read from, and Terraform only runs when the state has changed since.
+    An environment without state has no outputs.
+    """
+    state_file = state_file_path(env_path)
+    if not state_file.is_file():
+        return {}
+    identity = read_state_identity(state_file)
+    outputs = load_cached_outputs(env_path, identity)
+    if outputs is not None:
+        return outputs
+
+    outputs = terraform_output_json(env_path)
+    # Only cache outputs known to match the state: an apply may have
+    # replaced it while Terraform was reading
+    if read_state_identity(state_file) == identity:
+        save_cached_outputs(env_path, identity, outputs)
+    return outputs
+
+
+def format_value(value):
+    """Format a value the way `terraform output -raw` would for strings."""
+    if isinstance(value, str):
+        return value
+    return json.dumps(value)
+
+
+def print_outputs(environment, outputs):
+    if not outputs:
+        print(f"INFRABOX: ⚠️ {environment} has no outputs; has it been created?")
+        return
+    print(f"INFRABOX: 📤 Outputs of {environment}:")
+    width = max(len(name) for name in outputs)
+    for name, output in sorted(outputs.items()):
+        value = (
+            "<sensitive>" if output.get("sensitive") else format_value(output["value"])
+        )
+        print(f"  {name.ljust(width)} = {value}")
+
+
+def run(args):
+    env_path = get_env_path(args.environment)
+    try:
+        outputs = environment_outputs(env_path)
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"INFRABOX: ❌ Could not read the outputs of {args.environment}: {e}")
+        sys.exit(1)
+
+    if args.name is None:
+        if args.json:
+            print(json.dumps(outputs, indent=2, sort_keys=True))
+        else:
+            print_outputs(args.environment, outputs)
+        return
+
+    if args.name not in outputs:
+        print(
+            f"INFRABOX: ❌ Output '{args.name}' not found in {args.environment};"
+            f" it has: {', '.join(sorted(outputs)) or 'none'}"
+        )
+        sys.exit(1)
+    value = outputs[args.name]["value"]
+    print(json.dumps(value) if args.json else format_value(value))
@@ -0,0 +1,68 @@
+import sys
+
+from cli.infrastructure_templates import (
+    RENDER_MANIFEST_FILE,
+    RENDER_WRITTEN,
+    load_render_manifest,
+    render_environment,
+)
+from cli.locks import environment_run_locks
+from cli.parallel import (
+    describe_error,
+    print_environment_report,
+    resolve_environments,
+    run_for_environments,
+)
+from cli.tracing import span
+from cli.utils import get_env_path
+
+
+def regenerate_environment(environment, args):
+    """
+    Re-render the Terraform files of one environment from its saved render
+    context. Returns the names of the files that were rewritten.
+    """
+    env_path = get_env_path(environment)
+    manifest = load_render_manifest(env_path)
+    if manifest is None:
+        print(
+            f"INFRABOX: ❌ No render context saved in {env_path / RENDER_MANIFEST_FILE}."
+            " Only environments initialized with a render manifest can be regenerated."
+        )
+        sys.exit(1)
+
+    with span("render templates", environment):
+        statuses = render_environment(
+            env_path, manifest["context"], dry_run=args.dry_run, force=args.force
+        )
+    return [name for name, status in statuses.items() if status == RENDER_WRITTEN]
+
+
+def describe_result(written):
+    if not written:
+        return "✅ up to date"
+    return f"📝 regenerated {', '.join(written)}"
+
+
+def run(args):
+    environments = resolve_environments(args)
+    if not environments:
+        print("INFRABOX: ⚠️ No initialized environments found.")
+        return
+
+    with environment_run_locks(environments, args, "regenerate"):
+        results, errors = run_for_environments(
+            lambda environment: regenerate_environment(environment, args),
+            environments,
+            args.jobs,
+        )
+
+    statuses = {}
+    for environment in environments:
+        if environment in errors:
+            statuses[environment] = describe_error(errors[environment])
+        else:
+            statuses[environment] = describe_result(results[environment])
+    print_environment_report(statuses)
+    if errors:
+        sys.exit(1)
@@ -0,0 +1,64 @@
+import json
+import sys
+
+from cli.commands.outputs import format_value
+from cli.tfstate import (
+    SENSITIVE_VALUE,
+    module_addresses,
+    resource_addresses,
+    show_resource,
+    state_file_path,
+)
+from cli.utils import get_env_path
+
+
+def list_state(env_path, args):
+    if args.modules:
+        addresses = module_addresses(env_path)
+    else:
+        addresses = resource_addresses(env_path, args.module, args.type)
+    for address in addresses:
+        print(address)
+
+
+def masked_attributes(instance):
+    return {
+        name: SENSITIVE_VALUE if name in instance["sensitive"] else value
+        for name, value in instance["attributes"].items()
+    }
+
+
+def show_state(env_path, args):
+    instance = show_resource(env_path, args.address)
+    if instance is None:
+        print(
+            f"INFRABOX: ❌ No resource instance {args.address} in the state of {args.environment}."
+        )
+        sys.exit(1)
+
+    attributes = masked_attributes(instance)
+    if args.json:
+        print(json.dumps({**instance, "attributes": attributes}, indent=2))
+        return
+    print(f"INFRABOX: 🔎 {instance['address']} ({instance['provider']})")
+    width = max((len(name) for name in attributes), default=0)
+    for name, value in sorted(attributes.items()):
+        print(f"  {name.ljust(width)} = {format_value(value)}")
+
+
+def run(args):
+    env_path = get_env_path(args.environment)
+    if not state_file_path(env_path).is_file():
+        print(
+            f"INFRABOX: ⚠️ {args.environment} has no Terraform state; has it been created?"
+        )
+        sys.exit(1)
+
+    try:
+        if args.state_command == "ls":
+            list_state(env_path, args)
+        else:
+            show_state(env_path, args)
+    except (OSError, ValueError) as e:
+        print(f"INFRABOX: ❌ Could not read the state of {args.environment}: {e}")
+        sys.exit(1)
@@ -0,0 +1,64 @@
+import time
+from pathlib import Path
+
+from cli.adaptive_parallelism import PARALLELISM_STATE_FILE, remembered_parallelism
+from cli.parallel import resolve_environments
+from cli.terraform_utils import PLAN_FILE_NAME, last_full_refresh
+from cli.utils import ENVIRONMENTS_DIR, env_state_dir, load_cidr_registry
+
+SECONDS_PER_UNIT = (("d", 86400), ("h", 3600), ("m", 60))
+
+
+def format_age(seconds):
+    if seconds is None:
+        return "never"
+    for unit, size in SECONDS_PER_UNIT:
+        if seconds >= size:
+            return f"{seconds // size:.0f}{unit} ago"
+    return f"{seconds:.0f}s ago"
+
+
+def environment_status(environment, registry, now=None):
+    """Describe the local state of one environment, without running Terraform."""
+    env_path = Path(ENVIRONMENTS_DIR) / environment
+    last_refresh = last_full_refresh(env_path)
+    parallelism = None
+    if (env_state_dir(env_path) / PARALLELISM_STATE_FILE).is_file():
+        parallelism = remembered_parallelism(env_path)
+    return {
+        "environment": environment,
+        "initialized": (env_path / ".terraform").is_dir(),
+        "cidrs": registry.environments.get(environment, {}).get("cidrs", []),
+        "refreshed_seconds_ago": (
+            None if last_refresh is None else (now or time.time()) - last_refresh
+        ),
+        "pending_plan": (env_path / PLAN_FILE_NAME).is_file(),
+        "parallelism": parallelism,
+    }
+
+
+def format_status(status):
+    parts = [
+        "✅ initialized" if status["initialized"] else "⚪ not initialized",
+        ", ".join(status["cidrs"]) or "no CIDRs",
+        f"refreshed {format_age(status['refreshed_seconds_ago'])}",
+    ]
+    if status["parallelism"] is not None:
+        parts.append(f"parallelism {status['parallelism']}")
+    if status["pending_plan"]:
+        parts.append("⚠️ saved plan pending")
+    return "  ".join(parts)
+
+
+def run(args):
+    environments = resolve_environments(args)
+    if not environments:
+        print("INFRABOX: ⚠️ No initialized environments found.")
+        return
+
+    registry = load_cidr_registry(ENVIRONMENTS_DIR)
+    print("INFRABOX: 📋 Environment status:")
+    width = max(len(environment) for environment in environments)
+    for environment in environments:
+        status = environment_status(environment, registry)
+        print(f"  {environment.ljust(width)}  {format_status(status)}")
@@ -0,0 +1,327 @@
+"""
+A long-lived InfraBox process serving CLI requests over a Unix socket.
+
+The daemon keeps the template environment, the CIDR registry and the command
+modules loaded, so a request pays neither Python startup nor their setup.
+Each connection carries one request; the client sends its arguments, working
+directory and environment as one JSON line, the command runs with that
+environment, and the daemon streams back JSON lines:
+
+    {"type": "output", "stream": "stdout", "text": "..."}
+    {"type": "prompt", "text": "INFRABOX: Proceed? [y/N]: "}
+    {"type": "exit", "code": 0}
+
+and the client answers every prompt with {"type": "input", "text": "..."}.
+On Ctrl+C the client sends {"type": "interrupt"}; that message or a dropped
+connection interrupts the request's running commands, as Ctrl+C would in a
+local run.
+"""
+
+import asyncio
+import contextlib
+import importlib
+import json
+import os
+import queue
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import traceback
+from pathlib import Path
+
+from cli.async_engine import _interrupt
+from cli.parallel import PrefixedOutput
+from cli.parser import ENVIRONMENT_CHOICES, parse_arguments
+from cli.utils import (
+    DAEMON_SOCKET_PATH,
+    ENVIRONMENTS_DIR,
+    get_console,
+    keep_cidr_registries_warm,
+    load_cidr_registry,
+    set_console,
+)
+
+# Commands the daemon serves; anything else runs in the calling process
+SERVED_COMMANDS = {
+    "create": "cli.commands.create",
+    "destroy": "cli.commands.destroy",
+    "initialize": "cli.commands.initialize",
+    "status": "cli.commands.status",
+}
+SOCKET_MODE = 0o600
+# The exit code of a command stopped by Ctrl+C
+INTERRUPTED_EXIT_CODE = 130
+
+
+class Console:
+    """The output streams, prompts and environment of one connected client."""
+
+    def __init__(self, rfile, wfile, environ=None):
+        self.rfile = rfile
+        self.wfile = wfile
+        self.environ = environ
+        self._lock = threading.Lock()
+        self._answers = queue.Queue()
+        self._children = {}
+        self.connected = True
+        self.interrupted = False
+
+    def listen(self):
+        """
+        Read the client's messages until it disconnects: answers to prompts
+        and interrupts. A dropped connection interrupts the request too.
+        """
+        try:
+            for line in self.rfile:
+                message = json.loads(line)
+                if message.get("type") == "interrupt":
+                    self.interrupt()
+                else:
+                    self._answers.put(message.get("text", ""))
+        except (OSError, ValueError):
+            pass
+        self.interrupt()
+
+    def interrupt(self):
+        """Interrupt the running children and any the request starts later."""
+        with self._lock:
+            self.interrupted = True
+            children = list(self._children.items())
+        for process, loop in children:
+            self._interrupt_child(process, loop)
+        # Wake up a prompt waiting for an answer
+        self._answers.put(None)
+
+    @staticmethod
+    def _interrupt_child(process, loop):
+        with contextlib.suppress(RuntimeError):
+            # RuntimeError: the child's event loop has already closed
+            asyncio.run_coroutine_threadsafe(_interrupt(process), loop)
+
+    @contextlib.contextmanager
+    def forward_interrupt(self, process):
+        """Interrupt a child started on the running loop when the client asks."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._children[process] = loop
+            interrupted = self.interrupted
+        try:
+            if interrupted:
+                self._interrupt_child(process, loop)
+            yield
+        finally:
+            with self._lock:
+                del self._children[process]
+
+    def send(self, message):
+        if not self.connected:
+            return
+        with self._lock:
+            try:
+                self.wfile.write(json.dumps(message).encode() + b"\n")
+                self.wfile.flush()
+            except OSError:
+                # The client went away; its request is interrupted by listen()
+                self.connected = False
+
+    def write(self, text, stream="stdout"):
+        self.send({"type": "output", "stream": stream, "text": text})
+
+    def input(self, prompt):
+        self.send({"type": "prompt", "text": prompt})
+        answer = self._answers.get() if not self.interrupted else None
+        if self.interrupted:
+            raise KeyboardInterrupt
+        if answer is None:
+            raise EOFError("the client disconnected")
+        return answer
+
+
+class ConsoleRouter:
+    """
+    A stdout or stderr replacement that sends what a thread writes to the
+    console of the client it is serving, and everything else to the terminal.
+    """
+
+    def __init__(self, stream, name):
+        self.stream = stream
+        self.name = name
+
+    def write(self, text):
+        console = get_console()
+        if console is None:
+            return self.stream.write(text)
+        console.write(text, self.name)
+        return len(text)
+
+    def flush(self):
+        if get_console() is None:
+            self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+class EnvironmentLocks:
+    """One lock per environment, so requests for it run one at a time."""
+
+    def __init__(self):
+        self._guard = threading.Lock()
+        self._locks = {}
+
+    @contextlib.contextmanager
+    def hold(self, environments):
+        # Always acquired in the same order, so two requests cannot deadlock
+        locks = []
+        with self._guard:
+            for environment in sorted(set(environments)):
+                locks.append(
+                    (environment, self._locks.setdefault(environment, threading.Lock()))
+                )
+        held = []
+        try:
+            for environment, lock in locks:
+                if not lock.acquire(blocking=False):
+                    print(
+                        f"INFRABOX: ⏳ Waiting for another request on {environment}..."
+                    )
+                    lock.acquire()
+                held.append(lock)
+            yield
+        finally:
+            for lock in reversed(held):
+                lock.release()
+
+
+def request_environments(args):
+    """Return the environments a request works on, which it must lock."""
+    if args.command == "status":
+        return []
+    if args.command == "initialize":
+        # A spec may name any environment
+        return ENVIRONMENT_CHOICES if args.spec else [args.environment]
+    return ENVIRONMENT_CHOICES if args.all else args.environments
+
+
+def exit_code(error):
+    if error.code is None:
+        return 0
+    if isinstance(error.code, int):
+        return error.code
+    print(error.code, file=sys.stderr)
+    return 1
+
+
+class InfraBoxDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path):
+        self.locks = EnvironmentLocks()
+        super().__init__(str(socket_path), RequestHandler)
+
+    def execute(self, request):
+        """Run one request in the current thread. Returns its exit code."""
+        try:
+            args = parse_arguments(request["argv"])
+        except SystemExit as e:
+            return exit_code(e)
+        module_name = SERVED_COMMANDS.get(args.command)
+        if module_name is None or args.trace:
+            print(f"INFRABOX: ❌ `{args.command}` is not served by the daemon.")
+            return 2
+        if getattr(args, "spec", None):
+            args.spec = os.path.join(request.get("cwd", ""), args.spec)
+
+        try:
+            with self.locks.hold(request_environments(args)):
+                importlib.import_module(module_name).run(args)
+        except SystemExit as e:
+            return exit_code(e)
+        except KeyboardInterrupt:
+            print("\nINFRABOX: ⛔ Interrupted.")
+            return INTERRUPTED_EXIT_CODE
+        except (Exception, EOFError):  # noqa: BLE001
+            traceback.print_exc()
+            return 1
+        return 0
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        request = json.loads(line)
+        console = Console(self.rfile, self.wfile, request.get("environ"))
+        threading.Thread(target=console.listen, daemon=True).start()
+        set_console(console)
+        try:
+            code = self.server.execute(request)
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            set_console(None)
+        console.send({"type": "exit", "code": code})
+        # Wake up the listener, which would keep the connection from closing
+        with contextlib.suppress(OSError):
+            self.connection.shutdown(socket.SHUT_RD)
+
+
+def daemon_running(socket_path):
+    """Check whether a daemon accepts connections on the socket."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(str(socket_path))
+        except OSError:
+            return False
+    return True
+
+
+def warm_up():
+    """Load everything requests would otherwise load on first use."""
+    from cli.infrastructure_templates import template_environment  # noqa: PLC0415
+
+    for module_name in SERVED_COMMANDS.values():
+        importlib.import_module(module_name)
+    template_environment()
+    keep_cidr_registries_warm()
+    load_cidr_registry(ENVIRONMENTS_DIR)
+
+
+def serve(socket_path=None):
+    socket_path = Path(socket_path or DAEMON_SOCKET_PATH)
+    if socket_path.exists():
+        if daemon_running(socket_path):
+            print(f"INFRABOX: ❌ A daemon is already serving {socket_path}.")
+            sys.exit(1)
+        # Left behind by a daemon that did not shut down cleanly
+        socket_path.unlink()
+    socket_path.parent.mkdir(parents=True, exist_ok=True)
+
+    warm_up()
+    sys.stdout = PrefixedOutput(ConsoleRouter(sys.stdout, "stdout"))
+    sys.stderr = PrefixedOutput(ConsoleRouter(sys.stderr, "stderr"))
+    # Stop cleanly, removing the socket, when asked to terminate
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+    # Create the socket private to its owner, as clients can run any command
+    # with any environment through it
+    umask = os.umask(0o777 & ~SOCKET_MODE)
+    try:
+        server = InfraBoxDaemon(socket_path)
+    finally:
+        os.umask(umask)
+    with server:
+        print(f"INFRABOX: 🛰️ Serving requests on {socket_path} (Ctrl+C to stop)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("\nINFRABOX: 👋 Daemon stopped.")
+        finally:
+            socket_path.unlink(missing_ok=True)
+
+
+def run(args):
+    serve(args.socket)
@@ -0,0 +1,69 @@
+import json
+import os
+import socket
+import sys
+
+
+def _send(connection, message):
+    connection.write(json.dumps(message).encode() + b"\n")
+    connection.flush()
+
+
+def _handle(connection, message):
+    """Act on one message of the daemon. Returns the exit code once it is sent."""
+    if message["type"] == "output":
+        stream = sys.stderr if message.get("stream") == "stderr" else sys.stdout
+        stream.write(message["text"])
+        stream.flush()
+    elif message["type"] == "prompt":
+        try:
+            answer = input(message["text"])
+        except EOFError:
+            answer = ""
+        _send(connection, {"type": "input", "text": answer})
+    elif message["type"] == "exit":
+        return message["code"]
+    return None
+
+
+def forward_to_daemon(argv, socket_path):
+    """
+    Run a command in the daemon listening on `socket_path`, with this
+    process's environment, relaying its output and prompts. Returns the
+    command's exit code, or None when no daemon accepts the connection.
+
+    The first Ctrl+C asks the daemon to interrupt the command, which then
+    stops its Terraform runs cleanly; a second one leaves it at once.
+    """
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(str(socket_path))
+    except OSError:
+        client.close()
+        return None
+
+    with client, client.makefile("rwb") as connection:
+        request = {"argv": list(argv), "cwd": os.getcwd(), "environ": dict(os.environ)}
+        _send(connection, request)
+        interrupted = False
+        while True:
+            try:
+                line = connection.readline()
+                if not line:
+                    break
+                code = _handle(connection, json.loads(line))
+            except KeyboardInterrupt:
+                if interrupted:
+                    raise
+                interrupted = True
+                print(
+                    "\nINFRABOX: ⛔ Interrupting the command in the daemon"
+                    " (Ctrl+C again to leave at once)..."
+                )
+                _send(connection, {"type": "interrupt"})
+                continue
+            if code is not None:
+                return code
+
+    print("INFRABOX: ❌ Lost the connection to the InfraBox daemon.")
+    return 1
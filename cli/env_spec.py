@@ -0,0 +1,164 @@
+"""
+Environment definitions for non-interactive, bulk `initialize --spec`.
+
+A spec is a YAML file with optional `defaults` and one entry per environment:
+
+    defaults:
+      location: westeurope
+    environments:
+      dev:
+        vnet_address_space: 10.1.0.0/16
+        subnet_address_space: 10.1.1.0/24
+      stage: {}    # CIDRs allocated from the --auto-cidr pool
+"""
+
+from cli.cidr_registry import CidrRegistry
+from cli.utils import (
+    VALID_ENVIRONMENTS,
+    allocate_environment_cidrs,
+    sanitize_env_name,
+    validate_cidr,
+)
+
+# The values `initialize` otherwise prompts for, with the prompts' defaults
+VALUE_DEFAULTS = {
+    "name_prefix": "Infrabox",
+    "location": "westeurope",
+    "admin_username": "azureuser",
+    "ssh_public_key_path": "~/.ssh/id_rsa_infrabox.pub",
+}
+SPEC_KEYS = {
+    *VALUE_DEFAULTS,
+    "dns_zone_name",
+    "vnet_address_space",
+    "subnet_address_space",
+}
+
+
+class SpecError(ValueError):
+    """An invalid spec, listing every problem found."""
+
+    def __init__(self, problems):
+        super().__init__("; ".join(problems))
+        self.problems = problems
+
+
+def read_spec(spec_file):
+    """Parse a spec file into its defaults and per-environment values."""
+    import yaml  # noqa: PLC0415
+
+    with open(spec_file) as f:
+        try:
+            spec = yaml.safe_load(f) or {}
+        except yaml.YAMLError as e:
+            raise SpecError([f"{spec_file} is not valid YAML: {e}"]) from e
+
+    if not isinstance(spec, dict):
+        spec = {}
+    defaults = spec.get("defaults") or {}
+    environments = spec.get("environments")
+    if not isinstance(defaults, dict) or not isinstance(environments, dict):
+        raise SpecError(
+            [f"{spec_file} must map `environments` (and optionally `defaults`)"]
+        )
+    if not environments:
+        raise SpecError([f"{spec_file} defines no environments"])
+    return defaults, {str(name): values or {} for name, values in environments.items()}
+
+
+def _environment_context(name, values, defaults, environments_dir, problems):
+    if not isinstance(values, dict):
+        problems.append(f"{name}: values must be a mapping")
+        return None
+    if sanitize_env_name(name) != name or name not in VALID_ENVIRONMENTS:
+        problems.append(
+            f"{name}: not a supported environment name"
+            f" (choose from {', '.join(sorted(VALID_ENVIRONMENTS))})"
+        )
+    elif (environments_dir / name).exists():
+        problems.append(f"{name}: environment files already exist")
+    for key in sorted((set(defaults) | set(values)) - SPEC_KEYS):
+        problems.append(f"{name}: unknown key '{key}'")
+
+    context = {**VALUE_DEFAULTS, **defaults, **values, "environment": name}
+    context.setdefault("dns_zone_name", f"{context['name_prefix']}-{name}.com")
+    context = {key: str(value) for key, value in context.items()}
+    if ("vnet_address_space" in context) != ("subnet_address_space" in context):
+        problems.append(
+            f"{name}: vnet_address_space and subnet_address_space go together"
+        )
+    return context
+
+
+def _reserve_explicit_cidrs(registry, name, context, problems):
+    try:
+        cidrs = [
+            validate_cidr(context["vnet_address_space"]),
+            validate_cidr(context["subnet_address_space"]),
+        ]
+    except ValueError as e:
+        problems.append(f"{name}: {e}")
+        return
+    for cidr in cidrs:
+        overlap = registry.find_overlap(cidr, exclude_env=name)
+        if overlap is not None:
+            problems.append(
+                f"{name}: CIDR {cidr} overlaps with {overlap[1]} in environment '{overlap[0]}'"
+            )
+            return
+    context["vnet_address_space"], context["subnet_address_space"] = cidrs
+    registry.reserve(name, cidrs)
+
+
+def load_environment_specs(
+    spec_file, environments_dir, pool, prefix_length, subnet_prefix_length
+):
+    """
+    Return the render context of every environment of a spec file.
+
+    All environments are checked in one pass against each other and the
+    existing environments: explicit CIDRs are reserved first, then the
+    remaining environments are allocated blocks from `pool`. Raises SpecError
+    listing every problem found.
+    """
+    defaults, environments = read_spec(spec_file)
+    problems = []
+    contexts = {
+        name: _environment_context(name, values, defaults, environments_dir, problems)
+        for name, values in environments.items()
+    }
+    if problems:
+        raise SpecError(problems)
+
+    registry = CidrRegistry.load(environments_dir)
+    pending = []
+    for name, context in contexts.items():
+        if "vnet_address_space" in context:
+            _reserve_explicit_cidrs(registry, name, context, problems)
+        else:
+            pending.append(name)
+
+    for name in pending:
+        if not pool:
+            problems.append(f"{name}: no CIDRs given and no --auto-cidr pool")
+            continue
+        try:
+            cidrs = allocate_environment_cidrs(
+                validate_cidr(pool),
+                prefix_length,
+                subnet_prefix_length,
+                name,
+                environments_dir,
+                registry=registry,
+            )
+        except ValueError as e:
+            problems.append(f"{name}: {e}")
+            continue
+        contexts[name]["vnet_address_space"], contexts[name]["subnet_address_space"] = (
+            cidrs
+        )
+        registry.reserve(name, cidrs)
+
+    if problems:
+        raise SpecError(problems)
+    return contexts
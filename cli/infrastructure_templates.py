@@ -1,30 +1,176 @@
+import hashlib
+import json
+import os
+import threading
 from pathlib import Path
 
-from jinja2 import Environment, FileSystemLoader
-
+from cli.tracing import span
 from cli.utils import INFRA_ROOT
 
 TEMPLATES_DIR = INFRA_ROOT / "templates"
-env = Environment(
-    loader=FileSystemLoader(TEMPLATES_DIR),
-    autoescape=True,
-    trim_blocks=True,
-    lstrip_blocks=True,
-)
+# Template rendered for each Terraform file of an environment
+TEMPLATE_OUTPUTS = {
+    "variables.tf.j2": "variables.tf",
+    "main.tf.j2": "main.tf",
+    "outputs.tf.j2": "outputs.tf",
+    "provider.tf.j2": "provider.tf",
+}
+RENDER_MANIFEST_FILE = "infrabox.render.json"
+RENDER_MANIFEST_VERSION = 1
+RENDER_WRITTEN = "written"
+RENDER_UNCHANGED = "unchanged"
+RENDER_SKIPPED = "skipped"
+# Names resolved from Jinja2 on first access, so importing this module is cheap
+JINJA2_NAMES = ("Environment", "FileSystemLoader")
+
+_env_lock = threading.Lock()
+
+
+def __getattr__(name):
+    """
+    Resolve the Jinja2 classes and the template environment (`env`) lazily,
+    so Jinja2 is only imported when a template is first rendered.
+    """
+    if name in JINJA2_NAMES:
+        import jinja2  # noqa: PLC0415
+
+        return getattr(jinja2, name)
+    if name == "env":
+        return template_environment()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def build_environment(bytecode_cache=None):
+    import jinja2  # noqa: PLC0415
+
+    return jinja2.Environment(
+        loader=jinja2.FileSystemLoader(TEMPLATES_DIR),
+        autoescape=True,
+        trim_blocks=True,
+        lstrip_blocks=True,
+        bytecode_cache=bytecode_cache,
+    )
+
+
+def template_environment():
+    """
+    Return the shared Jinja2 environment, creating it on first use. Compiled
+    templates are kept in a persistent cache so later runs skip compilation.
+    """
+    with _env_lock:
+        if "env" not in globals():
+            from cli.template_cache import TemplateBytecodeCache  # noqa: PLC0415
+
+            globals()["env"] = build_environment(TemplateBytecodeCache())
+        return globals()["env"]
+
+
+def write_if_changed(output_path: Path, content: str) -> bool:
+    """
+    Atomically replace a file with `content` unless it already holds exactly
+    that, so unchanged files keep their mtime. Returns True if written.
+    """
+    output_path = Path(output_path)
+    try:
+        if output_path.read_text() == content:
+            return False
+    except (FileNotFoundError, UnicodeDecodeError):
+        pass
+    tmp_path = output_path.with_name(
+        f".{output_path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+    )
+    tmp_path.write_text(content)
+    os.replace(tmp_path, output_path)
+    return True
 
 
 def render_template(
     template_name: str, context: dict, output_path: Path, dry_run=False
 ):
-    template = env.get_template(template_name)
-    rendered_content = template.render(context)
+    """Render a template to a file. Returns RENDER_WRITTEN or RENDER_UNCHANGED."""
+    with span(f"render {template_name}"):
+        template = template_environment().get_template(template_name)
+        rendered_content = template.render(context)
 
     if dry_run:
         print(f"INFRABOX: 🔍 Dry-run mode: {output_path.name} not written to disk.")
         print(rendered_content)
-    else:
-        output_path.write_text(rendered_content)
+        return RENDER_SKIPPED
+    if write_if_changed(output_path, rendered_content):
         print(f"INFRABOX: 📝 Generated {output_path.name}")
+        return RENDER_WRITTEN
+    print(f"INFRABOX: ✅ {output_path.name} is up to date")
+    return RENDER_UNCHANGED
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def render_inputs(context: dict) -> dict:
+    """
+    Return, per template, the hashes of everything its output depends on:
+    the template source and the render context.
+    """
+    context_hash = content_hash(json.dumps(context, sort_keys=True))
+    return {
+        name: {
+            "template": content_hash((TEMPLATES_DIR / name).read_text()),
+            "context": context_hash,
+        }
+        for name in TEMPLATE_OUTPUTS
+    }
+
+
+def load_render_manifest(env_path: Path):
+    """Return the saved render manifest of an environment, or None."""
+    try:
+        manifest = json.loads((Path(env_path) / RENDER_MANIFEST_FILE).read_text())
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != RENDER_MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def save_render_manifest(env_path: Path, context: dict):
+    """
+    Record the context an environment was rendered with, and the inputs of
+    each template, so it can be regenerated later.
+    """
+    manifest = {
+        "version": RENDER_MANIFEST_VERSION,
+        "context": context,
+        "inputs": render_inputs(context),
+    }
+    write_if_changed(
+        Path(env_path) / RENDER_MANIFEST_FILE,
+        json.dumps(manifest, indent=2, sort_keys=True) + "\n",
+    )
+
+
+def render_environment(env_path: Path, context: dict, dry_run=False, force=False):
+    """
+    Re-render the Terraform files of an environment whose template or context
+    changed since its manifest was saved, or all of them with `force`.
+    Returns {template name: RENDER_* status}.
+    """
+    env_path = Path(env_path)
+    manifest = load_render_manifest(env_path) or {}
+    recorded = manifest.get("inputs", {}) if manifest.get("context") == context else {}
+    inputs = render_inputs(context)
+
+    statuses = {}
+    for name, output in TEMPLATE_OUTPUTS.items():
+        output_path = env_path / output
+        if not force and recorded.get(name) == inputs[name] and output_path.exists():
+            statuses[name] = RENDER_UNCHANGED
+            continue
+        statuses[name] = render_template(name, context, output_path, dry_run)
+
+    if not dry_run:
+        save_render_manifest(env_path, context)
+    return statuses
 
 
 def generate_main_tf(env_path: Path, context: dict, dry_run=False):
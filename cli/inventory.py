@@ -0,0 +1,227 @@
+"""
+A SQLite index of the resources in every environment's Terraform state.
+
+Each environment is indexed under the lineage and serial of its state, and
+is only read again, with the streaming state reader, once they change. Tags
+and the scalar top-level attributes of every resource instance are indexed
+too, so resources can be filtered by type, module, tag and attribute:
+
+    with open_inventory() as inventory:
+        update_inventory(inventory, ENVIRONMENTS_DIR)
+        vms = query_resources(inventory, attributes={"size": "Standard_B1s"})
+"""
+
+import contextlib
+import json
+import sqlite3
+import time
+
+from cli.tfstate import iter_resources, read_state_identity, state_file_path
+from cli.utils import INFRABOX_STATE_DIR, VALID_ENVIRONMENTS
+
+INVENTORY_DB = INFRABOX_STATE_DIR / "inventory.db"
+INVENTORY_SCHEMA_VERSION = 2
+# Seconds to wait for another process writing the index
+INVENTORY_BUSY_TIMEOUT = 30
+INDEXED = "indexed"
+UNCHANGED = "unchanged"
+REMOVED = "removed"
+
+SCHEMA = """
+CREATE TABLE environments (
+    name TEXT PRIMARY KEY,
+    lineage TEXT,
+    serial INTEGER,
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE resources (
+    environment TEXT NOT NULL,
+    address TEXT NOT NULL,
+    module TEXT,
+    mode TEXT NOT NULL,
+    type TEXT NOT NULL,
+    name TEXT NOT NULL,
+    provider TEXT,
+    deposed TEXT,
+    PRIMARY KEY (environment, address)
+);
+CREATE INDEX resources_by_type ON resources (type);
+CREATE INDEX resources_by_module ON resources (module);
+CREATE TABLE tags (
+    environment TEXT NOT NULL,
+    address TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT
+);
+CREATE INDEX tags_by_key ON tags (key, value);
+CREATE INDEX tags_by_resource ON tags (environment, address);
+CREATE TABLE attributes (
+    environment TEXT NOT NULL,
+    address TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value TEXT
+);
+CREATE INDEX attributes_by_name ON attributes (name, value);
+CREATE INDEX attributes_by_resource ON attributes (environment, address);
+"""
+TABLES = ("environments", "resources", "tags", "attributes")
+
+
+@contextlib.contextmanager
+def open_inventory(db_path=None):
+    """
+    Open the inventory database, creating it, or recreating it if it was
+    written by another version of its schema.
+    """
+    db_path = db_path or INVENTORY_DB
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(str(db_path), timeout=INVENTORY_BUSY_TIMEOUT)
+    connection.row_factory = sqlite3.Row
+    try:
+        version = connection.execute("PRAGMA user_version").fetchone()[0]
+        if version != INVENTORY_SCHEMA_VERSION:
+            with connection:
+                for table in TABLES:
+                    connection.execute(f"DROP TABLE IF EXISTS {table}")  # nosec B608
+                connection.executescript(SCHEMA)
+                connection.execute(f"PRAGMA user_version = {INVENTORY_SCHEMA_VERSION}")
+        yield connection
+    finally:
+        connection.close()
+
+
+def attribute_text(value):
+    """Store strings as they are and other scalars in their JSON form."""
+    return value if isinstance(value, str) else json.dumps(value)
+
+
+def _delete_environment(connection, environment):
+    for table in ("resources", "tags", "attributes"):
+        connection.execute(
+            f"DELETE FROM {table} WHERE environment = ?",  # nosec B608
+            (environment,),
+        )
+    connection.execute("DELETE FROM environments WHERE name = ?", (environment,))
+
+
+def _index_environment(connection, environment, env_path, identity):
+    _delete_environment(connection, environment)
+    for instance in iter_resources(env_path, attributes=True):
+        key = (environment, instance["address"])
+        connection.execute(
+            "INSERT INTO resources VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                *key,
+                instance["module"],
+                instance["mode"],
+                instance["type"],
+                instance["name"],
+                instance["provider"],
+                instance["deposed"],
+            ),
+        )
+        attributes = instance["attributes"]
+        tags = attributes.get("tags")
+        if isinstance(tags, dict):
+            connection.executemany(
+                "INSERT INTO tags VALUES (?, ?, ?, ?)",
+                [(*key, name, value) for name, value in tags.items()],
+            )
+        connection.executemany(
+            "INSERT INTO attributes VALUES (?, ?, ?, ?)",
+            [
+                (*key, name, attribute_text(value))
+                for name, value in attributes.items()
+                if name not in instance["sensitive"]
+                and not isinstance(value, (dict, list))
+                and value is not None
+            ],
+        )
+    lineage, serial = identity
+    connection.execute(
+        "INSERT INTO environments VALUES (?, ?, ?, ?)",
+        (environment, lineage, serial, time.time()),
+    )
+
+
+def indexed_identities(connection):
+    return {
+        row["name"]: (row["lineage"], row["serial"])
+        for row in connection.execute("SELECT name, lineage, serial FROM environments")
+    }
+
+
+def update_inventory(connection, environments_dir, force=False):
+    """
+    Bring the index up to date with the state of every environment,
+    re-reading only the states whose lineage or serial changed, or every
+    state with `force`. Returns what was done to each environment.
+    """
+    indexed = indexed_identities(connection)
+    changes = {}
+    present = set()
+    for env_path in sorted(environments_dir.iterdir()):
+        environment = env_path.name
+        state_file = state_file_path(env_path)
+        if environment not in VALID_ENVIRONMENTS or not state_file.is_file():
+            continue
+        present.add(environment)
+        identity = read_state_identity(state_file)
+        if not force and indexed.get(environment) == identity:
+            changes[environment] = UNCHANGED
+            continue
+        # One transaction per environment, so a query never sees it half indexed
+        with connection:
+            _index_environment(connection, environment, env_path, identity)
+        changes[environment] = INDEXED
+
+    for environment in sorted(set(indexed) - present):
+        with connection:
+            _delete_environment(connection, environment)
+        changes[environment] = REMOVED
+    return changes
+
+
+def query_resources(  # noqa: PLR0913
+    connection,
+    *,
+    resource_type=None,
+    module=None,
+    tags=None,
+    attributes=None,
+    environments=None,
+):
+    """
+    Return the indexed resources matching every filter given. `tags` and
+    `attributes` map names to the value they must have, or to None to only
+    require that they are set.
+    """
+    clauses, params = [], []
+    if resource_type is not None:
+        clauses.append("r.type = ?")
+        params.append(resource_type)
+    if module is not None:
+        clauses.append("r.module = ?")
+        params.append(module)
+    if environments:
+        clauses.append(f"r.environment IN ({', '.join('?' * len(environments))})")
+        params.extend(environments)
+    for table, column, filters in (
+        ("tags", "key", tags),
+        ("attributes", "name", attributes),
+    ):
+        for name, value in (filters or {}).items():
+            condition = f"{column} = ?" + ("" if value is None else " AND value = ?")
+            clauses.append(
+                f"(r.environment, r.address) IN (SELECT environment, address"
+                f" FROM {table} WHERE {condition})"
+            )
+            params.append(name)
+            if value is not None:
+                params.append(attribute_text(value))
+
+    sql = "SELECT r.* FROM resources r"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY r.environment, r.address"
+    return [dict(row) for row in connection.execute(sql, params)]  # nosec B608
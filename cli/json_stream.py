@@ -0,0 +1,184 @@
+import json
+import re
+
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = " \t\r\n"
+# Characters that change nesting or quoting state outside of a string
+STRUCTURAL_PATTERN = re.compile(r'["\[\]{}]')
+STRING_SPECIAL_PATTERN = re.compile(r'["\\]')
+LITERAL_END_PATTERN = re.compile(r"[\s,\]}]")
+
+
+class JsonScanner:
+    """
+    An incremental reader for large JSON documents.
+
+    The document is read from a text stream in chunks and only the part that
+    is still needed stays in memory: values the caller skips are scanned for
+    their end and dropped, and only the values the caller reads are decoded.
+
+        scanner = JsonScanner(stream)
+        for key in scanner.iter_object():
+            if key == "resources":
+                for _ in scanner.iter_array():
+                    resource = scanner.read_value()
+
+    Values the caller does not consume inside iter_object or iter_array are
+    skipped automatically.
+    """
+
+    def __init__(self, stream, chunk_size=CHUNK_SIZE):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self._discarded = 0
+        self._mark = None
+
+    @property
+    def offset(self):
+        """Absolute position in the document."""
+        return self._discarded + self.pos
+
+    def _fill(self):
+        keep = self.pos if self._mark is None else self._mark
+        self.buffer = self.buffer[keep:]
+        self._discarded += keep
+        self.pos -= keep
+        if self._mark is not None:
+            self._mark = 0
+
+        chunk = self.stream.read(self.chunk_size)
+        self.buffer += chunk
+        return bool(chunk)
+
+    def _unexpected_end(self):
+        return ValueError(f"Unexpected end of JSON document at offset {self.offset}")
+
+    def peek(self):
+        """Return the next non-whitespace character, or '' at the end."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(
+                f"Expected '{char}' at offset {self.offset}, found {found!r}"
+            )
+        self.pos += 1
+
+    def _skip_string(self):
+        self.pos += 1  # opening quote
+        while True:
+            match = STRING_SPECIAL_PATTERN.search(self.buffer, self.pos)
+            if match is None:
+                self.pos = len(self.buffer)
+            elif match.group() == '"':
+                self.pos = match.end()
+                return
+            elif match.end() < len(self.buffer):
+                self.pos = match.end() + 1  # escaped character
+                continue
+            else:
+                self.pos = match.start()  # refill before skipping the escape
+            if not self._fill():
+                raise self._unexpected_end()
+
+    def _skip_container(self):
+        depth = 0
+        while True:
+            match = STRUCTURAL_PATTERN.search(self.buffer, self.pos)
+            if match is None:
+                self.pos = len(self.buffer)
+                if not self._fill():
+                    raise self._unexpected_end()
+                continue
+            char = match.group()
+            if char == '"':
+                self.pos = match.start()
+                self._skip_string()
+                continue
+            self.pos = match.end()
+            depth += 1 if char in "[{" else -1
+            if depth == 0:
+                return
+
+    def _skip_literal(self):
+        while True:
+            match = LITERAL_END_PATTERN.search(self.buffer, self.pos)
+            if match is not None:
+                self.pos = match.start()
+                return
+            self.pos = len(self.buffer)
+            if not self._fill():
+                return
+
+    def skip_value(self):
+        """Move past the next value without decoding it."""
+        char = self.peek()
+        if char == "":
+            raise self._unexpected_end()
+        if char == '"':
+            self._skip_string()
+        elif char in "[{":
+            self._skip_container()
+        else:
+            self._skip_literal()
+
+    def read_value(self):
+        """Decode and return the next value."""
+        self.peek()
+        self._mark = self.pos
+        try:
+            self.skip_value()
+            text = self.buffer[self._mark : self.pos]
+        finally:
+            self._mark = None
+        return json.loads(text)
+
+    def _iter_members(self, opening, closing, read_key):
+        self.expect(opening)
+        first = True
+        while True:
+            char = self.peek()
+            if char == closing:
+                self.pos += 1
+                return
+            if not first:
+                self.expect(",")
+            first = False
+            key = None
+            if read_key:
+                key = self.read_value()
+                self.expect(":")
+            self.peek()
+            value_start = self.offset
+            yield key
+            if self.offset == value_start:
+                self.skip_value()
+
+    def iter_object(self):
+        """Yield the keys of the next object, positioned before each value."""
+        return self._iter_members("{", "}", read_key=True)
+
+    def iter_array(self):
+        """Yield once per item of the next array, positioned before the item."""
+        return self._iter_members("[", "]", read_key=False)
+
+
+def iter_array_items(stream, key, chunk_size=CHUNK_SIZE):
+    """
+    Decode the items of the array stored under a top-level key one at a time,
+    skipping every other member of the document.
+    """
+    scanner = JsonScanner(stream, chunk_size)
+    for name in scanner.iter_object():
+        if name == key:
+            for _ in scanner.iter_array():
+                yield scanner.read_value()
@@ -0,0 +1,130 @@
+import asyncio
+import contextlib
+import fcntl
+import os
+import sys
+import time
+
+from cli.async_engine import LOCK_POLL_SECONDS
+from cli.utils import INFRABOX_STATE_DIR
+
+LOCKS_DIR = INFRABOX_STATE_DIR / "locks"
+CIDR_LOCK_NAME = "cidr-reservations"
+
+
+class LockBusyError(RuntimeError):
+    """Raised when a lock is held elsewhere and waiting was not allowed."""
+
+
+def lock_path(name):
+    return LOCKS_DIR / f"{name}.lock"
+
+
+def lock_holder(path):
+    """Describe the process that last acquired a lock file."""
+    try:
+        return path.read_text().strip() or "unknown"
+    except OSError:
+        return "unknown"
+
+
+@contextlib.contextmanager
+def file_lock(name, wait=True, purpose=""):
+    """
+    Hold an advisory lock shared by every InfraBox process, and by threads
+    within one, since each call opens the lock file anew.
+
+    If the lock is held elsewhere, wait for it, or raise LockBusyError when
+    `wait` is false.
+    """
+    path = lock_path(name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            holder = lock_holder(path)
+            if not wait:
+                raise LockBusyError(
+                    f"{name} is locked by another InfraBox run ({holder})"
+                ) from None
+            print(f"INFRABOX: ⏳ Waiting for the {name} lock held by {holder}...")
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+        lock_file.truncate(0)
+        lock_file.write(
+            f"pid {os.getpid()}: {purpose or ' '.join(sys.argv[1:])}"
+            f" since {time.strftime('%H:%M:%S')}\n"
+        )
+        lock_file.flush()
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+@contextlib.asynccontextmanager
+async def file_lock_async(name, purpose=""):
+    """
+    Hold the same lock as file_lock, waiting for it without blocking the event
+    loop, so coroutines of one loop can queue behind each other.
+    """
+    with contextlib.ExitStack() as stack:
+        waiting = False
+        while True:
+            try:
+                stack.enter_context(file_lock(name, wait=False, purpose=purpose))
+                break
+            except LockBusyError:
+                if not waiting:
+                    print(
+                        f"INFRABOX: ⏳ Waiting for the {name} lock held by"
+                        f" {lock_holder(lock_path(name))}..."
+                    )
+                    waiting = True
+                await asyncio.sleep(LOCK_POLL_SECONDS)
+        yield
+
+
+@contextlib.contextmanager
+def environment_locks(environments, wait=True, purpose=""):
+    """
+    Lock environments for the duration of a run. Locks are always taken in
+    the same order, so runs on overlapping environments cannot deadlock.
+    """
+    with contextlib.ExitStack() as stack:
+        for environment in sorted(set(environments)):
+            stack.enter_context(file_lock(environment, wait, purpose))
+        yield
+
+
+def cidr_reservation_lock(wait=True, purpose=""):
+    """
+    Serialize CIDR allocation, from the overlap check until the new
+    environment's files claim its CIDRs. Take it after environment locks.
+    """
+    return file_lock(CIDR_LOCK_NAME, wait, purpose)
+
+
+@contextlib.contextmanager
+def exit_if_locked():
+    """Exit with an error when a lock taken without waiting is busy."""
+    try:
+        yield
+    except LockBusyError as e:
+        print(f"INFRABOX: ❌ {e}. Try again later, or pass --wait to queue behind it.")
+        sys.exit(1)
+
+
+@contextlib.contextmanager
+def environment_run_locks(environments, args, command):
+    """
+    Lock the environments a command works on for its whole run, honouring
+    --wait/--no-wait.
+    """
+    with exit_if_locked(), environment_locks(
+        environments,
+        wait=getattr(args, "wait", True),
+        purpose=f"{command} {' '.join(environments)}",
+    ):
+        yield
@@ -0,0 +1,136 @@
+import contextlib
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from cli.utils import (
+    ENVIRONMENTS_DIR,
+    VALID_ENVIRONMENTS,
+    get_console,
+    get_output_prefix,
+    set_console,
+    set_output_prefix,
+)
+
+
+class PrefixedOutput:
+    """
+    A stdout replacement that prefixes every complete line with the output
+    prefix of the thread that wrote it, so interleaved output stays readable.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._lock = threading.Lock()
+        self._buffers = threading.local()
+
+    def write(self, text):
+        prefix = get_output_prefix()
+        if prefix is None:
+            with self._lock:
+                return self.stream.write(text)
+
+        pending = getattr(self._buffers, "pending", "") + text
+        *lines, self._buffers.pending = pending.split("\n")
+        with self._lock:
+            for line in lines:
+                self.stream.write(f"[{prefix}] {line}\n")
+        return len(text)
+
+    def flush(self):
+        prefix = get_output_prefix()
+        pending = getattr(self._buffers, "pending", "")
+        with self._lock:
+            if prefix is not None and pending:
+                self.stream.write(f"[{prefix}] {pending}\n")
+                self._buffers.pending = ""
+            self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+@contextlib.contextmanager
+def prefixed_output():
+    if isinstance(sys.stdout, PrefixedOutput):
+        # Installed for good, e.g. by the daemon serving concurrent requests
+        yield
+        return
+    original_stdout, original_stderr = sys.stdout, sys.stderr
+    sys.stdout = PrefixedOutput(original_stdout)
+    sys.stderr = PrefixedOutput(original_stderr)
+    try:
+        yield
+    finally:
+        sys.stdout, sys.stderr = original_stdout, original_stderr
+
+
+def resolve_environments(args, environments_dir=None):
+    """
+    Return the environments selected on the command line. With --all, every
+    supported environment that has been initialized is selected.
+    """
+    if not args.all:
+        return list(args.environments)
+    environments_dir = environments_dir or ENVIRONMENTS_DIR
+    return sorted(
+        env_dir.name
+        for env_dir in environments_dir.iterdir()
+        if env_dir.is_dir() and env_dir.name in VALID_ENVIRONMENTS
+    )
+
+
+def _run_with_prefix(func, environment, console):
+    set_output_prefix(environment)
+    set_console(console)
+    try:
+        return func(environment)
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        set_output_prefix(None)
+        set_console(None)
+
+
+def run_for_environments(func, environments, jobs):
+    """
+    Call func(environment) for each environment using at most `jobs` worker
+    threads, prefixing each line of output with its environment.
+
+    Returns a dict of results and a dict of raised exceptions, both keyed by
+    environment. A single environment runs inline so exceptions propagate.
+    """
+    if len(environments) == 1:
+        return {environments[0]: func(environments[0])}, {}
+
+    results, errors = {}, {}
+    # Workers write to and prompt on the same console as the caller
+    console = get_console()
+    with prefixed_output(), ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = {
+            executor.submit(_run_with_prefix, func, environment, console): environment
+            for environment in environments
+        }
+        for future in as_completed(futures):
+            environment = futures[future]
+            try:
+                results[environment] = future.result()
+            except (Exception, SystemExit) as e:  # noqa: BLE001
+                # One failing environment must not abort the others
+                errors[environment] = e
+    return results, errors
+
+
+def describe_error(error):
+    """Describe an exception raised while processing an environment."""
+    if isinstance(error, SystemExit):
+        return f"❌ failed (exit code {error.code})"
+    return f"❌ failed: {error}"
+
+
+def print_environment_report(statuses):
+    """Print the final status of every environment of a multi-environment run."""
+    print("\nINFRABOX: 📋 Environment summary:")
+    width = max(len(environment) for environment in statuses)
+    for environment, status in statuses.items():
+        print(f"  {environment.ljust(width)}  {status}")
@@ -1,35 +1,372 @@
 import argparse
+import functools
+import sys
 
+ENVIRONMENT_CHOICES = ["dev", "stage", "prod"]
+DEFAULT_JOBS = 4
+DEFAULT_CIDR_POOL = "10.0.0.0/8"
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+DEFAULT_DRIFT_TIMEOUT = 600
 
-def parse_arguments():
-    parser = argparse.ArgumentParser(
-        prog="InfraBox CLI",
-        description="A command-line interface for managing InfraBox environments. Supports creating and destroying environments with Terraform.",
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
+
+def add_multi_environment_arguments(subparser):
+    """Accept one or more environments, or --all, with a bounded worker pool."""
+    subparser.add_argument(
+        "environments",
+        nargs="*",
+        metavar="environment",
+        help="Target environments (dev, stage, prod)",
+    )
+    subparser.add_argument(
+        "--all", action="store_true", help="Target every initialized environment"
+    )
+    subparser.add_argument(
+        "--jobs",
+        type=positive_int,
+        default=DEFAULT_JOBS,
+        help=f"Maximum number of environments processed at once (default: {DEFAULT_JOBS})",
     )
 
-    subparsers = parser.add_subparsers(dest="command", required=True)
 
-    # Create
-    create_parser = subparsers.add_parser("create", help="Create an environment")
-    create_parser.add_argument(
-        "environment", choices=["dev", "stage", "prod"], help="Target environment"
+def duration(value):
+    """Parse a duration such as 90, 90s, 15m or 2h into seconds."""
+    number, unit = value, "s"
+    if value and value[-1] in DURATION_UNITS:
+        number, unit = value[:-1], value[-1]
+    try:
+        seconds = float(number) * DURATION_UNITS[unit]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid duration: '{value}'") from None
+    if seconds < 0:
+        raise argparse.ArgumentTypeError(f"must not be negative, got {value}")
+    return seconds
+
+
+def add_refresh_ttl_argument(subparser):
+    subparser.add_argument(
+        "--refresh-ttl",
+        type=duration,
+        metavar="DURATION",
+        help="Plan without refreshing state if it was fully refreshed within"
+        " DURATION (e.g. 300, 15m, 2h)",
+    )
+
+
+def add_parallelism_arguments(subparser):
+    subparser.add_argument(
+        "--parallelism",
+        type=positive_int,
+        metavar="N",
+        help="Concurrent operations per Terraform plan and apply"
+        " (Terraform's default: 10)",
+    )
+    subparser.add_argument(
+        "--adaptive-parallelism",
+        action="store_true",
+        help="Start from the parallelism remembered for each environment (or"
+        " --parallelism) and lower or raise it after applies that were or were"
+        " not throttled",
+    )
+
+
+def add_wait_argument(subparser):
+    subparser.add_argument(
+        "--wait",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Wait for other InfraBox runs holding the same environments or"
+        " CIDR reservations to finish, or fail at once with --no-wait"
+        " (default: wait)",
+    )
+
+
+def add_rollout_arguments(subparser):
+    """Options shared by the commands that plan and apply environments."""
+    add_refresh_ttl_argument(subparser)
+    add_parallelism_arguments(subparser)
+    add_wait_argument(subparser)
+
+
+def add_trace_argument(subparser):
+    subparser.add_argument(
+        "--trace",
+        metavar="FILE",
+        help="Record per-phase timings to FILE as a Chrome trace (opens in Perfetto)",
+    )
+
+
+def common_parser():
+    """A parent parser with the options every subcommand accepts."""
+    common = argparse.ArgumentParser(add_help=False)
+    add_trace_argument(common)
+    return common
+
+
+def validate_multi_environment_arguments(subparser, args, required=True):
+    if not args.environments and not args.all:
+        if not required:
+            # No environment selects every initialized one
+            args.all = True
+            return
+        subparser.error("the following arguments are required: environment")
+    if args.environments and args.all:
+        subparser.error("argument --all: not allowed with explicit environments")
+    for environment in args.environments:
+        if environment not in ENVIRONMENT_CHOICES:
+            choices = ", ".join(f"'{c}'" for c in ENVIRONMENT_CHOICES)
+            subparser.error(
+                f"argument environment: invalid choice: '{environment}' (choose from {choices})"
+            )
+    # Preserve order while dropping duplicates such as `create dev dev`
+    args.environments = list(dict.fromkeys(args.environments))
+
+
+def add_status_parser(subparsers, common):
+    status_parser = subparsers.add_parser(
+        "status",
+        parents=[common],
+        help="Show the local state of the initialized environments",
+    )
+    status_parser.add_argument(
+        "environments",
+        nargs="*",
+        metavar="environment",
+        help="Environments to show (default: every initialized environment)",
+    )
+    status_parser.set_defaults(all=False)
+    return status_parser
+
+
+def add_state_ls_parser(state_commands, common):
+    ls_parser = state_commands.add_parser(
+        "ls", parents=[common], help="List the resource instances in the state"
+    )
+    ls_parser.add_argument("environment", choices=ENVIRONMENT_CHOICES)
+    ls_parser.add_argument(
+        "--module",
+        metavar="ADDRESS",
+        help="Only resources of this module, e.g. module.networking",
+    )
+    ls_parser.add_argument("--type", help="Only resources of this type")
+    ls_parser.add_argument(
+        "--modules",
+        action="store_true",
+        help="List the addresses of the modules instead",
+    )
+    return ls_parser
+
+
+def add_state_show_parser(state_commands, common):
+    show_parser = state_commands.add_parser(
+        "show", parents=[common], help="Show the attributes of a resource instance"
+    )
+    show_parser.add_argument("environment", choices=ENVIRONMENT_CHOICES)
+    show_parser.add_argument("address", help="Resource instance address")
+    show_parser.add_argument(
+        "--json", action="store_true", help="Print the instance as JSON"
+    )
+    return show_parser
+
+
+STATE_SUBCOMMAND_PARSERS = {
+    "ls": add_state_ls_parser,
+    "show": add_state_show_parser,
+}
+
+
+def add_state_parser(subparsers, common, state_command=None):
+    """
+    Add `state`, with only the parser of `state_command` when it is known:
+    like the top-level subcommands, the others are not worth building.
+    """
+    # Options of `state` itself would be reset by its subcommands' defaults,
+    # so the common ones belong to `ls` and `show`
+    state_parser = subparsers.add_parser(
+        "state",
+        help="Inspect the Terraform state of an environment without Terraform",
+    )
+    state_commands = state_parser.add_subparsers(dest="state_command", required=True)
+    builders = (
+        {state_command: STATE_SUBCOMMAND_PARSERS[state_command]}
+        if state_command in STATE_SUBCOMMAND_PARSERS
+        else STATE_SUBCOMMAND_PARSERS
+    )
+    for build in builders.values():
+        build(state_commands, common)
+    return state_parser
+
+
+def add_inventory_parser(subparsers, common):
+    inventory_parser = subparsers.add_parser(
+        "inventory",
+        parents=[common],
+        help="Query an index of the resources in every environment's state",
+    )
+    inventory_parser.add_argument("--type", help="Only resources of this type")
+    inventory_parser.add_argument(
+        "--module", metavar="ADDRESS", help="Only resources of this module"
+    )
+    inventory_parser.add_argument(
+        "--tag",
+        action="append",
+        dest="tags",
+        metavar="KEY[=VALUE]",
+        help="Only resources with this tag, set to VALUE if given (repeatable)",
+    )
+    inventory_parser.add_argument(
+        "--attr",
+        action="append",
+        dest="attributes",
+        metavar="NAME[=VALUE]",
+        help="Only resources with this attribute, set to VALUE if given (repeatable)",
+    )
+    inventory_parser.add_argument(
+        "--env",
+        action="append",
+        dest="environments",
+        choices=ENVIRONMENT_CHOICES,
+        help="Only resources of this environment (repeatable)",
+    )
+    inventory_parser.add_argument(
+        "--json", action="store_true", help="Print the resources as JSON"
+    )
+    inventory_parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Re-index every environment, even if its state is unchanged",
+    )
+    return inventory_parser
+
+
+def add_serve_parser(subparsers, common):
+    serve_parser = subparsers.add_parser(
+        "serve",
+        parents=[common],
+        help="Run a daemon that serves create, destroy, initialize and status requests",
+    )
+    serve_parser.add_argument(
+        "--socket",
+        metavar="PATH",
+        help="Unix socket to listen on (default: .infrabox/infrabox.sock)",
     )
+    return serve_parser
+
+
+def add_drift_parser(subparsers, common):
+    drift_parser = subparsers.add_parser(
+        "drift",
+        parents=[common],
+        help="Check environments for drift with refresh-only plans",
+    )
+    add_multi_environment_arguments(drift_parser)
+    drift_parser.add_argument(
+        "--timeout",
+        type=duration,
+        default=DEFAULT_DRIFT_TIMEOUT,
+        metavar="DURATION",
+        help="Give up on an environment whose plan takes longer than DURATION"
+        f" (default: {DEFAULT_DRIFT_TIMEOUT}s)",
+    )
+    drift_parser.add_argument(
+        "--watch",
+        type=duration,
+        metavar="INTERVAL",
+        help="Keep re-checking each environment about every INTERVAL, with"
+        " jitter spreading the checks out",
+    )
+    drift_parser.add_argument(
+        "--cached",
+        action="store_true",
+        help="Show the results of the last checks without running Terraform",
+    )
+    return drift_parser
+
+
+def add_outputs_parser(subparsers, common):
+    outputs_parser = subparsers.add_parser(
+        "outputs", parents=[common], help="Show the Terraform outputs of an environment"
+    )
+    outputs_parser.add_argument(
+        "environment", choices=ENVIRONMENT_CHOICES, help="Environment to read"
+    )
+    outputs_parser.add_argument(
+        "name", nargs="?", help="Print only this output's value"
+    )
+    outputs_parser.add_argument(
+        "--json", action="store_true", help="Print the outputs as JSON"
+    )
+    return outputs_parser
+
+
+def add_cache_parser(subparsers, common):
+    cache_parser = subparsers.add_parser(
+        "cache",
+        parents=[common],
+        help="Manage the shared Terraform provider plugin cache",
+    )
+    cache_parser.add_argument(
+        "action",
+        choices=["warm", "stats", "prune"],
+        help="warm: install locked providers, stats: show size and hit rate, "
+        "prune: evict provider versions no lock file references",
+    )
+    cache_parser.add_argument("--dry-run", action="store_true", help="Dry run only")
+    return cache_parser
+
+
+def add_create_parser(subparsers, common):
+    create_parser = subparsers.add_parser(
+        "create", parents=[common], help="Create one or more environments"
+    )
+    add_multi_environment_arguments(create_parser)
     create_parser.add_argument("--dry-run", action="store_true", help="Dry run only")
+    create_parser.add_argument(
+        "--force-init",
+        action="store_true",
+        help="Run terraform init even if its inputs are unchanged",
+    )
+    create_parser.add_argument(
+        "--module",
+        action="append",
+        dest="modules",
+        metavar="NAME",
+        help="Plan and apply only this module of the environment (repeatable)",
+    )
 
-    # Destroy
-    destroy_parser = subparsers.add_parser("destroy", help="Destroy an environment")
-    destroy_parser.add_argument(
-        "environment", choices=["dev", "stage", "prod"], help="Target environment"
+    add_rollout_arguments(create_parser)
+    return create_parser
+
+
+def add_destroy_parser(subparsers, common):
+    destroy_parser = subparsers.add_parser(
+        "destroy", parents=[common], help="Destroy one or more environments"
     )
+    add_multi_environment_arguments(destroy_parser)
     destroy_parser.add_argument("--dry-run", action="store_true", help="Dry run only")
+    destroy_parser.add_argument(
+        "--force-init",
+        action="store_true",
+        help="Run terraform init even if its inputs are unchanged",
+    )
+
+    add_rollout_arguments(destroy_parser)
+    return destroy_parser
+
 
-    # Initialize
+def add_initialize_parser(subparsers, common):
     initialize_parser = subparsers.add_parser(
-        "initialize", help="Initialize a new environment"
+        "initialize", parents=[common], help="Initialize a new environment"
     )
     initialize_parser.add_argument(
         "environment",
-        choices=["dev", "stage", "prod"],
+        choices=ENVIRONMENT_CHOICES,
         nargs="?",
         default="dev",
         help="Target environment (default: dev)",
@@ -37,5 +374,109 @@ def parse_arguments():
     initialize_parser.add_argument(
         "--dry-run", action="store_true", help="Dry run only"
     )
+    initialize_parser.add_argument(
+        "--auto-cidr",
+        nargs="?",
+        const=DEFAULT_CIDR_POOL,
+        metavar="POOL",
+        help=f"Allocate the first free VNet CIDR from POOL instead of prompting (default pool: {DEFAULT_CIDR_POOL})",
+    )
+    initialize_parser.add_argument(
+        "--prefix-length",
+        type=int,
+        default=16,
+        help="Prefix length of the allocated VNet (default: 16)",
+    )
+    initialize_parser.add_argument(
+        "--subnet-prefix-length",
+        type=int,
+        default=24,
+        help="Prefix length of the subnet carved from the VNet (default: 24)",
+    )
+
+    initialize_parser.add_argument(
+        "--spec",
+        metavar="FILE",
+        help="Initialize every environment defined in a YAML spec file without prompting",
+    )
+    initialize_parser.add_argument(
+        "--jobs",
+        type=positive_int,
+        default=DEFAULT_JOBS,
+        help=f"Maximum number of environments initialized at once with --spec (default: {DEFAULT_JOBS})",
+    )
+
+    add_wait_argument(initialize_parser)
+    return initialize_parser
+
+
+def add_regenerate_parser(subparsers, common):
+    regenerate_parser = subparsers.add_parser(
+        "regenerate",
+        parents=[common],
+        help="Re-render the Terraform files of environments whose templates changed",
+    )
+    add_multi_environment_arguments(regenerate_parser)
+    regenerate_parser.add_argument(
+        "--dry-run", action="store_true", help="Dry run only"
+    )
+    regenerate_parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Re-render every template even if its inputs are unchanged",
+    )
+    add_wait_argument(regenerate_parser)
+    return regenerate_parser
+
+
+# The parser builder of every subcommand, in the order of the help
+SUBCOMMAND_PARSERS = {
+    "create": add_create_parser,
+    "destroy": add_destroy_parser,
+    "initialize": add_initialize_parser,
+    "regenerate": add_regenerate_parser,
+    "status": add_status_parser,
+    "drift": add_drift_parser,
+    "outputs": add_outputs_parser,
+    "state": add_state_parser,
+    "inventory": add_inventory_parser,
+    "serve": add_serve_parser,
+    "cache": add_cache_parser,
+}
+
+
+def parse_arguments(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    parser = argparse.ArgumentParser(
+        prog="InfraBox CLI",
+        description="A command-line interface for managing InfraBox environments. Supports creating and destroying environments with Terraform.",
+    )
+
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    common = common_parser()
+    # Building a subcommand's parser costs more than parsing a command line,
+    # so only the requested one is built; the top-level help and errors about
+    # the command itself need them all
+    command = argv[0] if argv else None
+    builders = (
+        {command: SUBCOMMAND_PARSERS[command]}
+        if command in SUBCOMMAND_PARSERS
+        else SUBCOMMAND_PARSERS
+    )
+    if command == "state" and len(argv) > 1:
+        builders = {"state": functools.partial(add_state_parser, state_command=argv[1])}
+    subcommand_parsers = {
+        name: build(subparsers, common) for name, build in builders.items()
+    }
 
-    return parser.parse_args()
+    args = parser.parse_args(argv)
+    subcommand_parser = subcommand_parsers[args.command]
+    if args.command in ("create", "destroy", "regenerate"):
+        validate_multi_environment_arguments(subcommand_parser, args)
+    elif args.command == "status":
+        validate_multi_environment_arguments(subcommand_parser, args, required=False)
+    elif args.command == "drift":
+        validate_multi_environment_arguments(subcommand_parser, args, required=False)
+        if args.watch is not None and args.watch <= 0:
+            subcommand_parser.error("argument --watch: must be greater than 0")
+    return args
@@ -0,0 +1,105 @@
+import os
+
+from cli.json_stream import iter_array_items
+from cli.terraform_utils import terraform_show_json
+
+ROOT_MODULE = "root"
+# Terraform's own notation for each kind of change
+ACTION_SYMBOLS = {"create": "+", "update": "~", "replace": "-/+", "destroy": "-"}
+ACTION_LABELS = {
+    "create": "to create",
+    "update": "to update",
+    "replace": "to replace",
+    "destroy": "to destroy",
+}
+
+
+def change_action(actions):
+    """
+    Map the actions of a resource change to create, update, replace or
+    destroy. Returns None for no-op and read changes.
+    """
+    if "create" in actions and "delete" in actions:
+        return "replace"
+    if actions == ["create"]:
+        return "create"
+    if actions == ["update"]:
+        return "update"
+    if actions == ["delete"]:
+        return "destroy"
+    return None
+
+
+def summarize_plan(stream):
+    """
+    Count the changes of a `terraform show -json` plan by action, and by
+    module and resource type, reading one resource change at a time.
+    """
+    counts = dict.fromkeys(ACTION_SYMBOLS, 0)
+    modules = {}
+    replacements = []
+    for change in iter_array_items(stream, "resource_changes"):
+        action = change_action(change.get("change", {}).get("actions", []))
+        if action is None:
+            continue
+        counts[action] += 1
+        module = modules.setdefault(change.get("module_address", ROOT_MODULE), {})
+        by_type = module.setdefault(change["type"], dict.fromkeys(ACTION_SYMBOLS, 0))
+        by_type[action] += 1
+        if action == "replace":
+            replacements.append(change["address"])
+    return {"counts": counts, "modules": modules, "replacements": replacements}
+
+
+def load_plan_summary(env_path, plan_file):
+    """
+    Return the summary of a saved plan, or None if it cannot be produced.
+    """
+    if not plan_file or not os.path.exists(plan_file):
+        return None
+
+    try:
+        with terraform_show_json(env_path, plan_file) as stream:
+            summary = summarize_plan(stream)
+    except (OSError, RuntimeError, ValueError) as e:
+        print(f"INFRABOX: ⚠️ Could not summarize the saved plan: {e}")
+        return None
+    return summary
+
+
+def format_plan_summary(summary):
+    """Return the lines of a compact, per module and resource type summary."""
+    totals = ", ".join(
+        f"{summary['counts'][action]} {label}"
+        for action, label in ACTION_LABELS.items()
+    )
+    lines = [totals]
+
+    rows = [
+        (module, resource_type, counts)
+        for module, types in sorted(summary["modules"].items())
+        for resource_type, counts in sorted(types.items())
+    ]
+    module_width = max((len(module) for module, _, _ in rows), default=0)
+    type_width = max((len(resource_type) for _, resource_type, _ in rows), default=0)
+    for module, resource_type, counts in rows:
+        changes = " ".join(
+            f"{ACTION_SYMBOLS[action]}{count}"
+            for action, count in counts.items()
+            if count
+        )
+        lines.append(
+            f"  {module.ljust(module_width)}  {resource_type.ljust(type_width)}  {changes}"
+        )
+    return lines
+
+
+def print_plan_summary(environment, summary):
+    lines = format_plan_summary(summary)
+    print(f"\nINFRABOX: 📊 Plan summary for {environment}: {lines[0]}")
+    for line in lines[1:]:
+        print(line)
+    if summary["replacements"]:
+        print("INFRABOX: ⚠️ Resources that will be replaced:")
+        for address in summary["replacements"]:
+            print(f"  -/+ {address}")
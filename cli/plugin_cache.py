@@ -0,0 +1,144 @@
+import json
+import os
+import re
+import shutil
+from pathlib import Path
+
+from cli.locks import file_lock
+from cli.utils import INFRABOX_STATE_DIR, get_client_environ
+
+PLUGIN_CACHE_DIR = INFRABOX_STATE_DIR / "plugin-cache"
+PLUGIN_CACHE_STATS_FILE = INFRABOX_STATE_DIR / "plugin-cache-stats.json"
+# Terraform does not guarantee the plugin cache is safe for concurrent
+# installs, so everything writing to it holds this lock, across processes.
+# Reading cached providers needs no lock, as pruning spares pinned versions
+PLUGIN_CACHE_LOCK_NAME = "plugin-cache"
+LOCK_FILE_NAME = ".terraform.lock.hcl"
+LOCKED_PROVIDER_PATTERN = re.compile(
+    r'provider\s+"([^"]+)"\s*\{[^}]*?version\s*=\s*"([^"]+)"', re.DOTALL
+)
+
+
+def terraform_env(cache_dir=None):
+    """
+    Return a copy of the process environment, or of the daemon client's,
+    pointing Terraform at the shared provider plugin cache.
+    """
+    env = dict(get_client_environ() or os.environ)
+    env["TF_PLUGIN_CACHE_DIR"] = str(cache_dir or PLUGIN_CACHE_DIR)
+    return env
+
+
+def locked_providers(lock_file):
+    """
+    Return the (provider address, version) pairs pinned in a lock file.
+    """
+    lock_file = Path(lock_file)
+    if not lock_file.is_file():
+        return set()
+    return set(LOCKED_PROVIDER_PATTERN.findall(lock_file.read_text()))
+
+
+def referenced_providers(environments_dir):
+    """
+    Return every (provider address, version) pair pinned by any environment.
+    """
+    referenced = set()
+    for env_dir in Path(environments_dir).iterdir():
+        if env_dir.is_dir():
+            referenced |= locked_providers(env_dir / LOCK_FILE_NAME)
+    return referenced
+
+
+def cached_providers(cache_dir=None):
+    """
+    Map each (provider address, version) in the cache to its directory.
+
+    The cache uses Terraform's layout: <hostname>/<namespace>/<type>/<version>.
+    """
+    cache_dir = Path(cache_dir or PLUGIN_CACHE_DIR)
+    if not cache_dir.is_dir():
+        return {}
+    cached = {}
+    for version_dir in cache_dir.glob("*/*/*/*"):
+        if version_dir.is_dir():
+            address = "/".join(version_dir.relative_to(cache_dir).parts[:3])
+            cached[(address, version_dir.name)] = version_dir
+    return cached
+
+
+def directory_size(path):
+    """
+    Return the total size in bytes of all files below a directory.
+    """
+    return sum(f.stat().st_size for f in Path(path).rglob("*") if f.is_file())
+
+
+def load_stats(stats_file=None):
+    stats_file = Path(stats_file or PLUGIN_CACHE_STATS_FILE)
+    if not stats_file.is_file():
+        return {"hits": 0, "misses": 0}
+    return json.loads(stats_file.read_text())
+
+
+def record_lookups(env_path, cache_dir=None, stats_file=None):
+    """
+    Count the providers an environment is about to install as cache hits or
+    misses, based on its lock file and the current cache contents.
+    Terraform ignores a cache directory that does not exist, so it is created
+    here, right before the install.
+
+    Returns whether every provider is a hit, so that the install only reads
+    from the cache. Without a lock file the providers are unknown, so False.
+    """
+    Path(cache_dir or PLUGIN_CACHE_DIR).mkdir(parents=True, exist_ok=True)
+    required = locked_providers(Path(env_path) / LOCK_FILE_NAME)
+    if not required:
+        return False
+
+    cached = cached_providers(cache_dir)
+    stats = load_stats(stats_file)
+    for provider in required:
+        stats["hits" if provider in cached else "misses"] += 1
+
+    stats_file = Path(stats_file or PLUGIN_CACHE_STATS_FILE)
+    stats_file.parent.mkdir(parents=True, exist_ok=True)
+    stats_file.write_text(json.dumps(stats))
+    return required <= cached.keys()
+
+
+def cache_stats(cache_dir=None, stats_file=None):
+    """
+    Summarize the cache size, cached provider versions and lookup hit rate.
+    """
+    cache_dir = Path(cache_dir or PLUGIN_CACHE_DIR)
+    stats = load_stats(stats_file)
+    lookups = stats["hits"] + stats["misses"]
+    return {
+        "path": str(cache_dir),
+        "size_bytes": directory_size(cache_dir) if cache_dir.is_dir() else 0,
+        "providers": sorted(cached_providers(cache_dir)),
+        "hits": stats["hits"],
+        "misses": stats["misses"],
+        "hit_rate": stats["hits"] / lookups if lookups else None,
+    }
+
+
+def prune_cache(environments_dir, cache_dir=None, dry_run=False):
+    """
+    Evict cached provider versions that no environment lock file references.
+    Returns the evicted (provider address, version) pairs and the bytes freed.
+    """
+    referenced = referenced_providers(environments_dir)
+    evicted, freed = [], 0
+
+    with file_lock(PLUGIN_CACHE_LOCK_NAME, purpose="cache prune"):
+        for provider, version_dir in sorted(cached_providers(cache_dir).items()):
+            if provider in referenced:
+                continue
+            freed += directory_size(version_dir)
+            evicted.append(provider)
+            if not dry_run:
+                shutil.rmtree(version_dir)
+
+    return evicted, freed
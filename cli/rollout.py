@@ -0,0 +1,132 @@
+import sys
+
+from cli.adaptive_parallelism import resolve_parallelism
+from cli.parallel import describe_error, print_environment_report, run_for_environments
+from cli.plan_summary import load_plan_summary, print_plan_summary
+from cli.terraform_utils import (
+    PLAN_CHANGES,
+    PLAN_DRY_RUN,
+    PLAN_FAILED,
+    PLAN_NO_CHANGES,
+    discard_plan,
+    plan_file_path,
+    terraform_init_if_needed,
+    terraform_plan_status,
+    terraform_validate,
+)
+from cli.tracing import span
+from cli.utils import get_env_path, prompt_user_confirmation
+
+PLAN_STATUS_LABELS = {
+    PLAN_CHANGES: "⚠️ changes planned",
+    PLAN_NO_CHANGES: "✅ no changes",
+    PLAN_FAILED: "❌ plan failed",
+    PLAN_DRY_RUN: "🔍 dry run",
+}
+
+
+def plan_environment(environment, args, parallelism, destroy=False, targets=None):
+    """
+    Init, validate and plan one environment, or its destruction, into its
+    saved plan file, recording the -parallelism resolved for it in
+    `parallelism`. Returns (env_path, plan_file, plan status) for rollout.
+    """
+    env_path = get_env_path(environment)
+
+    with span("terraform init", environment):
+        terraform_init_if_needed(env_path, dry_run=args.dry_run, force=args.force_init)
+    with span("terraform validate", environment):
+        terraform_validate(env_path, dry_run=args.dry_run)
+
+    parallelism[env_path] = resolve_parallelism(
+        env_path,
+        args.parallelism,
+        args.adaptive_parallelism,
+    )
+    plan_file = plan_file_path(env_path)
+    with span("terraform plan", environment):
+        status = terraform_plan_status(
+            env_path,
+            destroy=destroy,
+            dry_run=args.dry_run,
+            plan_file=plan_file,
+            targets=targets,
+            refresh_ttl=args.refresh_ttl,
+            parallelism=parallelism[env_path],
+        )
+    return env_path, plan_file, status
+
+
+def apply_status(result):
+    if result is None or result.returncode == 0:
+        return "✅ applied"
+    return f"❌ apply failed (exit code {result.returncode})"
+
+
+def apply_plan(environment, plan, apply_func):
+    env_path, plan_file, _status = plan
+    with span("terraform apply", environment):
+        return apply_func(env_path, plan_file)
+
+
+def print_plan_summaries(pending, jobs):
+    """Summarize the saved plans of the environments with changes."""
+    if not pending:
+        return
+
+    def summarize(env):
+        with span("plan summary", env):
+            return load_plan_summary(pending[env][0], pending[env][1])
+
+    summaries, _errors = run_for_environments(summarize, list(pending), jobs)
+    for environment in pending:
+        if summaries.get(environment) is not None:
+            print_plan_summary(environment, summaries[environment])
+
+
+def rollout(environments, plan_func, apply_func, args):
+    """
+    Plan every environment in parallel, ask for one combined confirmation and
+    apply the saved plans of the environments with changes in parallel.
+
+    plan_func(environment) returns (env_path, plan_file, plan status) and
+    apply_func(env_path, plan_file) applies a saved plan.
+    """
+    if not environments:
+        print("INFRABOX: ⚠️ No initialized environments found.")
+        return
+
+    plans, errors = run_for_environments(plan_func, environments, args.jobs)
+    statuses = {env: describe_error(e) for env, e in errors.items()}
+    statuses.update({env: PLAN_STATUS_LABELS[plan[2]] for env, plan in plans.items()})
+
+    # Plan once into a file and apply exactly that plan after confirmation
+    pending = {env: plan for env, plan in plans.items() if plan[2] == PLAN_CHANGES}
+    try:
+        print_plan_summaries(pending, args.jobs)
+        if pending and len(environments) > 1:
+            print(f"\nINFRABOX: ⚠️ Changes detected in: {', '.join(pending)}")
+        if pending:
+            with span("confirmation"):
+                confirmed = prompt_user_confirmation()
+            if confirmed:
+                results, apply_errors = run_for_environments(
+                    lambda env: apply_plan(env, pending[env], apply_func),
+                    list(pending),
+                    args.jobs,
+                )
+                statuses.update(
+                    {env: describe_error(e) for env, e in apply_errors.items()}
+                )
+                statuses.update({env: apply_status(r) for env, r in results.items()})
+            else:
+                statuses.update({env: "⏭️ not applied" for env in pending})
+    finally:
+        if not args.dry_run:
+            for _env_path, plan_file, _status in plans.values():
+                discard_plan(plan_file)
+
+    if len(environments) > 1:
+        print_environment_report({env: statuses[env] for env in environments})
+        if any(status.startswith("❌") for status in statuses.values()):
+            sys.exit(1)
@@ -0,0 +1,101 @@
+import contextlib
+import hashlib
+import os
+import sys
+import threading
+from pathlib import Path
+
+import jinja2
+from jinja2.bccache import Bucket
+
+from cli.utils import INFRABOX_STATE_DIR
+
+TEMPLATE_CACHE_DIR = INFRABOX_STATE_DIR / "template-cache"
+TEMPLATE_CACHE_MAX_BYTES = 8 * 1024 * 1024
+CACHE_FILE_SUFFIX = ".jinja2cache"
+
+
+def template_cache_key(name, source, jinja_version=None):
+    """
+    Key compiled templates by template name, content, Jinja version and
+    Python version, so an upgrade of either never loads stale bytecode.
+    """
+    digest = hashlib.sha256()
+    for part in (
+        jinja_version or jinja2.__version__,
+        f"{sys.version_info.major}.{sys.version_info.minor}",
+        name,
+        source,
+    ):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class TemplateBytecodeCache(jinja2.BytecodeCache):
+    """
+    A persistent cache of compiled templates shared by every InfraBox run.
+
+    Entries are keyed by template content rather than file path and mtime,
+    and the least recently used ones are evicted once the cache grows past
+    `max_bytes`.
+    """
+
+    def __init__(self, directory=None, max_bytes=TEMPLATE_CACHE_MAX_BYTES):
+        self.directory = Path(directory or TEMPLATE_CACHE_DIR)
+        self.max_bytes = max_bytes
+
+    def _path(self, key):
+        return self.directory / f"{key}{CACHE_FILE_SUFFIX}"
+
+    def get_bucket(self, environment, name, filename, source):  # noqa: ARG002
+        key = template_cache_key(name, source)
+        bucket = Bucket(environment, key, self.get_source_checksum(source))
+        self.load_bytecode(bucket)
+        return bucket
+
+    def load_bytecode(self, bucket):
+        path = self._path(bucket.key)
+        try:
+            with open(path, "rb") as f:
+                bucket.load_bytecode(f)
+            # Mark the entry as recently used for eviction
+            os.utime(path)
+        except OSError:
+            return
+
+    def dump_bytecode(self, bucket):
+        path = self._path(bucket.key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                bucket.write_bytecode(f)
+            os.replace(tmp_path, path)
+        except OSError:
+            # The cache is an optimization; rendering works without it
+            with contextlib.suppress(OSError):
+                tmp_path.unlink()
+            return
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries until under max_bytes."""
+        entries = []
+        for path in self.directory.glob(f"*{CACHE_FILE_SUFFIX}"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _mtime, size, _path in entries)
+        for _mtime, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def clear(self):
+        for path in self.directory.glob(f"*{CACHE_FILE_SUFFIX}"):
+            path.unlink(missing_ok=True)
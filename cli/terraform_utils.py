@@ -1,71 +1,502 @@
-from cli.utils import run_cmd
+import contextlib
+import hashlib
+import io
+import json
+import os
+import re
+import tempfile
+import time
+from pathlib import Path
+
+from cli.adaptive_parallelism import ThrottleCounter, adapt_parallelism
+from cli.async_engine import run_cmd_async, run_sync
+from cli.locks import file_lock_async
+from cli.plugin_cache import PLUGIN_CACHE_LOCK_NAME, record_lookups, terraform_env
+from cli.utils import env_state_dir, run_cmd
 
 TERRAFORM_NO_CHANGES_DETECTED_CODE = 0
 TERRAFORM_CHANGES_DETECTED_CODE = 2
+PLAN_FILE_NAME = "infrabox.tfplan"
+PLAN_CHANGES = "changes"
+PLAN_NO_CHANGES = "no changes"
+PLAN_FAILED = "failed"
+PLAN_DRY_RUN = "dry run"
+INIT_FINGERPRINT_FILE = "init.fingerprint"
+LAST_REFRESH_FILE = "last_refresh"
+INIT_INPUT_FILES = (".terraform.lock.hcl", "backend.tf", "provider.tf")
+MODULE_SOURCE_PATTERN = re.compile(r'^\s*source\s*=\s*"([^"]+)"', re.MULTILINE)
+MODULE_BLOCK_PATTERN = re.compile(r'^\s*module\s+"([^"]+)"', re.MULTILINE)
 
 
-def terraform_init(env_path, dry_run=False):
+def plan_file_path(env_path):
     """
-    Initialize the Terraform environment.
+    Return the path of the saved plan file for an environment.
     """
-    return run_cmd(
-        ["terraform", "init", "-input=false"],
-        cwd=env_path,
-        dry_run=dry_run,
-        capture_output=True,
+    return os.path.join(env_path, PLAN_FILE_NAME)
+
+
+def discard_plan(plan_file):
+    """
+    Remove a saved plan file so a stale plan can never be applied.
+    """
+    if plan_file and os.path.exists(plan_file):
+        os.remove(plan_file)
+
+
+async def terraform_init_async(env_path, dry_run=False, timeout=None):
+    """
+    Initialize the Terraform environment, installing providers through the
+    shared plugin cache. The cache lock is held through the init only when it
+    may download providers into the cache, so inits that just link cached
+    providers run concurrently.
+    """
+    async with contextlib.AsyncExitStack() as stack:
+        await stack.enter_async_context(
+            file_lock_async(PLUGIN_CACHE_LOCK_NAME, purpose=f"init {env_path}")
+        )
+        if dry_run or record_lookups(env_path):
+            await stack.aclose()
+        return await run_cmd_async(
+            ["terraform", "init", "-input=false"],
+            cwd=env_path,
+            dry_run=dry_run,
+            capture_output=True,
+            env=terraform_env(),
+            timeout=timeout,
+        )
+
+
+def terraform_init(env_path, dry_run=False, timeout=None):
+    return run_sync(terraform_init_async(env_path, dry_run=dry_run, timeout=timeout))
+
+
+def module_sources(env_path):
+    """
+    Return the sorted module sources referenced by the environment's .tf files.
+    """
+    sources = set()
+    for tf_file in Path(env_path).glob("*.tf"):
+        sources.update(MODULE_SOURCE_PATTERN.findall(tf_file.read_text()))
+    return sorted(sources)
+
+
+def declared_modules(env_path):
+    """
+    Return the sorted names of the module blocks declared by the environment's
+    .tf files.
+    """
+    names = set()
+    for tf_file in Path(env_path).glob("*.tf"):
+        names.update(MODULE_BLOCK_PATTERN.findall(tf_file.read_text()))
+    return sorted(names)
+
+
+def module_targets(env_path, modules):
+    """
+    Turn module names into `module.<name>` plan targets, rejecting names the
+    environment does not declare.
+    """
+    declared = declared_modules(env_path)
+    unknown = [name for name in modules if name not in declared]
+    if unknown:
+        raise ValueError(
+            f"Unknown module(s) {', '.join(unknown)}; the environment declares:"
+            f" {', '.join(declared) or 'none'}"
+        )
+    return [f"module.{name}" for name in dict.fromkeys(modules)]
+
+
+def init_fingerprint(env_path):
+    """
+    Hash everything `terraform init` depends on: the provider lock file, the
+    backend and provider configuration, and the module tree it references.
+    """
+    env_path = Path(env_path)
+    digest = hashlib.sha256()
+
+    for name in INIT_INPUT_FILES:
+        path = env_path / name
+        digest.update(name.encode())
+        if path.is_file():
+            digest.update(path.read_bytes())
+
+    for source in module_sources(env_path):
+        digest.update(f"source:{source}".encode())
+        module_dir = (env_path / source).resolve()
+        if not source.startswith(("./", "../")) or not module_dir.is_dir():
+            continue
+        for module_file in sorted(p for p in module_dir.rglob("*") if p.is_file()):
+            digest.update(str(module_file.relative_to(module_dir)).encode())
+            digest.update(module_file.read_bytes())
+
+    return digest.hexdigest()
+
+
+def terraform_dir_intact(env_path):
+    """
+    Check that the .terraform directory still holds what init installed.
+    """
+    terraform_dir = Path(env_path) / ".terraform"
+    if not terraform_dir.is_dir():
+        return False
+    if (Path(env_path) / ".terraform.lock.hcl").is_file() and not (
+        terraform_dir / "providers"
+    ).is_dir():
+        return False
+    return (
+        not module_sources(env_path)
+        or (terraform_dir / "modules" / "modules.json").is_file()
     )
 
 
-def terraform_validate(env_path, dry_run=False):
+def terraform_init_if_needed(env_path, dry_run=False, force=False, timeout=None):
+    """
+    Run `terraform init` unless the init fingerprint still matches and the
+    .terraform directory is intact. Returns None when init was skipped.
+    """
+    fingerprint_file = env_state_dir(env_path) / INIT_FINGERPRINT_FILE
+
+    if (
+        not force
+        and not dry_run
+        and fingerprint_file.is_file()
+        and terraform_dir_intact(env_path)
+        and fingerprint_file.read_text().strip() == init_fingerprint(env_path)
+    ):
+        print(
+            "INFRABOX: ⏭️ Skipping terraform init: providers, modules and"
+            " backend are unchanged (use --force-init to override)."
+        )
+        return None
+
+    if not dry_run:
+        fingerprint_file.unlink(missing_ok=True)
+    result = terraform_init(env_path, dry_run=dry_run, timeout=timeout)
+
+    if not dry_run and result.returncode == 0:
+        # Fingerprint after init, since init may create or update the lock file
+        fingerprint_file.parent.mkdir(parents=True, exist_ok=True)
+        fingerprint_file.write_text(init_fingerprint(env_path))
+    return result
+
+
+def last_full_refresh(env_path):
+    """Return when the environment's state was last fully refreshed, or None."""
+    try:
+        return float((env_state_dir(env_path) / LAST_REFRESH_FILE).read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def record_full_refresh(env_path, when=None):
+    refresh_file = env_state_dir(env_path) / LAST_REFRESH_FILE
+    refresh_file.parent.mkdir(parents=True, exist_ok=True)
+    refresh_file.write_text(str(time.time() if when is None else when))
+
+
+def plan_refresh_mode(env_path, refresh_ttl=None):
+    """
+    Decide whether a plan refreshes state against the provider. Within
+    `refresh_ttl` seconds of the last full refresh the refresh is skipped.
+    Prints the chosen mode and returns True for a full refresh.
+    """
+    last_refresh = last_full_refresh(env_path)
+    age = None if last_refresh is None else time.time() - last_refresh
+    if refresh_ttl is not None and age is not None and 0 <= age < refresh_ttl:
+        print(
+            f"INFRABOX: ⏩ Planning without refresh: state was fully refreshed"
+            f" {age:.0f}s ago (--refresh-ttl {refresh_ttl:.0f}s)."
+        )
+        return False
+    if refresh_ttl is not None:
+        reason = "never refreshed" if age is None else f"last refreshed {age:.0f}s ago"
+        print(f"INFRABOX: 🔄 Planning with a full refresh ({reason}).")
+    else:
+        print("INFRABOX: 🔄 Planning with a full refresh.")
+    return True
+
+
+async def terraform_validate_async(env_path, dry_run=False, timeout=None):
     """
     Validate the Terraform configuration.
     """
-    return run_cmd(
-        ["terraform", "validate"], cwd=env_path, dry_run=dry_run, capture_output=True
+    return await run_cmd_async(
+        ["terraform", "validate"],
+        cwd=env_path,
+        dry_run=dry_run,
+        capture_output=True,
+        env=terraform_env(),
+        timeout=timeout,
+    )
+
+
+def terraform_validate(env_path, dry_run=False, timeout=None):
+    return run_sync(
+        terraform_validate_async(env_path, dry_run=dry_run, timeout=timeout)
     )
 
 
-def terraform_plan(env_path, destroy=False, dry_run=False):
+async def terraform_plan_async(  # noqa: PLR0913
+    env_path,
+    destroy=False,
+    dry_run=False,
+    plan_file=None,
+    timeout=None,
+    *,
+    targets=None,
+    refresh=True,
+    parallelism=None,
+    refresh_only=False,
+):
     """
-    Generate and show an execution plan.
+    Generate and show an execution plan, optionally saving it to a plan file.
+
+    With `targets`, only those resource or module addresses are planned. A
+    saved targeted plan carries its targets, so applying it needs no -target.
+    With `refresh=False` the state is not refreshed against the provider.
+    With `refresh_only`, only the differences between the state and the real
+    infrastructure, i.e. drift, are planned.
     """
     cmd = ["terraform", "plan", "-detailed-exitcode"]
     if destroy:
         cmd.append("-destroy")
-    return run_cmd(cmd, cwd=env_path, dry_run=dry_run, capture_output=False)
+    if refresh_only:
+        cmd.append("-refresh-only")
+    if plan_file:
+        cmd.append(f"-out={plan_file}")
+    if not refresh:
+        cmd.append("-refresh=false")
+    if parallelism:
+        cmd.append(f"-parallelism={parallelism}")
+    cmd.extend(f"-target={target}" for target in targets or ())
+    return await run_cmd_async(
+        cmd,
+        cwd=env_path,
+        dry_run=dry_run,
+        capture_output=False,
+        env=terraform_env(),
+        timeout=timeout,
+    )
+
+
+def terraform_plan(  # noqa: PLR0913
+    env_path,
+    destroy=False,
+    dry_run=False,
+    plan_file=None,
+    timeout=None,
+    *,
+    targets=None,
+    refresh=True,
+    parallelism=None,
+    refresh_only=False,
+):
+    return run_sync(
+        terraform_plan_async(
+            env_path,
+            destroy=destroy,
+            dry_run=dry_run,
+            plan_file=plan_file,
+            timeout=timeout,
+            targets=targets,
+            refresh=refresh,
+            parallelism=parallelism,
+            refresh_only=refresh_only,
+        )
+    )
 
 
-def terraform_state_has_changes(env_path, destroy=False, dry_run=False):
+@contextlib.contextmanager
+def terraform_show_json(env_path, plan_file):
     """
-    Check if there are changes in the Terraform state.
+    Yield the JSON form of a saved plan as a text stream, so that it can be
+    read incrementally instead of being held in memory.
+    """
+    with tempfile.TemporaryFile() as output:
+        result = run_sync(
+            run_cmd_async(
+                ["terraform", "show", "-json", plan_file],
+                cwd=env_path,
+                env=terraform_env(),
+                stdout=output,
+            )
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"terraform show exited with code {result.returncode}")
+        output.seek(0)
+        yield io.TextIOWrapper(output, encoding="utf-8")
+
+
+def terraform_output_json(env_path):
+    """Return the environment's root module outputs as `terraform output -json` does."""
+    output = io.BytesIO()
+    result = run_sync(
+        run_cmd_async(
+            ["terraform", "output", "-json"],
+            cwd=env_path,
+            env=terraform_env(),
+            stdout=output,
+        )
+    )
+    if result.returncode != 0:
+        raise RuntimeError(
+            f"terraform output exited with code {result.returncode}:"
+            f" {result.stderr.strip()}"
+        )
+    return json.loads(output.getvalue() or b"{}")
+
+
+def terraform_plan_status(  # noqa: PLR0913
+    env_path,
+    destroy=False,
+    dry_run=False,
+    plan_file=None,
+    *,
+    targets=None,
+    refresh_ttl=None,
+    parallelism=None,
+):
     """
-    result = terraform_plan(env_path, destroy=destroy, dry_run=dry_run)
+    Plan the environment and classify the outcome as one of PLAN_CHANGES,
+    PLAN_NO_CHANGES, PLAN_FAILED or PLAN_DRY_RUN.
+
+    When a plan file is given, the plan is saved to it so that it can later be
+    applied as-is with `terraform_apply` instead of being computed again.
+    Within `refresh_ttl` seconds of the last full refresh, state is not
+    refreshed; every successful untargeted full-refresh plan is recorded.
+    """
+    refresh = plan_refresh_mode(env_path, refresh_ttl)
+    result = terraform_plan(
+        env_path,
+        destroy=destroy,
+        dry_run=dry_run,
+        plan_file=plan_file,
+        targets=targets,
+        refresh=refresh,
+        parallelism=parallelism,
+    )
 
     if dry_run:
         print("\nINFRABOX: 🔍 Dry-run mode: Terraform state changes not checked.")
-        cmd = ["terraform", "apply", "-auto-approve"]
-        if destroy:
-            cmd.append("-destroy")
-        run_cmd(cmd, cwd=env_path, dry_run=True, capture_output=False)
-        return False
+        run_cmd(
+            _apply_cmd(destroy, plan_file, parallelism),
+            cwd=env_path,
+            dry_run=True,
+            capture_output=False,
+            env=terraform_env(),
+        )
+        return PLAN_DRY_RUN
+    if (
+        refresh
+        and not targets
+        and result.returncode
+        in (
+            TERRAFORM_NO_CHANGES_DETECTED_CODE,
+            TERRAFORM_CHANGES_DETECTED_CODE,
+        )
+    ):
+        record_full_refresh(env_path)
     if result.returncode == TERRAFORM_NO_CHANGES_DETECTED_CODE:
         print("INFRABOX: ✅ No changes detected.")
-        return False
+        return PLAN_NO_CHANGES
     elif result.returncode == TERRAFORM_CHANGES_DETECTED_CODE:
         print("INFRABOX: ⚠️ Changes detected.")
-        return True
+        return PLAN_CHANGES
     else:
         print("INFRABOX: ❌ Error occurred while checking for changes.")
-        return False
+        return PLAN_FAILED
+
+
+def terraform_state_has_changes(env_path, destroy=False, dry_run=False, plan_file=None):
+    """
+    Check if there are changes in the Terraform state.
+    """
+    return (
+        terraform_plan_status(
+            env_path, destroy=destroy, dry_run=dry_run, plan_file=plan_file
+        )
+        == PLAN_CHANGES
+    )
 
 
-def terraform_apply(env_path, destroy=False, dry_run=False):
+async def terraform_apply_async(  # noqa: PLR0913
+    env_path,
+    destroy=False,
+    dry_run=False,
+    plan_file=None,
+    timeout=None,
+    *,
+    parallelism=None,
+    adaptive_parallelism=False,
+):
     """
     Apply the changes required to reach the desired state of the configuration.
+
+    When a plan file is given, exactly that saved plan is applied and no new
+    refresh or plan is performed. Terraform rejects the plan if the state has
+    changed since it was written; the stale file is discarded in that case.
+
+    With adaptive parallelism, `parallelism` is the value resolve_parallelism
+    returned for the plan; the output is watched for API throttling and the
+    parallelism of the environment's next run is lowered, or raised after a
+    successful apply.
     """
-    cmd = ["terraform", "apply", "-auto-approve"]
+    throttled = ThrottleCounter() if adaptive_parallelism else None
+    result = await run_cmd_async(
+        _apply_cmd(destroy, plan_file, parallelism),
+        cwd=env_path,
+        dry_run=dry_run,
+        capture_output=False,
+        env=terraform_env(),
+        timeout=timeout,
+        on_line=throttled,
+    )
+    if throttled is not None and not dry_run:
+        adapt_parallelism(
+            env_path, parallelism, throttled.count, succeeded=result.returncode == 0
+        )
+
+    if plan_file and not dry_run and result.returncode != 0:
+        discard_plan(plan_file)
+        print(
+            "INFRABOX: ❌ Applying the saved plan failed. If the state changed since"
+            " it was planned, the plan is stale and has been discarded; re-run the"
+            " command to plan again."
+        )
+    return result
 
+
+def terraform_apply(  # noqa: PLR0913
+    env_path,
+    destroy=False,
+    dry_run=False,
+    plan_file=None,
+    timeout=None,
+    *,
+    parallelism=None,
+    adaptive_parallelism=False,
+):
+    return run_sync(
+        terraform_apply_async(
+            env_path,
+            destroy=destroy,
+            dry_run=dry_run,
+            plan_file=plan_file,
+            timeout=timeout,
+            parallelism=parallelism,
+            adaptive_parallelism=adaptive_parallelism,
+        )
+    )
+
+
+def _apply_cmd(destroy=False, plan_file=None, parallelism=None):
+    options = [f"-parallelism={parallelism}"] if parallelism else []
+    if plan_file:
+        # A saved plan already encodes whether it destroys, and applying it
+        # never prompts for approval.
+        return ["terraform", "apply", "-input=false", *options, plan_file]
+
+    cmd = ["terraform", "apply", "-auto-approve", *options]
     if destroy:
         cmd.append("-destroy")
-
-    return run_cmd(cmd, cwd=env_path, dry_run=dry_run, capture_output=False)
+    return cmd
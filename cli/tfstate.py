@@ -0,0 +1,179 @@
+"""
+A streaming reader for the local Terraform state of an environment.
+
+State files are read incrementally with JsonScanner, one resource at a time,
+so even large states are never loaded whole, and instance attributes are
+only decoded when they are asked for:
+
+    for instance in iter_resources(env_path, attributes=True):
+        print(instance["address"], instance["attributes"].get("location"))
+"""
+
+import json
+from pathlib import Path
+
+from cli.json_stream import CHUNK_SIZE, JsonScanner
+
+STATE_FILE_NAME = "terraform.tfstate"
+IDENTITY_KEYS = ("lineage", "serial")
+RESOURCE_KEYS = ("module", "mode", "type", "name", "provider")
+INSTANCE_KEYS = ("index_key", "deposed")
+ATTRIBUTE_KEYS = ("attributes", "sensitive_attributes")
+SENSITIVE_VALUE = "(sensitive value)"
+
+
+def state_file_path(env_path):
+    """Return the path of an environment's local Terraform state."""
+    return Path(env_path) / STATE_FILE_NAME
+
+
+def read_state_identity(state_file):
+    """
+    Return the lineage and serial of a state file. Terraform writes them
+    before outputs and resources, so only the head of the file is read.
+    Together they change whenever the state does.
+    """
+    identity = {}
+    with open(state_file) as f:
+        scanner = JsonScanner(f)
+        for key in scanner.iter_object():
+            if key in IDENTITY_KEYS:
+                identity[key] = scanner.read_value()
+                if len(identity) == len(IDENTITY_KEYS):
+                    break
+    return identity.get("lineage"), identity.get("serial")
+
+
+def instance_address(resource, index_key=None, deposed=None):
+    """
+    Build the address Terraform shows for a resource instance. A deposed
+    object, kept while create_before_destroy replaces it, shares its instance's
+    address, so it is told apart the way Terraform's plans do.
+    """
+    parts = [resource["module"]] if resource.get("module") else []
+    if resource.get("mode") == "data":
+        parts.append("data")
+    parts += [resource["type"], resource["name"]]
+    address = ".".join(parts)
+    if index_key is not None:
+        address += f"[{json.dumps(index_key)}]"
+    if deposed is not None:
+        address += f" (deposed object {deposed})"
+    return address
+
+
+def _read_instance(scanner, resource, wanted):
+    instance = {}
+    # Terraform writes the index key and deposed key first, so the address is
+    # known by the time the attributes are reached
+    for key in scanner.iter_object():
+        if key in INSTANCE_KEYS or (
+            key in ATTRIBUTE_KEYS
+            and wanted(
+                instance_address(
+                    resource, instance.get("index_key"), instance.get("deposed")
+                )
+            )
+        ):
+            instance[key] = scanner.read_value()
+    return instance
+
+
+def _read_resource(scanner, wanted):
+    resource, instances = {}, []
+    for key in scanner.iter_object():
+        if key in RESOURCE_KEYS:
+            resource[key] = scanner.read_value()
+        elif key == "instances":
+            instances = [
+                _read_instance(scanner, resource, wanted) for _ in scanner.iter_array()
+            ]
+    return resource, instances
+
+
+def iter_state_resources(stream, attributes=False, chunk_size=CHUNK_SIZE):
+    """
+    Yield every resource instance of a state document read from `stream`:
+    its address, module address (None in the root module), mode, type, name,
+    provider, index key and deposed key (None for current objects).
+
+    With `attributes`, either True or a predicate on the address, its
+    attributes and the names of its sensitive ones are decoded too; the
+    attributes of other instances are skipped unparsed.
+    """
+    wanted = attributes if callable(attributes) else lambda _address: attributes
+    scanner = JsonScanner(stream, chunk_size)
+    for key in scanner.iter_object():
+        if key != "resources":
+            continue
+        for _ in scanner.iter_array():
+            resource, instances = _read_resource(scanner, wanted)
+            for instance in instances:
+                entry = {
+                    "address": instance_address(
+                        resource, instance.get("index_key"), instance.get("deposed")
+                    ),
+                    "module": resource.get("module"),
+                    "mode": resource.get("mode", "managed"),
+                    "type": resource.get("type"),
+                    "name": resource.get("name"),
+                    "provider": resource.get("provider"),
+                    "index_key": instance.get("index_key"),
+                    "deposed": instance.get("deposed"),
+                }
+                if "attributes" in instance:
+                    entry["attributes"] = instance["attributes"] or {}
+                    entry["sensitive"] = sensitive_attribute_names(
+                        instance.get("sensitive_attributes")
+                    )
+                yield entry
+
+
+def sensitive_attribute_names(paths):
+    """Return the top-level attributes that Terraform marks as sensitive."""
+    names = set()
+    for path in paths or ():
+        step = path[0] if isinstance(path, list) and path else path
+        if isinstance(step, dict) and step.get("type") == "get_attr":
+            names.add(step.get("value"))
+    return sorted(names)
+
+
+def iter_resources(env_path, attributes=False):
+    """Yield the resource instances in an environment's state."""
+    with open(state_file_path(env_path)) as f:
+        yield from iter_state_resources(f, attributes)
+
+
+def resource_addresses(env_path, module=None, resource_type=None):
+    """List the resource instance addresses in an environment's state."""
+    return [
+        instance["address"]
+        for instance in iter_resources(env_path)
+        if (module is None or instance["module"] == module)
+        and (resource_type is None or instance["type"] == resource_type)
+    ]
+
+
+def module_addresses(env_path):
+    """List the addresses of the modules with resources in the state."""
+    return sorted(
+        {
+            instance["module"]
+            for instance in iter_resources(env_path)
+            if instance["module"]
+        }
+    )
+
+
+def show_resource(env_path, address):
+    """
+    Return the resource instance at `address` with its attributes, or None.
+    Only its attributes are decoded, and reading stops once it is found.
+    """
+    for instance in iter_resources(
+        env_path, attributes=lambda candidate: candidate == address
+    ):
+        if instance["address"] == address:
+            return instance
+    return None
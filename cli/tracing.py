@@ -0,0 +1,133 @@
+import contextlib
+import json
+import os
+import threading
+import time
+
+from cli.utils import get_output_prefix
+
+# Recorded spans, or None while tracing is off so spans cost nothing
+_spans = None
+_origin_ns = 0
+_spans_lock = threading.Lock()
+
+
+def start_tracing():
+    """Start recording spans, discarding any recorded before."""
+    global _spans, _origin_ns  # noqa: PLW0603
+    with _spans_lock:
+        _spans = []
+        _origin_ns = time.perf_counter_ns()
+
+
+def stop_tracing():
+    """Stop recording and return the recorded spans."""
+    global _spans
+    with _spans_lock:
+        spans, _spans = _spans or [], None
+    return spans
+
+
+def tracing_enabled():
+    return _spans is not None
+
+
+@contextlib.contextmanager
+def span(name, environment=None):
+    """
+    Record how long the enclosed block takes as a phase called `name`.
+    The environment defaults to the output prefix of the current thread.
+    """
+    if _spans is None:
+        yield
+        return
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        end = time.perf_counter_ns()
+        record = {
+            "name": name,
+            "environment": environment or get_output_prefix(),
+            "start_ns": start - _origin_ns,
+            "duration_ns": end - start,
+            "thread": threading.get_ident(),
+        }
+        with _spans_lock:
+            if _spans is not None:
+                _spans.append(record)
+
+
+def chrome_trace(spans):
+    """
+    Convert spans to the Chrome trace-event format, which Perfetto and
+    chrome://tracing open directly. Each thread becomes a track named after
+    the environment it worked on.
+    """
+    pid = os.getpid()
+    events, thread_names = [], {}
+    for record in spans:
+        if record["environment"]:
+            thread_names.setdefault(record["thread"], record["environment"])
+        args = {"environment": record["environment"]} if record["environment"] else {}
+        events.append(
+            {
+                "name": record["name"],
+                "cat": "infrabox",
+                "ph": "X",
+                "ts": record["start_ns"] / 1000,
+                "dur": record["duration_ns"] / 1000,
+                "pid": pid,
+                "tid": record["thread"],
+                "args": args,
+            }
+        )
+    for thread, name in thread_names.items():
+        events.append(
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": pid,
+                "tid": thread,
+                "args": {"name": name},
+            }
+        )
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def write_trace(spans, trace_file):
+    with open(trace_file, "w") as f:
+        json.dump(chrome_trace(spans), f)
+
+
+def phase_durations(spans):
+    """
+    Total the spans by phase and environment, in the order the phases began.
+    Returns (phase, environment, calls, total seconds) rows.
+    """
+    totals = {}
+    for record in sorted(spans, key=lambda r: r["start_ns"]):
+        key = (record["name"], record["environment"] or "")
+        calls, total = totals.get(key, (0, 0))
+        totals[key] = (calls + 1, total + record["duration_ns"])
+    return [
+        (phase, environment, calls, total / 1e9)
+        for (phase, environment), (calls, total) in totals.items()
+    ]
+
+
+def print_phase_table(spans):
+    rows = phase_durations(spans)
+    if not rows:
+        return
+    print("\nINFRABOX: ⏱️ Phase timings:")
+    phase_width = max(len("Phase"), *(len(row[0]) for row in rows))
+    env_width = max(len("Environment"), *(len(row[1]) for row in rows))
+    print(
+        f"  {'Phase'.ljust(phase_width)}  {'Environment'.ljust(env_width)}  Calls  Seconds"
+    )
+    for phase, environment, calls, seconds in rows:
+        print(
+            f"  {phase.ljust(phase_width)}  {environment.ljust(env_width)}"
+            f"  {calls:>5}  {seconds:>7.3f}"
+        )
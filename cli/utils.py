@@ -1,15 +1,35 @@
 import ipaddress
+import logging
 import os
 import re
-import subprocess  # nosec B404
 import sys
+import threading
+from logging.handlers import RotatingFileHandler
 from pathlib import Path
 
+from cli.cidr_registry import CidrRegistry
+
 VALID_ENVIRONMENTS = {"dev", "stage", "prod"}
 INFRA_ROOT = Path(__file__).resolve().parent.parent
 ENVIRONMENTS_DIR = INFRA_ROOT / "environments"
+INFRABOX_STATE_DIR = INFRA_ROOT / ".infrabox"
+DAEMON_SOCKET_PATH = INFRABOX_STATE_DIR / "infrabox.sock"
+# Set to 1 to run every command in the calling process, even with a daemon up
+NO_DAEMON_VARIABLE = "INFRABOX_NO_DAEMON"
 DEFAULT_VNET = "10.0.0.0/16"
 DEFAULT_SUBNET = "10.0.1.0/24"
+ENV_STATE_DIR_NAME = ".infrabox"
+COMMAND_LOG_FILE_NAME = "commands.log"
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUP_COUNT = 3
+OUTPUT_TAIL_LINES = 200
+
+_output_context = threading.local()
+_loggers_lock = threading.Lock()
+# CIDR registries kept in memory by a long-lived process, or None to load
+# the registry from disk on every use
+_warm_registries = None
+_registry_lock = threading.RLock()
 
 
 def sanitize_input(value: str) -> str:
@@ -42,6 +62,11 @@ def get_env_path(env):
     return env_path
 
 
+def env_state_dir(env_path) -> Path:
+    """Return the directory holding InfraBox metadata for an environment."""
+    return Path(env_path) / ENV_STATE_DIR_NAME
+
+
 def validate_cidr(cidr: str) -> str:
     """Ensure the given CIDR is valid."""
     try:
@@ -56,66 +81,164 @@ def check_cidr_overlap(new_cidr: str, current_env: str, environments_dir: Path)
     )
     new_network = ipaddress.IPv4Network(new_cidr, strict=True)
 
-    for env_dir in environments_dir.iterdir():
-        if not env_dir.is_dir() or env_dir.name == current_env:
-            continue
-
-        variables_file = env_dir / "variables.tf"
-        if not variables_file.exists():
-            continue
-
-        content = variables_file.read_text()
-        matches = re.findall(r'vnet_cidr\s*=\s*["\']([^"\']+)["\']', content)
-
-        for match in matches:
-            existing_net = ipaddress.IPv4Network(match, strict=True)
-            if new_network.overlaps(existing_net):
-                print(
-                    f"INFRABOX: Overlap found: {new_network} overlaps {existing_net} in {env_dir.name}"
-                )
-                raise ValueError(
-                    f"CIDR {new_network} overlaps with {existing_net} in environment '{env_dir.name}'"
-                )
-
-
-def run_cmd(cmd, cwd, dry_run=False, capture_output=True):
-    """Run a command in a specified directory."""
-    print(f"\nINFRABOX: 📦 Running command: {' '.join(cmd)} in {cwd}")
-    if dry_run:
-        print("INFRABOX: 🔍 Dry-run mode: command not executed.")
-        return
-
-    # subprocess call is safe — shell=False and cmd is a validated list
-
-    result = subprocess.run(
-        cmd,
-        cwd=cwd,
-        capture_output=capture_output,
-        text=True,
-        shell=False,
-        check=False,
-    )  # nosec: B603
-    if capture_output:
-        print(result.stdout)
-    return result
+    with _registry_lock:
+        registry = load_cidr_registry(environments_dir)
+        overlap = registry.find_overlap(str(new_network), exclude_env=current_env)
+    if overlap is not None:
+        env_name, existing_net = overlap
+        print(
+            f"INFRABOX: Overlap found: {new_network} overlaps {existing_net} in {env_name}"
+        )
+        raise ValueError(
+            f"CIDR {new_network} overlaps with {existing_net} in environment '{env_name}'"
+        )
+
+
+def allocate_environment_cidrs(  # noqa: PLR0913
+    pool: str,
+    vnet_prefix_length: int,
+    subnet_prefix_length: int,
+    current_env: str,
+    environments_dir: Path,
+    *,
+    registry=None,
+):
+    """
+    Pick the first free VNet block in the pool and carve a subnet from it.
+    An already loaded `registry` may be passed to allocate from it.
+    """
+    if subnet_prefix_length < vnet_prefix_length:
+        raise ValueError(
+            f"Subnet prefix /{subnet_prefix_length} is larger than VNet prefix /{vnet_prefix_length}"
+        )
+    with _registry_lock:
+        registry = registry or load_cidr_registry(environments_dir)
+        vnet_cidr = registry.allocate(pool, vnet_prefix_length, exclude_env=current_env)
+    subnet = next(
+        ipaddress.IPv4Network(vnet_cidr).subnets(new_prefix=subnet_prefix_length)
+    )
+    return vnet_cidr, str(subnet)
+
+
+def register_environment_cidrs(environment: str, cidrs, environments_dir: Path) -> None:
+    """Record a new environment's CIDRs in the registry manifest."""
+    with _registry_lock:
+        load_cidr_registry(environments_dir).register(environment, cidrs)
+
+
+def keep_cidr_registries_warm():
+    """
+    Keep loaded CIDR registries in memory, refreshing them from the changed
+    environments on each use instead of reading the manifest again.
+    """
+    global _warm_registries  # noqa: PLW0603
+    with _registry_lock:
+        if _warm_registries is None:
+            _warm_registries = {}
+
+
+def load_cidr_registry(environments_dir: Path) -> CidrRegistry:
+    """Return the CIDR registry of an environments directory."""
+    if _warm_registries is None:
+        return CidrRegistry.load(environments_dir)
+    key = Path(environments_dir).resolve()
+    with _registry_lock:
+        registry = _warm_registries.get(key)
+        if registry is None:
+            registry = _warm_registries[key] = CidrRegistry.load(key)
+        elif registry.refresh():
+            registry.save()
+        return registry
+
+
+def get_output_prefix():
+    """Return the output prefix of the current thread, if any."""
+    return getattr(_output_context, "prefix", None)
+
+
+def set_output_prefix(prefix):
+    """Prefix output printed by the current thread, e.g. with its environment."""
+    _output_context.prefix = prefix
+
+
+def get_console():
+    """Return the console of the current thread's client, if any."""
+    return getattr(_output_context, "console", None)
+
+
+def set_console(console):
+    """
+    Route the current thread's output and prompts to a remote client's
+    console instead of the terminal.
+    """
+    _output_context.console = console
+
+
+def get_client_environ():
+    """
+    Return the environment variables of the current thread's client, if any.
+    Commands run for a client must see its environment, not the daemon's.
+    """
+    return getattr(get_console(), "environ", None)
+
+
+def read_input(prompt):
+    """Read a line of input from the current client's console or the terminal."""
+    console = get_console()
+    if console is not None:
+        return console.input(prompt)
+    return input(prompt)
+
+
+def command_logger(log_file):
+    """Return a logger writing to a size-rotated log file."""
+    log_file = Path(log_file).resolve()
+    logger = logging.getLogger(f"infrabox.commands.{log_file}")
+    with _loggers_lock:
+        if not logger.handlers:
+            log_file.parent.mkdir(parents=True, exist_ok=True)
+            handler = RotatingFileHandler(
+                log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT
+            )
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+    return logger
+
+
+def run_cmd(cmd, cwd, dry_run=False, capture_output=True, env=None):
+    """
+    Run a command in a specified directory, optionally with a custom environment.
+
+    This is a blocking wrapper around cli.async_engine.run_cmd_async: with
+    capture_output the output is streamed live and logged, and the result
+    holds the tail of it. Otherwise the command writes straight to the terminal.
+    """
+    # Imported here because the engine builds on the helpers in this module
+    from cli.async_engine import run_cmd_async, run_sync  # noqa: PLC0415
+
+    return run_sync(
+        run_cmd_async(cmd, cwd, dry_run=dry_run, capture_output=capture_output, env=env)
+    )
 
 
 def prompt_input(prompt, default=""):
     """Ask user for input with a default fallback."""
-    response = input(f"{prompt} [{default}]: ").strip()
+    response = read_input(f"{prompt} [{default}]: ").strip()
     return response or default
 
 
 def prompt_with_default(prompt_text: str, default: str) -> str:
     """Prompt user for input, return sanitized string or default."""
-    user_input = input(f"{prompt_text} [default: {default}]: ").strip()
+    user_input = read_input(f"{prompt_text} [default: {default}]: ").strip()
     return sanitize_input(user_input) if user_input else default
 
 
 def prompt_user_confirmation(message="INFRABOX: Proceed?", default=False):
     """Prompt the user for confirmation with a default option."""
     suffix = "[Y/n]" if default else "[y/N]"
-    answer = input(f"{message} {suffix}: ").strip().lower()
+    answer = read_input(f"{message} {suffix}: ").strip().lower()
     if not answer:
         return default
     return answer in ("y", "yes")
@@ -1,20 +1,79 @@
 # CLI entry point for InfraBox
 
-from cli.commands import create, destroy, initialize
+import importlib
+import os
+import sys
+
 from cli.parser import parse_arguments
+from cli.tracing import (
+    print_phase_table,
+    span,
+    start_tracing,
+    stop_tracing,
+    write_trace,
+)
+from cli.utils import DAEMON_SOCKET_PATH, NO_DAEMON_VARIABLE
+
+# Module implementing each subcommand, imported only when the command runs so
+# startup does not pay for Jinja2, asyncio or other commands' dependencies
+COMMANDS = {
+    "create": "cli.commands.create",
+    "destroy": "cli.commands.destroy",
+    "initialize": "cli.commands.initialize",
+    "cache": "cli.commands.cache",
+    "regenerate": "cli.commands.regenerate",
+    "status": "cli.commands.status",
+    "drift": "cli.commands.drift",
+    "outputs": "cli.commands.outputs",
+    "state": "cli.commands.state",
+    "inventory": "cli.commands.inventory",
+    "serve": "cli.daemon",
+}
+# Commands a running daemon serves instead of this process
+DAEMON_COMMANDS = ("create", "destroy", "initialize", "status")
+
+
+def run_command(args):
+    module_name = COMMANDS.get(args.command)
+    if module_name is None:
+        print("INFRABOX: ❌ Unsupported command.")
+        return
+    importlib.import_module(module_name).run(args)
+
+
+def forward_to_daemon(args, argv):
+    """
+    Run the command in the InfraBox daemon if one is running. Returns its
+    exit code, or None if the command must run in this process.
+    """
+    if (
+        args.command not in DAEMON_COMMANDS
+        or args.trace
+        or os.environ.get(NO_DAEMON_VARIABLE) == "1"
+        or not DAEMON_SOCKET_PATH.exists()
+    ):
+        return None
+    client = importlib.import_module("cli.daemon_client")
+    return client.forward_to_daemon(argv, DAEMON_SOCKET_PATH)
 
 
 def main():
     args = parse_arguments()
+    code = forward_to_daemon(args, sys.argv[1:])
+    if code is not None:
+        sys.exit(code)
 
-    if args.command == "create":
-        create.run(args)
-    elif args.command == "destroy":
-        destroy.run(args)
-    elif args.command == "initialize":
-        initialize.run(args)
-    else:
-        print("INFRABOX: ❌ Unsupported command.")
+    if args.trace:
+        start_tracing()
+    try:
+        with span(args.command):
+            run_command(args)
+    finally:
+        if args.trace:
+            spans = stop_tracing()
+            write_trace(spans, args.trace)
+            print(f"\nINFRABOX: 🧭 Trace written to {args.trace}")
+            print_phase_table(spans)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,14 @@
+import pytest
+
+from cli import locks, template_cache
+
+
+@pytest.fixture(autouse=True)
+def isolated_state_dirs(monkeypatch, tmp_path_factory):
+    """Keep tests out of the repository's own .infrabox directory."""
+    monkeypatch.setattr(locks, "LOCKS_DIR", tmp_path_factory.mktemp("locks"))
+    monkeypatch.setattr(
+        template_cache,
+        "TEMPLATE_CACHE_DIR",
+        tmp_path_factory.mktemp("template-cache"),
+    )
@@ -0,0 +1,71 @@
+from types import SimpleNamespace
+
+import pytest
+
+import cli.commands.cache as cache_cmd
+from cli import locks
+
+
+@pytest.fixture
+def environments_dir(monkeypatch, tmp_path):
+    (tmp_path / "dev").mkdir()
+    (tmp_path / "dev" / "main.tf").write_text("")
+    (tmp_path / "empty").mkdir()
+    monkeypatch.setattr(cache_cmd, "ENVIRONMENTS_DIR", tmp_path)
+    return tmp_path
+
+
+def test_warm_inits_each_environment_under_its_lock(monkeypatch, environments_dir):
+    calls = []
+
+    def init_if_needed(env_path, dry_run=False):
+        # Another run cannot take the environment while it is initialized
+        with pytest.raises(locks.LockBusyError), locks.file_lock(
+            env_path.name, wait=False
+        ):
+            pass
+        calls.append((env_path, dry_run))
+
+    monkeypatch.setattr(cache_cmd, "terraform_init_if_needed", init_if_needed)
+
+    cache_cmd.run(SimpleNamespace(action="warm", dry_run=False))
+
+    assert calls == [(environments_dir / "dev", False)]
+
+
+def test_stats_prints_hit_rate(monkeypatch, capsys):
+    monkeypatch.setattr(
+        cache_cmd,
+        "cache_stats",
+        lambda: {
+            "path": "/cache",
+            "size_bytes": 3 * 1024 * 1024,
+            "providers": [("registry.terraform.io/hashicorp/azurerm", "3.117.1")],
+            "hits": 1,
+            "misses": 1,
+            "hit_rate": 0.5,
+        },
+    )
+
+    cache_cmd.run(SimpleNamespace(action="stats", dry_run=False))
+
+    out = capsys.readouterr().out
+    assert "3.0 MB" in out
+    assert "azurerm 3.117.1" in out
+    assert "Hit rate: 50%" in out
+
+
+@pytest.mark.parametrize(
+    "evicted,dry_run,expected",
+    [
+        ([], False, "No unreferenced provider versions"),
+        ([("registry.terraform.io/hashicorp/azurerm", "3.1.0")], False, "Freed"),
+        ([("registry.terraform.io/hashicorp/azurerm", "3.1.0")], True, "Dry-run"),
+    ],
+)
+def test_prune_reports_result(monkeypatch, capsys, evicted, dry_run, expected):
+    monkeypatch.setattr(cache_cmd, "prune_cache", lambda *_a, **_k: (evicted, 2048))
+
+    cache_cmd.run(SimpleNamespace(action="prune", dry_run=dry_run))
+
+    assert expected in capsys.readouterr().out
@@ -1,56 +1,94 @@
+import os
 from unittest import mock
 
 import pytest
 
 import cli.commands.create as create_cmd
+from cli import locks, tracing
+from cli.parser import parse_arguments
+from cli.terraform_utils import PLAN_CHANGES, PLAN_NO_CHANGES
 
+PLAN_FILE = os.path.join("env_path", "infrabox.tfplan")
+PARALLELISM = 20
 
-class DummyArgs:
-    def __init__(self, environment="dev", dry_run=False):
-        self.environment = environment
-        self.dry_run = dry_run
+
+def dummy_args(*options, environments=("dev",)):
+    """Parse a create command line the way InfraBox.py does."""
+    return parse_arguments(["create", *environments, "--jobs", "4", *options])
 
 
 @pytest.fixture
 def patch_all(monkeypatch):
     patches = {}
     for name in [
-        "get_env_path",
-        "terraform_init",
-        "terraform_validate",
-        "terraform_state_has_changes",
-        "prompt_user_confirmation",
-        "terraform_apply",
+        "cli.rollout.get_env_path",
+        "cli.rollout.terraform_init_if_needed",
+        "cli.rollout.terraform_validate",
+        "cli.rollout.terraform_plan_status",
+        "cli.commands.create.terraform_apply",
+        "cli.rollout.prompt_user_confirmation",
+        "cli.rollout.discard_plan",
     ]:
         patch = mock.Mock()
-        monkeypatch.setattr(f"cli.commands.create.{name}", patch)
-        patches[name] = patch
+        monkeypatch.setattr(name, patch)
+        patches[name.rsplit(".", 1)[1]] = patch
+    # --modules resolves its targets against the same environment directory
+    monkeypatch.setattr("cli.commands.create.get_env_path", patches["get_env_path"])
     return patches
 
 
 def test_run_happy_path_apply(monkeypatch, patch_all):
-    args = DummyArgs()
+    args = dummy_args()
     patch_all["get_env_path"].return_value = "env_path"
-    patch_all["terraform_state_has_changes"].return_value = True
+    patch_all["terraform_plan_status"].return_value = PLAN_CHANGES
     patch_all["prompt_user_confirmation"].return_value = True
 
     create_cmd.run(args)
 
     patch_all["get_env_path"].assert_called_once_with("dev")
-    patch_all["terraform_init"].assert_called_once_with("env_path", dry_run=False)
+    patch_all["terraform_init_if_needed"].assert_called_once_with(
+        "env_path", dry_run=False, force=False
+    )
     patch_all["terraform_validate"].assert_called_once_with("env_path", dry_run=False)
-    patch_all["terraform_state_has_changes"].assert_called_once_with(
-        "env_path", dry_run=False
+    patch_all["terraform_plan_status"].assert_called_once_with(
+        "env_path",
+        destroy=False,
+        dry_run=False,
+        plan_file=PLAN_FILE,
+        targets=None,
+        refresh_ttl=None,
+        parallelism=None,
     )
     patch_all["prompt_user_confirmation"].assert_called_once_with()
-    patch_all["terraform_apply"].assert_called_once_with("env_path", dry_run=False)
+    patch_all["terraform_apply"].assert_called_once_with(
+        "env_path",
+        dry_run=False,
+        plan_file=PLAN_FILE,
+        parallelism=None,
+        adaptive_parallelism=False,
+    )
     assert monkeypatch is not None
 
 
+def test_run_resolves_adaptive_parallelism_once(patch_all, tmp_path, capsys):
+    args = dummy_args("--parallelism", str(PARALLELISM), "--adaptive-parallelism")
+    patch_all["get_env_path"].return_value = tmp_path
+    patch_all["terraform_plan_status"].return_value = PLAN_CHANGES
+    patch_all["prompt_user_confirmation"].return_value = True
+
+    create_cmd.run(args)
+
+    out = capsys.readouterr().out
+    assert out.count(f"Using adaptive -parallelism={PARALLELISM}") == 1
+    plan_kwargs = patch_all["terraform_plan_status"].call_args.kwargs
+    assert plan_kwargs["parallelism"] == PARALLELISM
+    assert patch_all["terraform_apply"].call_args.kwargs["parallelism"] == PARALLELISM
+
+
 def test_run_no_changes_no_apply(monkeypatch, patch_all):
-    args = DummyArgs()
+    args = dummy_args()
     patch_all["get_env_path"].return_value = "env_path"
-    patch_all["terraform_state_has_changes"].return_value = False
+    patch_all["terraform_plan_status"].return_value = PLAN_NO_CHANGES
 
     create_cmd.run(args)
 
@@ -61,9 +99,9 @@ def test_run_no_changes_no_apply(monkeypatch, patch_all):
 
 
 def test_run_changes_but_user_declines(monkeypatch, patch_all):
-    args = DummyArgs()
+    args = dummy_args()
     patch_all["get_env_path"].return_value = "env_path"
-    patch_all["terraform_state_has_changes"].return_value = True
+    patch_all["terraform_plan_status"].return_value = PLAN_CHANGES
     patch_all["prompt_user_confirmation"].return_value = False
 
     create_cmd.run(args)
@@ -75,36 +113,50 @@ def test_run_changes_but_user_declines(monkeypatch, patch_all):
 
 
 def test_run_dry_run(monkeypatch, patch_all):
-    args = DummyArgs(dry_run=True)
+    args = dummy_args("--dry-run")
     patch_all["get_env_path"].return_value = "env_path"
-    patch_all["terraform_state_has_changes"].return_value = True
+    patch_all["terraform_plan_status"].return_value = PLAN_CHANGES
     patch_all["prompt_user_confirmation"].return_value = True
 
     create_cmd.run(args)
 
-    patch_all["terraform_init"].assert_called_once_with("env_path", dry_run=True)
+    patch_all["terraform_init_if_needed"].assert_called_once_with(
+        "env_path", dry_run=True, force=False
+    )
     patch_all["terraform_validate"].assert_called_once_with("env_path", dry_run=True)
-    patch_all["terraform_state_has_changes"].assert_called_once_with(
-        "env_path", dry_run=True
+    patch_all["terraform_plan_status"].assert_called_once_with(
+        "env_path",
+        destroy=False,
+        dry_run=True,
+        plan_file=PLAN_FILE,
+        targets=None,
+        refresh_ttl=None,
+        parallelism=None,
+    )
+    patch_all["terraform_apply"].assert_called_once_with(
+        "env_path",
+        dry_run=True,
+        plan_file=PLAN_FILE,
+        parallelism=None,
+        adaptive_parallelism=False,
     )
-    patch_all["terraform_apply"].assert_called_once_with("env_path", dry_run=True)
 
     assert monkeypatch is not None
 
 
 def test_run_get_env_path_raises(monkeypatch, patch_all):
-    args = DummyArgs()
+    args = dummy_args()
     patch_all["get_env_path"].side_effect = Exception("fail")
     with pytest.raises(Exception, match="fail"):
         create_cmd.run(args)
-    patch_all["terraform_init"].assert_not_called()
+    patch_all["terraform_init_if_needed"].assert_not_called()
     assert monkeypatch is not None
 
 
 def test_run_terraform_init_raises(monkeypatch, patch_all):
-    args = DummyArgs()
+    args = dummy_args()
     patch_all["get_env_path"].return_value = "env_path"
-    patch_all["terraform_init"].side_effect = RuntimeError("init fail")
+    patch_all["terraform_init_if_needed"].side_effect = RuntimeError("init fail")
     with pytest.raises(RuntimeError, match="init fail"):
         create_cmd.run(args)
     patch_all["terraform_validate"].assert_not_called()
@@ -112,19 +164,19 @@ def test_run_terraform_init_raises(monkeypatch, patch_all):
 
 
 def test_run_terraform_validate_raises(monkeypatch, patch_all):
-    args = DummyArgs()
+    args = dummy_args()
     patch_all["get_env_path"].return_value = "env_path"
     patch_all["terraform_validate"].side_effect = RuntimeError("validate fail")
     with pytest.raises(RuntimeError, match="validate fail"):
         create_cmd.run(args)
-    patch_all["terraform_state_has_changes"].assert_not_called()
+    patch_all["terraform_plan_status"].assert_not_called()
     assert monkeypatch is not None
 
 
 def test_run_terraform_state_has_changes_raises(monkeypatch, patch_all):
-    args = DummyArgs()
+    args = dummy_args()
     patch_all["get_env_path"].return_value = "env_path"
-    patch_all["terraform_state_has_changes"].side_effect = RuntimeError("plan fail")
+    patch_all["terraform_plan_status"].side_effect = RuntimeError("plan fail")
     with pytest.raises(RuntimeError, match="plan fail"):
         create_cmd.run(args)
     patch_all["prompt_user_confirmation"].assert_not_called()
@@ -132,11 +184,183 @@ def test_run_terraform_state_has_changes_raises(monkeypatch, patch_all):
 
 
 def test_run_terraform_apply_raises(monkeypatch, patch_all):
-    args = DummyArgs()
+    args = dummy_args()
     patch_all["get_env_path"].return_value = "env_path"
-    patch_all["terraform_state_has_changes"].return_value = True
+    patch_all["terraform_plan_status"].return_value = PLAN_CHANGES
     patch_all["prompt_user_confirmation"].return_value = True
     patch_all["terraform_apply"].side_effect = RuntimeError("apply fail")
     assert monkeypatch is not None
     with pytest.raises(RuntimeError, match="apply fail"):
         create_cmd.run(args)
+
+
+def test_run_discards_plan_file(monkeypatch, patch_all):
+    args = dummy_args()
+    patch_all["get_env_path"].return_value = "env_path"
+    patch_all["terraform_plan_status"].return_value = PLAN_CHANGES
+    patch_all["prompt_user_confirmation"].return_value = False
+
+    create_cmd.run(args)
+
+    patch_all["discard_plan"].assert_called_once_with(PLAN_FILE)
+    assert monkeypatch is not None
+
+
+def test_run_prints_plan_summary_before_confirmation(monkeypatch, patch_all, capsys):
+    args = dummy_args()
+    patch_all["get_env_path"].return_value = "env_path"
+    patch_all["terraform_plan_status"].return_value = PLAN_CHANGES
+    patch_all["prompt_user_confirmation"].return_value = False
+    summary = {
+        "counts": {"create": 2, "update": 0, "replace": 1, "destroy": 0},
+        "modules": {
+            "root": {
+                "azurerm_subnet": {"create": 2, "update": 0, "replace": 1, "destroy": 0}
+            }
+        },
+        "replacements": ["azurerm_subnet.main"],
+    }
+    load_plan_summary = mock.Mock(return_value=summary)
+    monkeypatch.setattr("cli.rollout.load_plan_summary", load_plan_summary)
+
+    create_cmd.run(args)
+
+    load_plan_summary.assert_called_once_with("env_path", PLAN_FILE)
+    out = capsys.readouterr().out
+    assert "Plan summary for dev: 2 to create" in out
+    assert "-/+ azurerm_subnet.main" in out
+
+
+def test_run_records_phase_spans(monkeypatch, patch_all):
+    args = dummy_args(environments=["dev", "stage"])
+    patch_all["get_env_path"].side_effect = lambda env: f"{env}_path"
+    patch_all["terraform_plan_status"].return_value = PLAN_CHANGES
+    patch_all["prompt_user_confirmation"].return_value = True
+    patch_all["terraform_apply"].return_value = mock.Mock(returncode=0)
+
+    tracing.start_tracing()
+    try:
+        create_cmd.run(args)
+    finally:
+        spans = tracing.stop_tracing()
+
+    phases = {(s["name"], s["environment"]) for s in spans}
+    for environment in ("dev", "stage"):
+        for phase in ("terraform init", "terraform validate", "terraform plan"):
+            assert (phase, environment) in phases
+        assert ("terraform apply", environment) in phases
+    assert ("confirmation", None) in phases
+    assert monkeypatch is not None
+
+
+def test_run_multiple_environments_single_confirmation(monkeypatch, patch_all, capsys):
+    args = dummy_args(environments=["dev", "stage", "prod"])
+    patch_all["get_env_path"].side_effect = lambda env: f"{env}_path"
+    patch_all["terraform_plan_status"].side_effect = lambda env_path, **_k: (
+        PLAN_NO_CHANGES if env_path == "prod_path" else PLAN_CHANGES
+    )
+    patch_all["prompt_user_confirmation"].return_value = True
+    patch_all["terraform_apply"].return_value = mock.Mock(returncode=0)
+
+    create_cmd.run(args)
+
+    patch_all["prompt_user_confirmation"].assert_called_once_with()
+    applied = sorted(c.args[0] for c in patch_all["terraform_apply"].call_args_list)
+    assert applied == ["dev_path", "stage_path"]
+    assert patch_all["discard_plan"].call_count == len(args.environments)
+    out = capsys.readouterr().out
+    assert "Changes detected in:" in out
+    assert "Environment summary" in out
+    assert "prod   ✅ no changes" in out
+    assert "stage  ✅ applied" in out
+    assert monkeypatch is not None
+
+
+def test_run_multiple_environments_reports_failures(monkeypatch, patch_all, capsys):
+    args = dummy_args(environments=["dev", "stage"])
+
+    def get_env_path(env):
+        if env == "stage":
+            raise RuntimeError("broken")
+        return f"{env}_path"
+
+    patch_all["get_env_path"].side_effect = get_env_path
+    patch_all["terraform_plan_status"].return_value = PLAN_CHANGES
+    patch_all["prompt_user_confirmation"].return_value = True
+    patch_all["terraform_apply"].return_value = mock.Mock(returncode=1)
+
+    with pytest.raises(SystemExit) as excinfo:
+        create_cmd.run(args)
+
+    assert excinfo.value.code == 1
+    out = capsys.readouterr().out
+    assert "stage  ❌ failed: broken" in out
+    assert "dev    ❌ apply failed (exit code 1)" in out
+    assert monkeypatch is not None
+
+
+def test_run_all_environments(monkeypatch, patch_all, tmp_path):
+    for env in ["dev", "prod", "sandbox"]:
+        (tmp_path / env).mkdir()
+    monkeypatch.setattr("cli.parallel.ENVIRONMENTS_DIR", tmp_path)
+    monkeypatch.setattr("cli.parallel.resolve_environments.__defaults__", (tmp_path,))
+    args = dummy_args("--all", environments=())
+    patch_all["get_env_path"].side_effect = lambda env: f"{env}_path"
+    patch_all["terraform_plan_status"].return_value = PLAN_NO_CHANGES
+
+    create_cmd.run(args)
+
+    planned = sorted(c.args[0] for c in patch_all["get_env_path"].call_args_list)
+    assert planned == ["dev", "prod"]
+    patch_all["prompt_user_confirmation"].assert_not_called()
+
+
+def test_run_targets_modules(monkeypatch, patch_all, tmp_path):
+    (tmp_path / "main.tf").write_text(
+        'module "networking" {}\nmodule "storage_account" {}\n'
+    )
+    args = dummy_args("--module", "storage_account")
+    patch_all["get_env_path"].return_value = tmp_path
+    patch_all["terraform_plan_status"].return_value = PLAN_NO_CHANGES
+
+    create_cmd.run(args)
+
+    patch_all["terraform_plan_status"].assert_called_once_with(
+        tmp_path,
+        destroy=False,
+        dry_run=False,
+        plan_file=os.path.join(tmp_path, "infrabox.tfplan"),
+        targets=["module.storage_account"],
+        refresh_ttl=None,
+        parallelism=None,
+    )
+    assert monkeypatch is not None
+
+
+def test_run_rejects_undeclared_module(patch_all, tmp_path, capsys):
+    (tmp_path / "main.tf").write_text('module "networking" {}\n')
+    args = dummy_args("--module", "storage")
+    patch_all["get_env_path"].return_value = tmp_path
+
+    with pytest.raises(SystemExit):
+        create_cmd.run(args)
+
+    assert "Unknown module(s) storage; the environment declares: networking" in (
+        capsys.readouterr().out
+    )
+    patch_all["terraform_plan_status"].assert_not_called()
+
+
+def test_run_no_wait_fails_when_environment_is_locked(patch_all, capsys):
+    args = dummy_args("--no-wait")
+
+    with locks.file_lock("dev", purpose="create dev"), pytest.raises(
+        SystemExit
+    ) as excinfo:
+        create_cmd.run(args)
+
+    assert excinfo.value.code == 1
+    out = capsys.readouterr().out
+    assert "dev is locked by another InfraBox run" in out
+    assert "create dev" in out
+    patch_all["terraform_plan_status"].assert_not_called()
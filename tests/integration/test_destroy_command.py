@@ -1,59 +1,77 @@
+import os
 from unittest import mock
 
 import pytest
 
 import cli.commands.destroy as destroy_cmd
+from cli.parser import parse_arguments
+from cli.terraform_utils import PLAN_CHANGES, PLAN_NO_CHANGES
 
+PLAN_FILE = os.path.join("env_path", "infrabox.tfplan")
 
-class DummyArgs:
-    def __init__(self, environment="dev", dry_run=False):
-        self.environment = environment
-        self.dry_run = dry_run
+
+def dummy_args(*options, environments=("dev",)):
+    """Parse a destroy command line the way InfraBox.py does."""
+    return parse_arguments(["destroy", *environments, "--jobs", "4", *options])
 
 
 @pytest.fixture
 def patch_all(monkeypatch):
     patches = {}
     for name in [
-        "get_env_path",
-        "terraform_init",
-        "terraform_validate",
-        "terraform_state_has_changes",
-        "prompt_user_confirmation",
-        "terraform_apply",
+        "cli.rollout.get_env_path",
+        "cli.rollout.terraform_init_if_needed",
+        "cli.rollout.terraform_validate",
+        "cli.rollout.terraform_plan_status",
+        "cli.commands.destroy.terraform_apply",
+        "cli.rollout.prompt_user_confirmation",
+        "cli.rollout.discard_plan",
     ]:
         patch = mock.Mock()
-        monkeypatch.setattr(f"cli.commands.destroy.{name}", patch)
-        patches[name] = patch
+        monkeypatch.setattr(name, patch)
+        patches[name.rsplit(".", 1)[1]] = patch
     return patches
 
 
 def test_run_happy_path_apply(monkeypatch, patch_all):
-    args = DummyArgs()
+    args = dummy_args()
     patch_all["get_env_path"].return_value = "env_path"
-    patch_all["terraform_state_has_changes"].return_value = True
+    patch_all["terraform_plan_status"].return_value = PLAN_CHANGES
     patch_all["prompt_user_confirmation"].return_value = True
 
     destroy_cmd.run(args)
 
     patch_all["get_env_path"].assert_called_once_with("dev")
-    patch_all["terraform_init"].assert_called_once_with("env_path", dry_run=False)
+    patch_all["terraform_init_if_needed"].assert_called_once_with(
+        "env_path", dry_run=False, force=False
+    )
     patch_all["terraform_validate"].assert_called_once_with("env_path", dry_run=False)
-    patch_all["terraform_state_has_changes"].assert_called_once_with(
-        "env_path", destroy=True, dry_run=False
+    patch_all["terraform_plan_status"].assert_called_once_with(
+        "env_path",
+        destroy=True,
+        dry_run=False,
+        plan_file=PLAN_FILE,
+        targets=None,
+        refresh_ttl=None,
+        parallelism=None,
     )
     patch_all["prompt_user_confirmation"].assert_called_once_with()
     patch_all["terraform_apply"].assert_called_once_with(
-        "env_path", destroy=True, dry_run=False
+        "env_path",
+        destroy=True,
+        dry_run=False,
+        plan_file=PLAN_FILE,
+        parallelism=None,
+        adaptive_parallelism=False,
     )
 
     assert monkeypatch is not None
 
 
 def test_run_no_changes_no_apply(monkeypatch, patch_all):
-    args = DummyArgs()
+    args = dummy_args()
     patch_all["get_env_path"].return_value = "env_path"
-    patch_all["terraform_state_has_changes"].return_value = False
+    patch_all["terraform_plan_status"].return_value = PLAN_NO_CHANGES
 
     destroy_cmd.run(args)
 
@@ -64,9 +82,9 @@ def test_run_no_changes_no_apply(monkeypatch, patch_all):
 
 
 def test_run_changes_but_user_declines(monkeypatch, patch_all):
-    args = DummyArgs()
+    args = dummy_args()
     patch_all["get_env_path"].return_value = "env_path"
-    patch_all["terraform_state_has_changes"].return_value = True
+    patch_all["terraform_plan_status"].return_value = PLAN_CHANGES
     patch_all["prompt_user_confirmation"].return_value = False
 
     destroy_cmd.run(args)
@@ -78,39 +96,52 @@ def test_run_changes_but_user_declines(monkeypatch, patch_all):
 
 
 def test_run_dry_run(monkeypatch, patch_all):
-    args = DummyArgs(dry_run=True)
+    args = dummy_args("--dry-run")
     patch_all["get_env_path"].return_value = "env_path"
-    patch_all["terraform_state_has_changes"].return_value = True
+    patch_all["terraform_plan_status"].return_value = PLAN_CHANGES
     patch_all["prompt_user_confirmation"].return_value = True
 
     destroy_cmd.run(args)
 
-    patch_all["terraform_init"].assert_called_once_with("env_path", dry_run=True)
+    patch_all["terraform_init_if_needed"].assert_called_once_with(
+        "env_path", dry_run=True, force=False
+    )
     patch_all["terraform_validate"].assert_called_once_with("env_path", dry_run=True)
-    patch_all["terraform_state_has_changes"].assert_called_once_with(
-        "env_path", destroy=True, dry_run=True
+    patch_all["terraform_plan_status"].assert_called_once_with(
+        "env_path",
+        destroy=True,
+        dry_run=True,
+        plan_file=PLAN_FILE,
+        targets=None,
+        refresh_ttl=None,
+        parallelism=None,
     )
     patch_all["terraform_apply"].assert_called_once_with(
-        "env_path", destroy=True, dry_run=True
+        "env_path",
+        destroy=True,
+        dry_run=True,
+        plan_file=PLAN_FILE,
+        parallelism=None,
+        adaptive_parallelism=False,
     )
 
     assert monkeypatch is not None
 
 
 def test_run_get_env_path_raises(monkeypatch, patch_all):
-    args = DummyArgs()
+    args = dummy_args()
     patch_all["get_env_path"].side_effect = Exception("fail")
     with pytest.raises(Exception, match="fail"):
         destroy_cmd.run(args)
-    patch_all["terraform_init"].assert_not_called()
+    patch_all["terraform_init_if_needed"].assert_not_called()
 
     assert monkeypatch is not None
 
 
 def test_run_terraform_init_raises(monkeypatch, patch_all):
-    args = DummyArgs()
+    args = dummy_args()
     patch_all["get_env_path"].return_value = "env_path"
-    patch_all["terraform_init"].side_effect = RuntimeError("init fail")
+    patch_all["terraform_init_if_needed"].side_effect = RuntimeError("init fail")
     with pytest.raises(RuntimeError, match="init fail"):
         destroy_cmd.run(args)
     patch_all["terraform_validate"].assert_not_called()
@@ -119,20 +150,20 @@ def test_run_terraform_init_raises(monkeypatch, patch_all):
 
 
 def test_run_terraform_validate_raises(monkeypatch, patch_all):
-    args = DummyArgs()
+    args = dummy_args()
     patch_all["get_env_path"].return_value = "env_path"
     patch_all["terraform_validate"].side_effect = RuntimeError("validate fail")
     with pytest.raises(RuntimeError, match="validate fail"):
         destroy_cmd.run(args)
-    patch_all["terraform_state_has_changes"].assert_not_called()
+    patch_all["terraform_plan_status"].assert_not_called()
 
     assert monkeypatch is not None
 
 
 def test_run_terraform_state_has_changes_raises(monkeypatch, patch_all):
-    args = DummyArgs()
+    args = dummy_args()
     patch_all["get_env_path"].return_value = "env_path"
-    patch_all["terraform_state_has_changes"].side_effect = RuntimeError("plan fail")
+    patch_all["terraform_plan_status"].side_effect = RuntimeError("plan fail")
     with pytest.raises(RuntimeError, match="plan fail"):
         destroy_cmd.run(args)
     patch_all["prompt_user_confirmation"].assert_not_called()
@@ -141,9 +172,9 @@ def test_run_terraform_state_has_changes_raises(monkeypatch, patch_all):
 
 
 def test_run_terraform_apply_raises(monkeypatch, patch_all):
-    args = DummyArgs()
+    args = dummy_args()
     patch_all["get_env_path"].return_value = "env_path"
-    patch_all["terraform_state_has_changes"].return_value = True
+    patch_all["terraform_plan_status"].return_value = PLAN_CHANGES
     patch_all["prompt_user_confirmation"].return_value = True
     patch_all["terraform_apply"].side_effect = RuntimeError("apply fail")
     assert monkeypatch is not None
@@ -0,0 +1,176 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import cli.commands.drift as drift_cmd
+from cli import locks
+from cli.async_engine import CommandTimeoutError
+
+DRIFT_EXIT_CODE = 2
+WATCH_ROUNDS = 2
+TIMEOUT = 60
+INIT_SECONDS = 0.2
+
+
+@pytest.fixture
+def drift_env(monkeypatch, tmp_path):
+    monkeypatch.setattr(drift_cmd, "DRIFT_CACHE_FILE", tmp_path / "drift.json")
+    monkeypatch.setattr(drift_cmd, "get_env_path", lambda env: str(tmp_path / env))
+    monkeypatch.setattr(drift_cmd, "terraform_init_if_needed", lambda *_a, **_k: None)
+    return tmp_path
+
+
+def fake_plan(returncodes):
+    def plan(env_path, *, refresh_only=False, **_kwargs):
+        assert refresh_only
+        returncode = returncodes[env_path.rsplit("/", 1)[1]]
+        if isinstance(returncode, Exception):
+            raise returncode
+        return SimpleNamespace(returncode=returncode)
+
+    return plan
+
+
+def drift_args(**overrides):
+    values = {
+        "environments": ["dev", "stage", "prod"],
+        "all": False,
+        "jobs": 2,
+        "timeout": TIMEOUT,
+        "watch": None,
+        "cached": False,
+    }
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+@pytest.mark.usefixtures("drift_env")
+def test_drift_checks_environments_and_caches_results(monkeypatch, capsys):
+    monkeypatch.setattr(
+        drift_cmd,
+        "terraform_plan",
+        fake_plan(
+            {
+                "dev": 0,
+                "stage": 2,
+                "prod": CommandTimeoutError("timed out after 60 seconds"),
+            }
+        ),
+    )
+
+    with pytest.raises(SystemExit) as excinfo:
+        drift_cmd.run(drift_args())
+
+    assert excinfo.value.code == 1
+    out = capsys.readouterr().out
+    assert "dev    ✅ no drift  checked 0s ago" in out
+    assert "stage  ⚠️ drift detected" in out
+    assert "prod   ⏱️ timed out" in out
+
+    cache = drift_cmd.load_drift_cache()
+    assert cache["dev"]["status"] == drift_cmd.DRIFT_NONE
+    assert cache["stage"]["status"] == drift_cmd.DRIFT_DETECTED
+    assert cache["prod"]["status"] == drift_cmd.DRIFT_TIMED_OUT
+    assert cache["dev"]["checked_at"] <= time.time()
+
+
+@pytest.mark.usefixtures("drift_env")
+def test_drift_exits_2_when_drift_detected(monkeypatch):
+    monkeypatch.setattr(drift_cmd, "terraform_plan", fake_plan({"dev": 2}))
+
+    with pytest.raises(SystemExit) as excinfo:
+        drift_cmd.run(drift_args(environments=["dev"]))
+
+    assert excinfo.value.code == DRIFT_EXIT_CODE
+
+
+@pytest.mark.usefixtures("drift_env")
+def test_drift_init_and_plan_share_the_timeout(monkeypatch):
+    timeouts = []
+
+    def slow_init(_env_path, timeout=None):
+        timeouts.append(timeout)
+        time.sleep(INIT_SECONDS)
+
+    def plan(_env_path, timeout=None, **_kwargs):
+        timeouts.append(timeout)
+        return SimpleNamespace(returncode=0)
+
+    monkeypatch.setattr(drift_cmd, "terraform_init_if_needed", slow_init)
+    monkeypatch.setattr(drift_cmd, "terraform_plan", plan)
+
+    drift_cmd.check_drift("dev", timeout=TIMEOUT)
+
+    init_timeout, plan_timeout = timeouts
+    assert init_timeout == TIMEOUT
+    assert plan_timeout <= TIMEOUT - INIT_SECONDS
+
+
+@pytest.mark.usefixtures("drift_env")
+def test_drift_skips_environment_held_by_another_run(monkeypatch):
+    monkeypatch.setattr(drift_cmd, "terraform_plan", fake_plan({"dev": 2}))
+
+    with locks.file_lock("dev", purpose="create dev"):
+        result = drift_cmd.check_drift("dev")
+
+    assert result["status"] == drift_cmd.DRIFT_BUSY
+    assert "create dev" in result["detail"]
+
+
+@pytest.mark.usefixtures("drift_env")
+def test_drift_cached_shows_results_without_terraform(monkeypatch, capsys):
+    drift_cmd.record_drift_results(
+        {
+            "dev": {
+                "status": drift_cmd.DRIFT_DETECTED,
+                "checked_at": time.time() - 7200,
+                "duration": 42,
+                "detail": None,
+            }
+        }
+    )
+    monkeypatch.setattr(drift_cmd, "terraform_plan", None)
+
+    drift_cmd.run(drift_args(environments=["dev", "stage"], cached=True))
+
+    out = capsys.readouterr().out
+    assert "dev    ⚠️ drift detected  checked 2h ago in 42s" in out
+    assert "stage  ⚪ never checked" in out
+
+
+@pytest.mark.usefixtures("drift_env")
+def test_record_drift_results_merges():
+    drift_cmd.record_drift_results({"dev": {"status": "drift"}})
+    cache = drift_cmd.record_drift_results({"stage": {"status": "no drift"}})
+
+    assert cache == {"dev": {"status": "drift"}, "stage": {"status": "no drift"}}
+
+
+def test_next_check_is_jittered_around_the_interval():
+    checks = {drift_cmd.next_check(100, 1000) for _ in range(50)}
+
+    assert len(checks) > 1
+    low = 1000 + 100 * (1 - drift_cmd.WATCH_JITTER)
+    high = 1000 + 100 * (1 + drift_cmd.WATCH_JITTER)
+    assert all(low <= check <= high for check in checks)
+
+
+@pytest.mark.usefixtures("drift_env")
+def test_watch_rechecks_until_interrupted(monkeypatch, capsys):
+    checked = []
+
+    def fake_check(environments, _jobs, _timeout):
+        checked.append(list(environments))
+        if len(checked) == WATCH_ROUNDS:
+            raise KeyboardInterrupt
+        return {}
+
+    monkeypatch.setattr(drift_cmd, "check_environments", fake_check)
+    monkeypatch.setattr(drift_cmd.time, "sleep", lambda _seconds: None)
+    monkeypatch.setattr(drift_cmd, "WATCH_JITTER", 0)
+
+    drift_cmd.watch(["dev", "stage"], drift_args(watch=0.01))
+
+    assert checked[0] == ["dev", "stage"]
+    assert "Stopped watching for drift" in capsys.readouterr().out
@@ -3,6 +3,8 @@ from types import SimpleNamespace
 import pytest
 
 import cli.commands.initialize as initialize_mod
+from cli import locks
+from cli.infrastructure_templates import load_render_manifest
 
 
 @pytest.fixture
@@ -23,7 +25,7 @@ def mock_validate_cidr(cidr):
 
 def test_initialize_dry_run(monkeypatch, temp_env_dir, capsys):
     # Arrange
-    args = SimpleNamespace(environment="testenv", dry_run=True)
+    args = SimpleNamespace(environment="testenv", dry_run=True, auto_cidr=None)
     monkeypatch.setattr(initialize_mod, "prompt_with_default", mock_prompt_with_default)
     monkeypatch.setattr(initialize_mod, "validate_cidr", mock_validate_cidr)
     monkeypatch.setattr(initialize_mod, "check_cidr_overlap", lambda *_a, **_k: None)
@@ -31,7 +33,9 @@ def test_initialize_dry_run(monkeypatch, temp_env_dir, capsys):
     monkeypatch.setattr(initialize_mod, "generate_main_tf", lambda *_a, **_k: None)
     monkeypatch.setattr(initialize_mod, "generate_outputs_tf", lambda *_a, **_k: None)
     monkeypatch.setattr(initialize_mod, "generate_provider_tf", lambda *_a, **_k: None)
-    monkeypatch.setattr(initialize_mod, "terraform_init", lambda *_a, **_k: None)
+    monkeypatch.setattr(
+        initialize_mod, "terraform_init_if_needed", lambda *_a, **_k: None
+    )
     monkeypatch.setattr(initialize_mod, "terraform_validate", lambda *_a, **_k: None)
 
     # Act
@@ -44,7 +48,7 @@ def test_initialize_dry_run(monkeypatch, temp_env_dir, capsys):
 
 
 def test_initialize_creates_files(monkeypatch, temp_env_dir):
-    args = SimpleNamespace(environment="prod", dry_run=False)
+    args = SimpleNamespace(environment="prod", dry_run=False, auto_cidr=None)
     monkeypatch.setattr(initialize_mod, "prompt_with_default", mock_prompt_with_default)
     monkeypatch.setattr(initialize_mod, "validate_cidr", mock_validate_cidr)
     monkeypatch.setattr(initialize_mod, "check_cidr_overlap", lambda *_a, **_k: None)
@@ -64,7 +68,9 @@ def test_initialize_creates_files(monkeypatch, temp_env_dir):
     monkeypatch.setattr(initialize_mod, "generate_main_tf", fake_generate_tf)
     monkeypatch.setattr(initialize_mod, "generate_outputs_tf", fake_generate_tf)
     monkeypatch.setattr(initialize_mod, "generate_provider_tf", fake_generate_tf)
-    monkeypatch.setattr(initialize_mod, "terraform_init", lambda *_a, **_k: None)
+    monkeypatch.setattr(
+        initialize_mod, "terraform_init_if_needed", lambda *_a, **_k: None
+    )
     monkeypatch.setattr(initialize_mod, "terraform_validate", lambda *_a, **_k: None)
 
     # Act
@@ -76,6 +82,8 @@ def test_initialize_creates_files(monkeypatch, temp_env_dir):
     for fname in ["variables.tf", "main.tf", "outputs.tf", "provider.tf"]:
         assert (env_path / fname).exists()
         assert (env_path / fname).read_text().startswith("#")
+    manifest = load_render_manifest(env_path)
+    assert manifest["context"]["vnet_address_space"] == "10.0.0.0/16"
 
 
 def test_initialize_aborts_if_env_exists(monkeypatch, temp_env_dir, capsys):
@@ -83,7 +91,7 @@ def test_initialize_aborts_if_env_exists(monkeypatch, temp_env_dir, capsys):
     env_name = "existing"
     env_path = temp_env_dir / env_name
     env_path.mkdir(parents=True)
-    args = SimpleNamespace(environment=env_name, dry_run=False)
+    args = SimpleNamespace(environment=env_name, dry_run=False, auto_cidr=None)
     monkeypatch.setattr(initialize_mod, "ENVIRONMENTS_DIR", temp_env_dir)
     monkeypatch.setattr(initialize_mod, "prompt_with_default", mock_prompt_with_default)
     monkeypatch.setattr(initialize_mod, "validate_cidr", mock_validate_cidr)
@@ -92,7 +100,9 @@ def test_initialize_aborts_if_env_exists(monkeypatch, temp_env_dir, capsys):
     monkeypatch.setattr(initialize_mod, "generate_main_tf", lambda *_a, **_k: None)
     monkeypatch.setattr(initialize_mod, "generate_outputs_tf", lambda *_a, **_k: None)
     monkeypatch.setattr(initialize_mod, "generate_provider_tf", lambda *_a, **_k: None)
-    monkeypatch.setattr(initialize_mod, "terraform_init", lambda *_a, **_k: None)
+    monkeypatch.setattr(
+        initialize_mod, "terraform_init_if_needed", lambda *_a, **_k: None
+    )
     monkeypatch.setattr(initialize_mod, "terraform_validate", lambda *_a, **_k: None)
 
     # Act
@@ -105,7 +115,7 @@ def test_initialize_aborts_if_env_exists(monkeypatch, temp_env_dir, capsys):
 
 @pytest.mark.parametrize("env_name", ["dev", "stage", "prod"])
 def test_initialize_supported_environments(monkeypatch, temp_env_dir, env_name):
-    args = SimpleNamespace(environment=env_name, dry_run=False)
+    args = SimpleNamespace(environment=env_name, dry_run=False, auto_cidr=None)
     monkeypatch.setattr(initialize_mod, "prompt_with_default", mock_prompt_with_default)
     monkeypatch.setattr(initialize_mod, "validate_cidr", mock_validate_cidr)
     monkeypatch.setattr(initialize_mod, "check_cidr_overlap", lambda *_a, **_k: None)
@@ -120,7 +130,9 @@ def test_initialize_supported_environments(monkeypatch, temp_env_dir, env_name):
     monkeypatch.setattr(initialize_mod, "generate_main_tf", fake_generate_tf)
     monkeypatch.setattr(initialize_mod, "generate_outputs_tf", fake_generate_tf)
     monkeypatch.setattr(initialize_mod, "generate_provider_tf", fake_generate_tf)
-    monkeypatch.setattr(initialize_mod, "terraform_init", lambda *_a, **_k: None)
+    monkeypatch.setattr(
+        initialize_mod, "terraform_init_if_needed", lambda *_a, **_k: None
+    )
     monkeypatch.setattr(initialize_mod, "terraform_validate", lambda *_a, **_k: None)
 
     initialize_mod.run(args)
@@ -131,7 +143,7 @@ def test_initialize_supported_environments(monkeypatch, temp_env_dir, env_name):
 
 
 def test_initialize_custom_user_input(monkeypatch, temp_env_dir):
-    args = SimpleNamespace(environment="dev", dry_run=False)
+    args = SimpleNamespace(environment="dev", dry_run=False, auto_cidr=None)
 
     # Custom user input for name_prefix
     def custom_prompt(prompt, default):
@@ -154,7 +166,9 @@ def test_initialize_custom_user_input(monkeypatch, temp_env_dir):
     monkeypatch.setattr(initialize_mod, "generate_main_tf", lambda *_a, **_k: None)
     monkeypatch.setattr(initialize_mod, "generate_outputs_tf", lambda *_a, **_k: None)
     monkeypatch.setattr(initialize_mod, "generate_provider_tf", lambda *_a, **_k: None)
-    monkeypatch.setattr(initialize_mod, "terraform_init", lambda *_a, **_k: None)
+    monkeypatch.setattr(
+        initialize_mod, "terraform_init_if_needed", lambda *_a, **_k: None
+    )
     monkeypatch.setattr(initialize_mod, "terraform_validate", lambda *_a, **_k: None)
 
     initialize_mod.run(args)
@@ -164,7 +178,7 @@ def test_initialize_custom_user_input(monkeypatch, temp_env_dir):
 
 
 def test_initialize_template_content(monkeypatch, temp_env_dir):
-    args = SimpleNamespace(environment="dev", dry_run=False)
+    args = SimpleNamespace(environment="dev", dry_run=False, auto_cidr=None)
 
     # Patch prompt_with_default to return specific values for each prompt
     def prompt_with_default_side_effect(prompt, default):
@@ -185,7 +199,9 @@ def test_initialize_template_content(monkeypatch, temp_env_dir):
     monkeypatch.setattr(initialize_mod, "check_cidr_overlap", lambda *_a, **_k: None)
 
     # Patch terraform functions to no-ops
-    monkeypatch.setattr(initialize_mod, "terraform_init", lambda *_a, **_k: None)
+    monkeypatch.setattr(
+        initialize_mod, "terraform_init_if_needed", lambda *_a, **_k: None
+    )
     monkeypatch.setattr(initialize_mod, "terraform_validate", lambda *_a, **_k: None)
 
     # Act
@@ -201,7 +217,7 @@ def test_initialize_template_content(monkeypatch, temp_env_dir):
 
 
 def test_initialize_cidr_overlap(monkeypatch, temp_env_dir, capsys):
-    args = SimpleNamespace(environment="dev", dry_run=False)
+    args = SimpleNamespace(environment="dev", dry_run=False, auto_cidr=None)
     monkeypatch.setattr(initialize_mod, "prompt_with_default", mock_prompt_with_default)
     monkeypatch.setattr(initialize_mod, "validate_cidr", mock_validate_cidr)
 
@@ -213,7 +229,9 @@ def test_initialize_cidr_overlap(monkeypatch, temp_env_dir, capsys):
     monkeypatch.setattr(initialize_mod, "generate_main_tf", lambda *_a, **_k: None)
     monkeypatch.setattr(initialize_mod, "generate_outputs_tf", lambda *_a, **_k: None)
     monkeypatch.setattr(initialize_mod, "generate_provider_tf", lambda *_a, **_k: None)
-    monkeypatch.setattr(initialize_mod, "terraform_init", lambda *_a, **_k: None)
+    monkeypatch.setattr(
+        initialize_mod, "terraform_init_if_needed", lambda *_a, **_k: None
+    )
     monkeypatch.setattr(initialize_mod, "terraform_validate", lambda *_a, **_k: None)
 
     initialize_mod.run(args)
@@ -223,7 +241,7 @@ def test_initialize_cidr_overlap(monkeypatch, temp_env_dir, capsys):
 
 
 def test_initialize_keyboard_interrupt(monkeypatch, temp_env_dir, capsys):
-    args = SimpleNamespace(environment="dev", dry_run=False)
+    args = SimpleNamespace(environment="dev", dry_run=False, auto_cidr=None)
     monkeypatch.setattr(initialize_mod, "prompt_with_default", mock_prompt_with_default)
     monkeypatch.setattr(initialize_mod, "validate_cidr", mock_validate_cidr)
     monkeypatch.setattr(initialize_mod, "check_cidr_overlap", lambda *_a, **_k: None)
@@ -237,7 +255,9 @@ def test_initialize_keyboard_interrupt(monkeypatch, temp_env_dir, capsys):
     monkeypatch.setattr(initialize_mod, "generate_main_tf", lambda *_a, **_k: None)
     monkeypatch.setattr(initialize_mod, "generate_outputs_tf", lambda *_a, **_k: None)
     monkeypatch.setattr(initialize_mod, "generate_provider_tf", lambda *_a, **_k: None)
-    monkeypatch.setattr(initialize_mod, "terraform_init", lambda *_a, **_k: None)
+    monkeypatch.setattr(
+        initialize_mod, "terraform_init_if_needed", lambda *_a, **_k: None
+    )
     monkeypatch.setattr(initialize_mod, "terraform_validate", lambda *_a, **_k: None)
 
     initialize_mod.run(args)
@@ -251,7 +271,7 @@ def test_initialize_keyboard_interrupt(monkeypatch, temp_env_dir, capsys):
 
 
 def test_initialize_terraform_calls(monkeypatch, temp_env_dir):
-    args = SimpleNamespace(environment="dev", dry_run=False)
+    args = SimpleNamespace(environment="dev", dry_run=False, auto_cidr=None)
     monkeypatch.setattr(initialize_mod, "prompt_with_default", mock_prompt_with_default)
     monkeypatch.setattr(initialize_mod, "validate_cidr", mock_validate_cidr)
     monkeypatch.setattr(initialize_mod, "check_cidr_overlap", lambda *_a, **_k: None)
@@ -268,7 +288,7 @@ def test_initialize_terraform_calls(monkeypatch, temp_env_dir):
     def fake_terraform_validate(*_a, **_k):
         called["validate"] = True
 
-    monkeypatch.setattr(initialize_mod, "terraform_init", fake_terraform_init)
+    monkeypatch.setattr(initialize_mod, "terraform_init_if_needed", fake_terraform_init)
     monkeypatch.setattr(initialize_mod, "terraform_validate", fake_terraform_validate)
 
     initialize_mod.run(args)
@@ -278,7 +298,7 @@ def test_initialize_terraform_calls(monkeypatch, temp_env_dir):
 
 
 def test_initialize_dry_run_skips_terraform(monkeypatch, temp_env_dir, capsys):
-    args = SimpleNamespace(environment="dev", dry_run=True)
+    args = SimpleNamespace(environment="dev", dry_run=True, auto_cidr=None)
     monkeypatch.setattr(initialize_mod, "prompt_with_default", mock_prompt_with_default)
     monkeypatch.setattr(initialize_mod, "validate_cidr", mock_validate_cidr)
     monkeypatch.setattr(initialize_mod, "check_cidr_overlap", lambda *_a, **_k: None)
@@ -297,7 +317,7 @@ def test_initialize_dry_run_skips_terraform(monkeypatch, temp_env_dir, capsys):
 
 
 def test_initialize_unexpected_error_removes_env_dir(monkeypatch, temp_env_dir, capsys):
-    args = SimpleNamespace(environment="dev", dry_run=False)
+    args = SimpleNamespace(environment="dev", dry_run=False, auto_cidr=None)
     monkeypatch.setattr(initialize_mod, "prompt_with_default", mock_prompt_with_default)
     monkeypatch.setattr(initialize_mod, "validate_cidr", mock_validate_cidr)
     monkeypatch.setattr(initialize_mod, "check_cidr_overlap", lambda *_a, **_k: None)
@@ -310,7 +330,9 @@ def test_initialize_unexpected_error_removes_env_dir(monkeypatch, temp_env_dir,
     monkeypatch.setattr(initialize_mod, "generate_main_tf", raise_unexpected_error)
     monkeypatch.setattr(initialize_mod, "generate_outputs_tf", lambda *_a, **_k: None)
     monkeypatch.setattr(initialize_mod, "generate_provider_tf", lambda *_a, **_k: None)
-    monkeypatch.setattr(initialize_mod, "terraform_init", lambda *_a, **_k: None)
+    monkeypatch.setattr(
+        initialize_mod, "terraform_init_if_needed", lambda *_a, **_k: None
+    )
     monkeypatch.setattr(initialize_mod, "terraform_validate", lambda *_a, **_k: None)
 
     # Act
@@ -324,3 +346,169 @@ def test_initialize_unexpected_error_removes_env_dir(monkeypatch, temp_env_dir,
     # Assert
     assert "removed environment directory" in out.lower()
     assert not env_path.exists()
+
+
+def test_initialize_auto_cidr_allocates_free_block(monkeypatch, temp_env_dir, capsys):
+    existing = temp_env_dir / "dev"
+    existing.mkdir()
+    (existing / "main.tf").write_text(
+        'vnet_address_space      = ["10.0.0.0/16"]\n'
+        'subnet_address_prefixes = ["10.0.1.0/24"]\n'
+    )
+    args = SimpleNamespace(
+        environment="stage",
+        dry_run=False,
+        auto_cidr="10.0.0.0/8",
+        prefix_length=16,
+        subnet_prefix_length=24,
+    )
+    monkeypatch.setattr(initialize_mod, "prompt_with_default", mock_prompt_with_default)
+    monkeypatch.setattr(
+        initialize_mod, "terraform_init_if_needed", lambda *_a, **_k: None
+    )
+    monkeypatch.setattr(initialize_mod, "terraform_validate", lambda *_a, **_k: None)
+
+    def fail_prompted_check(*_a, **_k):
+        raise AssertionError("auto-cidr must not use the prompted overlap check")
+
+    monkeypatch.setattr(initialize_mod, "check_cidr_overlap", fail_prompted_check)
+
+    initialize_mod.run(args)
+
+    assert (
+        "Allocated VNet 10.1.0.0/16 and subnet 10.1.0.0/24" in capsys.readouterr().out
+    )
+    content = (temp_env_dir / "stage" / "variables.tf").read_text()
+    assert '["10.1.0.0/16"]' in content
+    assert '["10.1.0.0/24"]' in content
+
+
+def test_initialize_auto_cidr_pool_exhausted(monkeypatch, temp_env_dir, capsys):
+    existing = temp_env_dir / "dev"
+    existing.mkdir()
+    (existing / "main.tf").write_text('vnet_address_space = ["10.0.0.0/16"]\n')
+    args = SimpleNamespace(
+        environment="stage",
+        dry_run=False,
+        auto_cidr="10.0.0.0/16",
+        prefix_length=16,
+        subnet_prefix_length=24,
+    )
+    monkeypatch.setattr(initialize_mod, "prompt_with_default", mock_prompt_with_default)
+
+    initialize_mod.run(args)
+
+    assert "No free /16 block left" in capsys.readouterr().out
+    assert not (temp_env_dir / "stage").exists()
+
+
+def spec_args(spec_file, **overrides):
+    values = {
+        "environment": "dev",
+        "spec": str(spec_file),
+        "dry_run": False,
+        "auto_cidr": "10.0.0.0/8",
+        "prefix_length": 16,
+        "subnet_prefix_length": 24,
+        "jobs": 2,
+    }
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+def fake_generate(env_path, context, **_kwargs):
+    (env_path / "variables.tf").write_text(
+        f'variable "vnet_address_space" {{ default = ["{context["vnet_address_space"]}"] }}'
+    )
+
+
+def test_initialize_spec_rolls_back_failures(
+    monkeypatch, temp_env_dir, tmp_path, capsys
+):
+    spec_file = tmp_path / "envs.yaml"
+    spec_file.write_text("environments:\n  dev: {}\n  stage: {}\n  prod: {}\n")
+    for name in ("variables", "main", "outputs", "provider"):
+        monkeypatch.setattr(
+            initialize_mod,
+            f"generate_{name}_tf",
+            fake_generate if name == "variables" else lambda *_a, **_k: None,
+        )
+    monkeypatch.setattr(
+        initialize_mod,
+        "prompt_with_default",
+        lambda *_a: pytest.fail("spec mode must not prompt"),
+    )
+    monkeypatch.setattr(
+        initialize_mod, "terraform_init_if_needed", lambda *_a, **_k: None
+    )
+
+    def fake_validate(env_path, **_kwargs):
+        return SimpleNamespace(returncode=1 if env_path.name == "stage" else 0)
+
+    monkeypatch.setattr(initialize_mod, "terraform_validate", fake_validate)
+
+    with pytest.raises(SystemExit):
+        initialize_mod.run(spec_args(spec_file))
+
+    out = capsys.readouterr().out
+    assert "Validated 3 environments" in out
+    assert "dev    ✅ initialized" in out
+    assert "stage  ❌ terraform validate failed (exit code 1) (rolled back)" in out
+    assert (temp_env_dir / "dev").exists()
+    assert (temp_env_dir / "prod").exists()
+    assert not (temp_env_dir / "stage").exists()
+    assert (
+        load_render_manifest(temp_env_dir / "prod")["context"]["vnet_address_space"]
+        != load_render_manifest(temp_env_dir / "dev")["context"]["vnet_address_space"]
+    )
+
+
+def test_initialize_spec_invalid_creates_nothing(temp_env_dir, tmp_path, capsys):
+    spec_file = tmp_path / "envs.yaml"
+    spec_file.write_text("environments:\n  dev: {colour: red}\n  qa: {}\n")
+
+    with pytest.raises(SystemExit):
+        initialize_mod.run(spec_args(spec_file))
+
+    out = capsys.readouterr().out
+    assert "dev: unknown key 'colour'" in out
+    assert "qa: not a supported environment name (choose from dev, prod, stage)" in out
+    assert list(temp_env_dir.iterdir()) == [spec_file]
+
+
+def test_initialize_no_wait_fails_while_cidrs_are_being_reserved(
+    monkeypatch, temp_env_dir, capsys
+):
+    args = SimpleNamespace(
+        environment="stage",
+        dry_run=False,
+        auto_cidr="10.0.0.0/8",
+        prefix_length=16,
+        subnet_prefix_length=24,
+        wait=False,
+    )
+    monkeypatch.setattr(initialize_mod, "prompt_with_default", mock_prompt_with_default)
+
+    with locks.cidr_reservation_lock(purpose="initialize dev"), pytest.raises(
+        SystemExit
+    ) as excinfo:
+        initialize_mod.run(args)
+
+    assert excinfo.value.code == 1
+    out = capsys.readouterr().out
+    assert f"{locks.CIDR_LOCK_NAME} is locked by another InfraBox run" in out
+    assert "Unexpected error" not in out
+    assert not (temp_env_dir / "stage").exists()
+
+
+def test_init_and_validate_reuses_init_fingerprint(monkeypatch, temp_env_dir):
+    init_calls = []
+    monkeypatch.setattr(
+        initialize_mod,
+        "terraform_init_if_needed",
+        lambda env_path, **kwargs: init_calls.append((env_path, kwargs)),
+    )
+    monkeypatch.setattr(initialize_mod, "terraform_validate", lambda *_a, **_k: None)
+
+    assert initialize_mod.init_and_validate("dev", dry_run=False) is None
+    assert init_calls == [(temp_env_dir / "dev", {"dry_run": False})]
@@ -0,0 +1,79 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import cli.commands.inventory as inventory_cmd
+from cli import inventory
+from cli.tfstate import STATE_FILE_NAME
+
+VM = {
+    "module": "module.vm",
+    "mode": "managed",
+    "type": "azurerm_linux_virtual_machine",
+    "name": "vm",
+    "provider": "azurerm",
+    "instances": [{"attributes": {"size": "Standard_B1s", "tags": {"owner": "ops"}}}],
+}
+
+
+@pytest.fixture
+def environments_dir(monkeypatch, tmp_path):
+    environments_dir = tmp_path / "environments"
+    for environment in ("dev", "stage"):
+        (environments_dir / environment).mkdir(parents=True)
+        (environments_dir / environment / STATE_FILE_NAME).write_text(
+            json.dumps({"serial": 1, "lineage": "l1", "resources": [VM]})
+        )
+    monkeypatch.setattr(inventory_cmd, "ENVIRONMENTS_DIR", environments_dir)
+    monkeypatch.setattr(inventory, "INVENTORY_DB", tmp_path / "inventory.db")
+    return environments_dir
+
+
+def inventory_args(**overrides):
+    values = {
+        "type": None,
+        "module": None,
+        "tags": None,
+        "attributes": None,
+        "environments": None,
+        "json": False,
+        "rebuild": False,
+    }
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+def test_inventory_lists_matching_resources(environments_dir, capsys):
+    inventory_cmd.run(inventory_args(attributes=["size=Standard_B1s"], tags=["owner"]))
+
+    out = capsys.readouterr().out
+    assert "Indexed the state of dev, stage" in out
+    assert "  dev    module.vm.azurerm_linux_virtual_machine.vm" in out
+    assert "  stage  module.vm.azurerm_linux_virtual_machine.vm" in out
+    assert "2 matching resources" in out
+
+    inventory_cmd.run(inventory_args(environments=["dev"]))
+    out = capsys.readouterr().out
+    assert "Indexed" not in out
+    assert "1 matching resources" in out
+    assert environments_dir.exists()
+
+
+def test_inventory_json(environments_dir, capsys):
+    inventory_cmd.run(inventory_args(type="azurerm_public_ip", json=True))
+
+    assert json.loads(capsys.readouterr().out) == []
+    assert environments_dir.exists()
+
+
+@pytest.mark.parametrize(
+    "values, expected",
+    [
+        (None, {}),
+        (["size=Standard_B1s", "zone"], {"size": "Standard_B1s", "zone": None}),
+        (["name=a=b"], {"name": "a=b"}),
+    ],
+)
+def test_parse_filters(values, expected):
+    assert inventory_cmd.parse_filters(values) == expected
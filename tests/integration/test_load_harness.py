@@ -0,0 +1,45 @@
+import pytest
+
+from benchmarks import load
+
+ENVIRONMENTS = 3
+
+
+@pytest.mark.parametrize("command", ["initialize", "create", "destroy"])
+def test_load_harness_runs_commands_against_fake_terraform(command):
+    report = load.run_load(
+        load.parse_arguments(
+            [command, "--envs", str(ENVIRONMENTS), "--jobs", str(ENVIRONMENTS)]
+        )
+    )
+    assert report["failures"] == 0
+    assert report["environments"] == ENVIRONMENTS
+    assert report["p50_seconds"] <= report["p99_seconds"]
+    assert report["peak_rss_bytes"] > 0
+
+
+def test_load_harness_counts_injected_failures():
+    args = load.parse_arguments(
+        [
+            "create",
+            "--envs",
+            str(ENVIRONMENTS),
+            "--fail-rate",
+            "1",
+            "--fail-commands",
+            "apply",
+        ]
+    )
+    assert load.run_load(args)["failures"] == ENVIRONMENTS
+
+
+def test_load_harness_plan_without_changes_skips_apply():
+    args = load.parse_arguments(["create", "--envs", "2", "--plan-exit", "0"])
+    assert load.run_load(args)["failures"] == 0
+
+
+def test_percentile_nearest_rank():
+    values = [float(i) for i in range(1, 101)]
+    assert load.percentile(values, 0.50) == values[49]
+    assert load.percentile(values, 0.99) == values[98]
+    assert load.percentile(values[:1], 0.99) == values[0]
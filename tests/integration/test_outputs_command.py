@@ -0,0 +1,122 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import cli.commands.outputs as outputs_cmd
+from cli.tfstate import STATE_FILE_NAME
+
+OUTPUTS = {
+    "vm_public_ip": {"value": "20.1.2.3", "type": "string", "sensitive": False},
+    "tags": {"value": {"env": "dev"}, "type": ["map", "string"], "sensitive": False},
+    "admin_password": {"value": "hunter2", "type": "string", "sensitive": True},
+}
+
+
+def write_state(env_path, serial, lineage="lineage-1"):
+    (env_path / STATE_FILE_NAME).write_text(
+        json.dumps(
+            {
+                "version": 4,
+                "terraform_version": "1.8.0",
+                "serial": serial,
+                "lineage": lineage,
+                "outputs": {},
+                "resources": [],
+            }
+        )
+    )
+
+
+@pytest.fixture
+def env_path(monkeypatch, tmp_path):
+    monkeypatch.setattr(outputs_cmd, "get_env_path", lambda _env: tmp_path)
+    write_state(tmp_path, serial=3)
+    return tmp_path
+
+
+@pytest.fixture
+def terraform_output(monkeypatch):
+    calls = []
+
+    def fake_output(env_path):
+        calls.append(env_path)
+        return OUTPUTS
+
+    monkeypatch.setattr(outputs_cmd, "terraform_output_json", fake_output)
+    return calls
+
+
+def outputs_args(name=None, json_output=False):
+    return SimpleNamespace(environment="dev", name=name, json=json_output)
+
+
+def test_outputs_are_cached_until_the_state_changes(env_path, terraform_output):
+    assert outputs_cmd.environment_outputs(env_path) == OUTPUTS
+    assert outputs_cmd.environment_outputs(env_path) == OUTPUTS
+    assert terraform_output == [env_path]
+
+    write_state(env_path, serial=4)
+    outputs_cmd.environment_outputs(env_path)
+    assert terraform_output == [env_path] * 2
+
+    write_state(env_path, serial=4, lineage="lineage-2")
+    outputs_cmd.environment_outputs(env_path)
+    assert terraform_output == [env_path] * 3
+
+
+def test_outputs_cache_is_private(env_path, terraform_output):
+    outputs_cmd.environment_outputs(env_path)
+
+    cache_file = env_path / ".infrabox" / outputs_cmd.OUTPUTS_CACHE_FILE
+    assert cache_file.stat().st_mode & 0o777 == outputs_cmd.OUTPUTS_CACHE_MODE
+    assert terraform_output
+
+
+def test_environment_without_state_has_no_outputs(tmp_path, terraform_output):
+    assert outputs_cmd.environment_outputs(tmp_path) == {}
+    assert not terraform_output
+
+
+@pytest.mark.usefixtures("env_path", "terraform_output")
+def test_outputs_lists_values_hiding_sensitive_ones(capsys):
+    outputs_cmd.run(outputs_args())
+
+    out = capsys.readouterr().out
+    assert "vm_public_ip   = 20.1.2.3" in out
+    assert 'tags           = {"env": "dev"}' in out
+    assert "admin_password = <sensitive>" in out
+
+
+@pytest.mark.parametrize(
+    "name, json_output, expected",
+    [
+        ("vm_public_ip", False, "20.1.2.3\n"),
+        ("vm_public_ip", True, '"20.1.2.3"\n'),
+        ("tags", False, '{"env": "dev"}\n'),
+    ],
+)
+@pytest.mark.usefixtures("env_path", "terraform_output")
+def test_outputs_prints_one_value(capsys, name, json_output, expected):
+    outputs_cmd.run(outputs_args(name, json_output))
+
+    assert capsys.readouterr().out == expected
+
+
+@pytest.mark.usefixtures("env_path", "terraform_output")
+def test_outputs_json_prints_every_output(capsys):
+    outputs_cmd.run(outputs_args(json_output=True))
+
+    assert json.loads(capsys.readouterr().out) == OUTPUTS
+
+
+@pytest.mark.usefixtures("env_path", "terraform_output")
+def test_outputs_unknown_name(capsys):
+    with pytest.raises(SystemExit) as excinfo:
+        outputs_cmd.run(outputs_args("missing"))
+
+    assert excinfo.value.code == 1
+    assert (
+        "Output 'missing' not found in dev; it has: admin_password, tags, vm_public_ip"
+        in capsys.readouterr().out
+    )
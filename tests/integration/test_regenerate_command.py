@@ -0,0 +1,93 @@
+from types import SimpleNamespace
+
+import pytest
+
+import cli.commands.regenerate as regenerate_cmd
+import cli.infrastructure_templates as infra_templates
+from cli import locks
+
+
+@pytest.fixture
+def environments_dir(monkeypatch, tmp_path):
+    templates_dir = tmp_path / "templates"
+    templates_dir.mkdir()
+    for name in infra_templates.TEMPLATE_OUTPUTS:
+        (templates_dir / name).write_text(f"# {name} for {{{{ environment }}}}")
+    monkeypatch.setattr(infra_templates, "TEMPLATES_DIR", templates_dir)
+    monkeypatch.setattr(
+        infra_templates,
+        "env",
+        infra_templates.Environment(
+            loader=infra_templates.FileSystemLoader(templates_dir)
+        ),
+    )
+
+    environments_dir = tmp_path / "environments"
+    for environment in ("dev", "stage"):
+        env_path = environments_dir / environment
+        env_path.mkdir(parents=True)
+        infra_templates.render_environment(env_path, {"environment": environment})
+    monkeypatch.setattr(
+        regenerate_cmd,
+        "get_env_path",
+        lambda environment: environments_dir / environment,
+    )
+    return environments_dir
+
+
+def regenerate_args(*environments, force=False, wait=True):
+    return SimpleNamespace(
+        environments=list(environments),
+        all=False,
+        jobs=2,
+        dry_run=False,
+        force=force,
+        wait=wait,
+        trace=None,
+    )
+
+
+def test_regenerate_reports_up_to_date(environments_dir, capsys):
+    regenerate_cmd.run(regenerate_args("dev", "stage"))
+
+    out = capsys.readouterr().out
+    assert "dev    ✅ up to date" in out
+    assert "stage  ✅ up to date" in out
+    assert environments_dir.exists()
+
+
+def test_regenerate_rewrites_changed_template(environments_dir, capsys):
+    (infra_templates.TEMPLATES_DIR / "main.tf.j2").write_text(
+        "changed {{ environment }}"
+    )
+
+    regenerate_cmd.run(regenerate_args("dev", "stage"))
+
+    out = capsys.readouterr().out
+    assert "regenerated main.tf.j2" in out
+    assert (environments_dir / "stage" / "main.tf").read_text() == "changed stage"
+
+
+def test_regenerate_without_manifest_fails(environments_dir, capsys):
+    (environments_dir / "dev" / infra_templates.RENDER_MANIFEST_FILE).unlink()
+
+    with pytest.raises(SystemExit):
+        regenerate_cmd.run(regenerate_args("dev"))
+
+    assert "No render context saved" in capsys.readouterr().out
+
+
+def test_regenerate_no_wait_fails_when_environment_is_locked(environments_dir, capsys):
+    (infra_templates.TEMPLATES_DIR / "main.tf.j2").write_text(
+        "changed {{ environment }}"
+    )
+
+    with locks.file_lock("dev", purpose="create dev"), pytest.raises(
+        SystemExit
+    ) as excinfo:
+        regenerate_cmd.run(regenerate_args("dev", wait=False))
+
+    assert excinfo.value.code == 1
+    out = capsys.readouterr().out
+    assert "dev is locked by another InfraBox run" in out
+    assert (environments_dir / "dev" / "main.tf").read_text() == "# main.tf.j2 for dev"
@@ -0,0 +1,128 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import cli.commands.state as state_cmd
+from cli.tfstate import STATE_FILE_NAME
+
+PROVIDER = 'provider["registry.terraform.io/hashicorp/azurerm"]'
+STATE = {
+    "version": 4,
+    "serial": 7,
+    "lineage": "3f2a",
+    "resources": [
+        {
+            "mode": "managed",
+            "type": "azurerm_resource_group",
+            "name": "main",
+            "provider": PROVIDER,
+            "instances": [{"attributes": {"name": "rg-dev"}}],
+        },
+        {
+            "module": "module.networking",
+            "mode": "managed",
+            "type": "azurerm_subnet",
+            "name": "subnet",
+            "provider": PROVIDER,
+            "instances": [{"index_key": 0}, {"index_key": "b"}],
+        },
+        {
+            "module": "module.vm",
+            "mode": "data",
+            "type": "azurerm_image",
+            "name": "ubuntu",
+            "provider": PROVIDER,
+            "instances": [
+                {
+                    "attributes": {
+                        "admin_password": "hunter2",
+                        "location": "westeurope",
+                    },
+                    "sensitive_attributes": [
+                        [{"type": "get_attr", "value": "admin_password"}]
+                    ],
+                }
+            ],
+        },
+    ],
+}
+
+
+@pytest.fixture
+def env_path(monkeypatch, tmp_path):
+    monkeypatch.setattr(state_cmd, "get_env_path", lambda _env: tmp_path)
+    (tmp_path / STATE_FILE_NAME).write_text(json.dumps(STATE))
+    return tmp_path
+
+
+def ls_args(**overrides):
+    values = {
+        "environment": "dev",
+        "state_command": "ls",
+        "module": None,
+        "type": None,
+        "modules": False,
+    }
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+def show_args(address, json_output=False):
+    return SimpleNamespace(
+        environment="dev", state_command="show", address=address, json=json_output
+    )
+
+
+def test_state_ls(env_path, capsys):
+    state_cmd.run(ls_args(type="azurerm_subnet"))
+
+    assert capsys.readouterr().out.splitlines() == [
+        "module.networking.azurerm_subnet.subnet[0]",
+        'module.networking.azurerm_subnet.subnet["b"]',
+    ]
+    assert env_path.exists()
+
+
+def test_state_ls_modules(env_path, capsys):
+    state_cmd.run(ls_args(modules=True))
+
+    assert capsys.readouterr().out.splitlines() == ["module.networking", "module.vm"]
+    assert env_path.exists()
+
+
+def test_state_show_masks_sensitive_attributes(env_path, capsys):
+    state_cmd.run(show_args("module.vm.data.azurerm_image.ubuntu"))
+
+    out = capsys.readouterr().out
+    assert "🔎 module.vm.data.azurerm_image.ubuntu" in out
+    assert "admin_password = (sensitive value)" in out
+    assert "location       = westeurope" in out
+    assert "hunter2" not in out
+    assert env_path.exists()
+
+
+def test_state_show_json(env_path, capsys):
+    state_cmd.run(show_args("azurerm_resource_group.main", json_output=True))
+
+    instance = json.loads(capsys.readouterr().out)
+    assert instance["type"] == "azurerm_resource_group"
+    assert instance["attributes"] == {"name": "rg-dev"}
+    assert env_path.exists()
+
+
+def test_state_show_unknown_address(env_path, capsys):
+    with pytest.raises(SystemExit):
+        state_cmd.run(show_args("azurerm_subnet.missing"))
+
+    assert "No resource instance azurerm_subnet.missing" in capsys.readouterr().out
+    assert env_path.exists()
+
+
+def test_state_without_state_file(monkeypatch, tmp_path, capsys):
+    monkeypatch.setattr(state_cmd, "get_env_path", lambda _env: tmp_path)
+
+    with pytest.raises(SystemExit):
+        state_cmd.run(ls_args())
+
+    assert "dev has no Terraform state" in capsys.readouterr().out
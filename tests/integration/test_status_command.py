@@ -0,0 +1,49 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import cli.commands.status as status_cmd
+from cli import parallel
+from cli.terraform_utils import record_full_refresh
+
+
+@pytest.fixture
+def environments_dir(monkeypatch, tmp_path):
+    dev = tmp_path / "dev"
+    (dev / ".terraform").mkdir(parents=True)
+    (dev / "variables.tf").write_text(
+        'variable "vnet_address_space" {\n  default = ["10.1.0.0/16"]\n}\n'
+    )
+    (dev / "infrabox.tfplan").write_text("")
+    record_full_refresh(dev, when=time.time() - 120)
+    (tmp_path / "stage").mkdir()
+    monkeypatch.setattr(status_cmd, "ENVIRONMENTS_DIR", tmp_path)
+    monkeypatch.setattr(parallel, "ENVIRONMENTS_DIR", tmp_path)
+    return tmp_path
+
+
+def test_status_lists_every_initialized_environment(environments_dir, capsys):
+    status_cmd.run(SimpleNamespace(environments=[], all=True))
+
+    out = capsys.readouterr().out
+    assert (
+        "dev    ✅ initialized  10.1.0.0/16  refreshed 2m ago  ⚠️ saved plan pending"
+        in out
+    )
+    assert "stage  ⚪ not initialized  no CIDRs  refreshed never" in out
+    assert environments_dir.exists()
+
+
+@pytest.mark.parametrize(
+    "seconds, expected",
+    [
+        (None, "never"),
+        (5, "5s ago"),
+        (90, "1m ago"),
+        (7200, "2h ago"),
+        (90000, "1d ago"),
+    ],
+)
+def test_format_age(seconds, expected):
+    assert status_cmd.format_age(seconds) == expected
@@ -0,0 +1,71 @@
+import pytest
+
+from cli import adaptive_parallelism
+
+
+@pytest.mark.parametrize(
+    "line, throttled",
+    [
+        ("Error: autorest: StatusCode=429 -- Original Error", True),
+        ('Status=429 Code="SubscriptionRequestsThrottled"', True),
+        ("unexpected status 429 (429 Too Many Requests) with response", True),
+        ('Code="TooManyRequests" Message="Rate limit exceeded"', True),
+        ('Code="ResourceGroupRequestsThrottled"', True),
+        ("Code=RequestRateTooLarge", True),
+        ("module.vm: Still creating... [4290s elapsed]", False),
+        ('+ name = "api-throttling-policy"', False),
+        ("+ max_requests = 429", False),
+        ('~ description = "too many requests" -> null', False),
+        ("Apply complete! Resources: 4 added, 0 changed, 0 destroyed.", False),
+    ],
+)
+def test_throttle_counter(line, throttled):
+    counter = adaptive_parallelism.ThrottleCounter()
+    counter(line)
+    assert counter.count == int(throttled)
+
+
+@pytest.mark.parametrize(
+    "current, throttled, succeeded, expected",
+    [
+        (10, True, True, 5),
+        (10, True, False, 5),
+        (1, True, True, 1),
+        (10, False, True, 12),
+        (10, False, False, 10),
+        (
+            adaptive_parallelism.MAX_PARALLELISM,
+            False,
+            True,
+            adaptive_parallelism.MAX_PARALLELISM,
+        ),
+    ],
+)
+def test_next_parallelism(current, throttled, succeeded, expected):
+    assert (
+        adaptive_parallelism.next_parallelism(current, throttled, succeeded) == expected
+    )
+
+
+def test_parallelism_is_remembered_per_environment(tmp_path, capsys):
+    dev, prod = tmp_path / "dev", tmp_path / "prod"
+    requested = 20
+    halved = requested // 2
+
+    assert (
+        adaptive_parallelism.remembered_parallelism(dev)
+        == adaptive_parallelism.DEFAULT_PARALLELISM
+    )
+    assert adaptive_parallelism.remembered_parallelism(dev, requested) == requested
+
+    adaptive_parallelism.adapt_parallelism(dev, requested, throttled_lines=3)
+    assert "Throttling reported 3 time(s)" in capsys.readouterr().out
+    assert adaptive_parallelism.remembered_parallelism(dev, requested) == halved
+    assert adaptive_parallelism.remembered_parallelism(prod, requested) == requested
+
+    adaptive_parallelism.adapt_parallelism(dev, halved, throttled_lines=0)
+    assert (
+        adaptive_parallelism.resolve_parallelism(dev, requested, adaptive=True)
+        == halved + adaptive_parallelism.PARALLELISM_INCREASE
+    )
+    assert adaptive_parallelism.resolve_parallelism(dev, requested) == requested
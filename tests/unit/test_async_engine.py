@@ -0,0 +1,191 @@
+import asyncio
+import io
+import os
+import signal
+import sys
+import time
+
+import pytest
+
+from cli import async_engine
+
+FAILURE_EXIT_CODE = 2
+
+
+def python_cmd(script):
+    return [sys.executable, "-c", script]
+
+
+def test_run_cmd_async_echoes_logs_and_bounds_tail(monkeypatch, tmp_path, capsys):
+    monkeypatch.setattr(async_engine, "OUTPUT_TAIL_LINES", 3)
+    script = (
+        "import sys\n"
+        "for i in range(10):\n"
+        "    print(f'line {i}', flush=True)\n"
+        "print('failure', file=sys.stderr)\n"
+        f"sys.exit({FAILURE_EXIT_CODE})\n"
+    )
+    result = async_engine.run_sync(
+        async_engine.run_cmd_async(python_cmd(script), str(tmp_path))
+    )
+
+    assert result.returncode == FAILURE_EXIT_CODE
+    assert result.stdout == "line 7\nline 8\nline 9\n"
+    assert result.stderr == "failure\n"
+    captured = capsys.readouterr()
+    assert "line 0" in captured.out
+    assert "failure" in captured.err
+    log = (tmp_path / ".infrabox" / async_engine.COMMAND_LOG_FILE_NAME).read_text()
+    assert "[stdout] line 0" in log
+    assert "[stderr] failure" in log
+    assert "exit code 2" in log
+
+
+def test_run_cmd_async_passes_lines_to_observer(tmp_path, capsys):
+    lines = []
+    script = "import sys\nprint('out')\nprint('err', file=sys.stderr)\n"
+    result = async_engine.run_sync(
+        async_engine.run_cmd_async(
+            python_cmd(script),
+            str(tmp_path),
+            capture_output=False,
+            on_line=lines.append,
+        )
+    )
+
+    # Streamed even without capture_output, so every line can be observed
+    assert sorted(lines) == ["err\n", "out\n"]
+    assert result.stdout == "out\n"
+    assert "out" in capsys.readouterr().out
+
+
+def test_run_cmd_async_reads_lines_longer_than_the_stream_limit(tmp_path, capsys):
+    line_bytes = 2 * async_engine.STREAM_LIMIT_BYTES
+    script = f"print('x' * {line_bytes})\nprint('done')\n"
+    result = async_engine.run_sync(
+        async_engine.run_cmd_async(python_cmd(script), str(tmp_path))
+    )
+
+    assert result.returncode == 0
+    assert result.stdout.endswith("done\n")
+    assert "x" * line_bytes + "\ndone\n" in capsys.readouterr().out
+
+
+def test_run_cmd_async_writes_stdout_to_a_file_unlogged(tmp_path, capsys):
+    output = io.BytesIO()
+    script = "import sys\nprint('{\"secret\": 1}')\nprint('warning', file=sys.stderr)\n"
+    result = async_engine.run_sync(
+        async_engine.run_cmd_async(python_cmd(script), str(tmp_path), stdout=output)
+    )
+
+    assert output.getvalue() == b'{"secret": 1}\n'
+    assert result.stderr == "warning\n"
+    captured = capsys.readouterr()
+    assert "secret" not in captured.out
+    assert "Running command" not in captured.out
+    assert "Running command" in captured.err
+    log = (tmp_path / ".infrabox" / async_engine.COMMAND_LOG_FILE_NAME).read_text()
+    assert "[stdout]" not in log
+    assert "[stderr] warning" in log
+
+
+def test_run_cmd_async_failed_pump_stops_child(tmp_path):
+    def fail(_line):
+        raise ValueError("observer failed")
+
+    script = "import time\nprint('ready', flush=True)\ntime.sleep(30)\n"
+    started = time.monotonic()
+    with pytest.raises(ValueError, match="observer failed"):
+        async_engine.run_sync(
+            async_engine.run_cmd_async(python_cmd(script), str(tmp_path), on_line=fail)
+        )
+
+    assert time.monotonic() - started < async_engine.INTERRUPT_GRACE_SECONDS
+
+
+def test_run_cmd_async_dry_run(tmp_path, capsys):
+    result = async_engine.run_sync(
+        async_engine.run_cmd_async(["terraform", "plan"], str(tmp_path), dry_run=True)
+    )
+    assert result is None
+    assert "Dry-run mode" in capsys.readouterr().out
+
+
+def test_run_cmd_async_timeout_interrupts_child(tmp_path):
+    marker = tmp_path / "interrupted"
+    script = (
+        "import time\n"
+        "try:\n"
+        "    time.sleep(30)\n"
+        "except KeyboardInterrupt:\n"
+        f"    open({str(marker)!r}, 'w').close()\n"
+    )
+    started = time.monotonic()
+    with pytest.raises(async_engine.CommandTimeoutError, match="timed out"):
+        async_engine.run_sync(
+            async_engine.run_cmd_async(python_cmd(script), str(tmp_path), timeout=0.5)
+        )
+    assert time.monotonic() - started < async_engine.INTERRUPT_GRACE_SECONDS
+    # The child received SIGINT rather than being killed outright
+    assert marker.exists()
+
+
+def test_run_cmd_async_cancellation_stops_child(tmp_path):
+    async def cancel_soon():
+        task = asyncio.ensure_future(
+            async_engine.run_cmd_async(
+                python_cmd("import time; time.sleep(30)"), str(tmp_path)
+            )
+        )
+        await asyncio.sleep(0.5)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    started = time.monotonic()
+    async_engine.run_sync(cancel_soon())
+    assert time.monotonic() - started < async_engine.INTERRUPT_GRACE_SECONDS
+
+
+def test_run_cmd_async_runs_commands_concurrently(tmp_path):
+    async def run_both():
+        cmd = python_cmd("import time; time.sleep(0.5)")
+        return await asyncio.gather(
+            async_engine.run_cmd_async(cmd, str(tmp_path)),
+            async_engine.run_cmd_async(cmd, str(tmp_path)),
+        )
+
+    started = time.monotonic()
+    results = async_engine.run_sync(run_both())
+    assert [r.returncode for r in results] == [0, 0]
+    assert time.monotonic() - started < 1
+
+
+def test_run_cmd_async_forwards_exactly_one_sigint(tmp_path):
+    script = (
+        "import os, signal, sys, time\n"
+        "received = []\n"
+        "signal.signal(signal.SIGINT, lambda *_: received.append(1))\n"
+        "print(f'ready {os.getpgrp()}', flush=True)\n"
+        "deadline = time.monotonic() + 5\n"
+        "while not received and time.monotonic() < deadline:\n"
+        "    time.sleep(0.01)\n"
+        "time.sleep(0.5)\n"
+        "print(f'signals {len(received)}', flush=True)\n"
+    )
+    child_groups = []
+
+    def on_line(line):
+        if line.startswith("ready"):
+            child_groups.append(int(line.split()[1]))
+            # What Ctrl+C does to this process: the forwarding handler gets it
+            os.kill(os.getpid(), signal.SIGINT)
+
+    result = async_engine.run_sync(
+        async_engine.run_cmd_async(python_cmd(script), str(tmp_path), on_line=on_line)
+    )
+
+    # Out of the terminal's foreground process group, so Ctrl+C reaches the
+    # child only through the forwarding handler
+    assert child_groups != [os.getpgrp()]
+    assert "signals 1" in result.stdout
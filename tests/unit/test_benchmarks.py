@@ -0,0 +1,28 @@
+from benchmarks import run
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    results = {
+        "fast": {"median": 1.0, "min": 1.0},
+        "slow": {"median": 2.0, "min": 2.0},
+        "new": {"median": 1.0, "min": 1.0},
+    }
+    baseline = {"fast": {"median": 0.9}, "slow": {"median": 1.0}}
+    rows = {row[0]: row for row in run.compare(results, baseline, tolerance=0.3)}
+    assert rows["fast"][4] is False
+    assert rows["slow"][4] is True
+    assert rows["new"][2:] == (None, None, False)
+
+
+def test_baseline_round_trip(tmp_path):
+    baseline_file = tmp_path / "baseline.json"
+    results = {"validate_cidr": {"median": 5e-6, "min": 4e-6}}
+    run.save_baseline(baseline_file, results)
+    assert run.load_baseline(baseline_file) == results
+    assert run.load_baseline(tmp_path / "missing.json") == {}
+
+
+def test_format_duration():
+    assert run.format_duration(1.5) == "1.50 s"
+    assert run.format_duration(0.0025) == "2.50 ms"
+    assert run.format_duration(0.0000025) == "2.50 µs"
@@ -0,0 +1,158 @@
+import json
+import os
+
+import pytest
+
+from cli import cidr_registry
+
+VARIABLES_TF = """
+variable "vnet_address_space" {
+  type    = list(string)
+  default = ["%s"]
+}
+
+variable "subnet_address_space" {
+  type    = list(string)
+  default = ["%s"]
+}
+"""
+
+
+def make_env(environments_dir, name, vnet, subnet):
+    env_dir = environments_dir / name
+    env_dir.mkdir(exist_ok=True)
+    (env_dir / "variables.tf").write_text(VARIABLES_TF % (vnet, subnet))
+    return env_dir
+
+
+def test_extract_cidrs_from_template_and_literals():
+    content = VARIABLES_TF % ("10.1.0.0/16", "10.1.1.0/24")
+    content += 'vnet_address_space = ["10.9.0.0/16"]\nvnet_cidr = "bogus"\n'
+    content += "subnet_address_prefixes = var.subnet_address_space\n"
+    assert cidr_registry.extract_cidrs(content) == [
+        "10.1.0.0/16",
+        "10.1.1.0/24",
+        "10.9.0.0/16",
+    ]
+
+
+def test_find_overlap(tmp_path):
+    make_env(tmp_path, "dev", "10.0.0.0/16", "10.0.1.0/24")
+    make_env(tmp_path, "stage", "10.1.0.0/16", "10.1.1.0/24")
+    registry = cidr_registry.CidrRegistry.load(tmp_path)
+
+    assert registry.find_overlap("10.1.1.128/25") == ("stage", "10.1.1.0/24")
+    assert registry.find_overlap("10.0.0.0/8") is not None
+    assert registry.find_overlap("10.2.0.0/16") is None
+    assert registry.find_overlap("10.1.0.0/16", exclude_env="stage") is None
+
+
+def test_find_overlap_with_nested_ranges(tmp_path):
+    make_env(tmp_path, "wide", "10.0.0.0/8", "10.0.0.0/24")
+    make_env(tmp_path, "narrow", "192.168.0.0/24", "192.168.0.0/25")
+    registry = cidr_registry.CidrRegistry.load(tmp_path)
+
+    # The /8 starts long before the queried range but still covers it
+    assert registry.find_overlap("10.200.0.0/16") == ("wide", "10.0.0.0/8")
+    assert registry.find_overlap("192.168.1.0/24") is None
+
+
+def test_manifest_is_persisted_and_reused(tmp_path, monkeypatch):
+    make_env(tmp_path, "dev", "10.0.0.0/16", "10.0.1.0/24")
+    cidr_registry.CidrRegistry.load(tmp_path)
+    manifest = json.loads((tmp_path / cidr_registry.REGISTRY_FILE_NAME).read_text())
+    assert manifest["environments"]["dev"]["cidrs"] == ["10.0.0.0/16", "10.0.1.0/24"]
+
+    def fail(_content):
+        raise AssertionError("unchanged environments must not be re-read")
+
+    monkeypatch.setattr(cidr_registry, "extract_cidrs", fail)
+    registry = cidr_registry.CidrRegistry.load(tmp_path)
+    assert registry.find_overlap("10.0.0.0/24") == ("dev", "10.0.0.0/16")
+
+
+def test_changed_and_removed_environments_are_reindexed(tmp_path):
+    env_dir = make_env(tmp_path, "dev", "10.0.0.0/16", "10.0.1.0/24")
+    make_env(tmp_path, "stage", "10.1.0.0/16", "10.1.1.0/24")
+    cidr_registry.CidrRegistry.load(tmp_path)
+
+    variables = env_dir / "variables.tf"
+    variables.write_text(VARIABLES_TF % ("10.5.0.0/16", "10.5.1.0/24"))
+    stat = variables.stat()
+    os.utime(variables, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    for path in (tmp_path / "stage").iterdir():
+        path.unlink()
+    (tmp_path / "stage").rmdir()
+
+    registry = cidr_registry.CidrRegistry.load(tmp_path)
+    assert registry.find_overlap("10.0.0.0/16") is None
+    assert registry.find_overlap("10.1.0.0/16") is None
+    assert registry.find_overlap("10.5.0.0/16") == ("dev", "10.5.1.0/24")
+
+
+def test_register_records_new_environment(tmp_path):
+    make_env(tmp_path, "dev", "10.0.0.0/16", "10.0.1.0/24")
+    registry = cidr_registry.CidrRegistry.load(tmp_path)
+    (tmp_path / "stage").mkdir()
+    registry.register("stage", ["10.1.0.0/16", "10.1.1.0/24"])
+
+    reloaded = cidr_registry.CidrRegistry.load(tmp_path)
+    assert "stage" in reloaded.environments
+    assert reloaded.find_overlap("10.1.2.0/24") == ("stage", "10.1.0.0/16")
+
+
+def test_corrupt_manifest_is_rebuilt(tmp_path):
+    make_env(tmp_path, "dev", "10.0.0.0/16", "10.0.1.0/24")
+    (tmp_path / cidr_registry.REGISTRY_FILE_NAME).write_text("not json")
+    registry = cidr_registry.CidrRegistry.load(tmp_path)
+    assert registry.find_overlap("10.0.0.0/16") is not None
+
+
+@pytest.mark.parametrize("count", [500])
+def test_many_environments(tmp_path, count):
+    for i in range(count):
+        make_env(tmp_path, f"env{i}", f"10.{i // 2}.{(i % 2) * 128}.0/17", "")
+    registry = cidr_registry.CidrRegistry.load(tmp_path)
+    assert registry.find_overlap("10.3.130.0/24") == ("env7", "10.3.128.0/17")
+    assert registry.find_overlap("172.16.0.0/12") is None
+
+
+@pytest.mark.parametrize(
+    "existing,pool,prefix,expected",
+    [
+        ([], "10.0.0.0/8", 16, "10.0.0.0/16"),
+        (["10.0.0.0/16"], "10.0.0.0/8", 16, "10.1.0.0/16"),
+        (["10.0.0.0/16", "10.1.0.0/17"], "10.0.0.0/8", 16, "10.2.0.0/16"),
+        (["10.0.0.0/16", "10.1.128.0/17"], "10.0.0.0/8", 17, "10.1.0.0/17"),
+        (["10.0.0.0/9"], "10.0.0.0/8", 16, "10.128.0.0/16"),
+        (["192.168.0.0/16"], "10.0.0.0/8", 16, "10.0.0.0/16"),
+        (["10.0.0.0/16"], "10.0.0.0/8", 24, "10.1.0.0/24"),
+    ],
+)
+def test_allocate_first_free_block(tmp_path, existing, pool, prefix, expected):
+    for i, cidr in enumerate(existing):
+        env_dir = tmp_path / f"env{i}"
+        env_dir.mkdir()
+        (env_dir / "main.tf").write_text(f'vnet_address_space = ["{cidr}"]\n')
+    registry = cidr_registry.CidrRegistry.load(tmp_path)
+    assert registry.allocate(pool, prefix) == expected
+
+
+def test_allocate_ignores_excluded_environment(tmp_path):
+    make_env(tmp_path, "dev", "10.0.0.0/16", "10.0.1.0/24")
+    registry = cidr_registry.CidrRegistry.load(tmp_path)
+    assert registry.allocate("10.0.0.0/8", 16, exclude_env="dev") == "10.0.0.0/16"
+
+
+@pytest.mark.parametrize(
+    "pool,prefix,message",
+    [
+        ("10.0.0.0/16", 16, "No free /16 block"),
+        ("10.0.0.0/16", 8, "does not fit"),
+    ],
+)
+def test_allocate_errors(tmp_path, pool, prefix, message):
+    make_env(tmp_path, "dev", "10.0.0.0/16", "10.0.1.0/24")
+    registry = cidr_registry.CidrRegistry.load(tmp_path)
+    with pytest.raises(ValueError, match=message):
+        registry.allocate(pool, prefix)
@@ -0,0 +1,239 @@
+import json
+import os
+import socket
+import stat
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+from cli import daemon
+from cli.daemon_client import forward_to_daemon
+from cli.parallel import PrefixedOutput, run_for_environments
+from cli.plugin_cache import terraform_env
+from cli.utils import prompt_user_confirmation, run_cmd
+
+FAKE_COMMAND_MODULE = "tests_fake_daemon_command"
+USAGE_EXIT_CODE = 2
+
+
+@pytest.fixture
+def served_command(monkeypatch):
+    module = types.ModuleType(FAKE_COMMAND_MODULE)
+    monkeypatch.setitem(sys.modules, FAKE_COMMAND_MODULE, module)
+    monkeypatch.setitem(daemon.SERVED_COMMANDS, "create", FAKE_COMMAND_MODULE)
+    return module
+
+
+@pytest.fixture
+def socket_path(monkeypatch, tmp_path):
+    monkeypatch.setattr(
+        sys, "stdout", PrefixedOutput(daemon.ConsoleRouter(sys.stdout, "stdout"))
+    )
+    monkeypatch.setattr(
+        sys, "stderr", PrefixedOutput(daemon.ConsoleRouter(sys.stderr, "stderr"))
+    )
+    socket_path = tmp_path / "infrabox.sock"
+    server = daemon.InfraBoxDaemon(socket_path)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield socket_path
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def test_daemon_relays_output_prompts_and_exit_code(
+    monkeypatch, capsys, served_command, socket_path
+):
+    def run(args):
+        print(f"planning {args.environments}")
+        confirmed = prompt_user_confirmation()
+        run_for_environments(lambda env: print(f"applying {env}"), ["dev", "stage"], 2)
+        sys.exit(0 if confirmed else 3)
+
+    served_command.run = run
+    prompts = []
+    monkeypatch.setattr("builtins.input", lambda prompt: prompts.append(prompt) or "y")
+
+    assert forward_to_daemon(["create", "dev", "stage"], socket_path) == 0
+
+    out = capsys.readouterr().out
+    assert "planning ['dev', 'stage']" in out
+    assert "[dev] applying dev" in out
+    assert "[stage] applying stage" in out
+    assert prompts == ["INFRABOX: Proceed? [y/N]: "]
+
+
+def test_daemon_runs_commands_with_the_client_environment(
+    monkeypatch, tmp_path, capsys, served_command, socket_path
+):
+    def run(_args):
+        # What the daemon was started with, unlike the client
+        os.environ["TF_VAR_owner"] = "daemon"
+        print(f"owner {terraform_env()['TF_VAR_owner']}")
+        script = "import os; print('child owner', os.environ['TF_VAR_owner'])"
+        run_cmd([sys.executable, "-c", script], str(tmp_path))
+
+    served_command.run = run
+    monkeypatch.setenv("TF_VAR_owner", "client")
+
+    assert forward_to_daemon(["create", "dev"], socket_path) == 0
+
+    out = capsys.readouterr().out
+    assert "owner client" in out
+    assert "child owner client" in out
+
+
+def interruptible_command(tmp_path, script_lines):
+    """A served command running a child that reports the SIGINTs it gets."""
+    script = "\n".join(
+        [
+            "import os, signal, sys, time",
+            "received = []",
+            "signal.signal(signal.SIGINT, lambda *_: received.append(1))",
+            "print('ready', flush=True)",
+            *script_lines,
+            "deadline = time.monotonic() + 5",
+            "while not received and time.monotonic() < deadline:",
+            "    time.sleep(0.01)",
+            f"open({str(tmp_path / 'signals')!r}, 'w').write(str(len(received)))",
+        ]
+    )
+
+    def run(_args):
+        run_cmd([sys.executable, "-c", script], str(tmp_path))
+
+    return run
+
+
+def test_client_ctrl_c_interrupts_the_daemon_command(
+    tmp_path, capsys, served_command, socket_path
+):
+    # What Ctrl+C does to the client: the child signals the test process
+    served_command.run = interruptible_command(
+        tmp_path, ["os.kill(os.getppid(), signal.SIGINT)"]
+    )
+
+    assert forward_to_daemon(["create", "dev"], socket_path) == 0
+
+    assert (tmp_path / "signals").read_text() == "1"
+    assert "Interrupting the command in the daemon" in capsys.readouterr().out
+
+
+def test_dropped_client_interrupts_the_daemon_command(
+    monkeypatch, tmp_path, served_command, socket_path
+):
+    served_command.run = interruptible_command(tmp_path, [])
+    # Output capture replaces sys.stdout once the test starts
+    monkeypatch.setattr(
+        sys, "stdout", PrefixedOutput(daemon.ConsoleRouter(sys.stdout, "stdout"))
+    )
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(str(socket_path))
+        connection = client.makefile("rwb")
+        request = {"argv": ["create", "dev"], "cwd": str(tmp_path), "environ": {}}
+        connection.write(json.dumps(request).encode() + b"\n")
+        connection.flush()
+        output = ""
+        for line in connection:
+            output += json.loads(line).get("text", "")
+            if "\nready\n" in output:
+                break
+        connection.close()
+
+    deadline = time.monotonic() + 5
+    while not (tmp_path / "signals").exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert (tmp_path / "signals").read_text() == "1"
+
+
+def test_serve_creates_a_private_socket(monkeypatch, tmp_path):
+    socket_path = tmp_path / "infrabox.sock"
+    modes = []
+
+    def serve_forever(_server):
+        modes.append(stat.S_IMODE(socket_path.stat().st_mode))
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(daemon, "warm_up", lambda: None)
+    monkeypatch.setattr(daemon.signal, "signal", lambda *_args: None)
+    monkeypatch.setattr(daemon.InfraBoxDaemon, "serve_forever", serve_forever)
+    monkeypatch.setattr(sys, "stdout", sys.stdout)
+    monkeypatch.setattr(sys, "stderr", sys.stderr)
+
+    daemon.serve(socket_path)
+
+    assert modes == [daemon.SOCKET_MODE]
+    assert not socket_path.exists()
+
+
+def test_daemon_reports_errors_as_exit_codes(capsys, served_command, socket_path):
+    def run(_args):
+        raise RuntimeError("boom")
+
+    served_command.run = run
+
+    assert forward_to_daemon(["create", "dev"], socket_path) == 1
+    assert "RuntimeError: boom" in capsys.readouterr().err
+    assert forward_to_daemon(["create", "nowhere"], socket_path) == USAGE_EXIT_CODE
+    assert forward_to_daemon(["cache", "stats"], socket_path) == USAGE_EXIT_CODE
+    assert "not served by the daemon" in capsys.readouterr().out
+
+
+def test_requests_for_one_environment_run_one_at_a_time(capsys):
+    locks = daemon.EnvironmentLocks()
+    started, release = threading.Event(), threading.Event()
+    order = []
+
+    def first_request():
+        with locks.hold(["dev", "stage"]):
+            started.set()
+            release.wait()
+            order.append("first")
+
+    def second_request():
+        with locks.hold(["stage"]):
+            order.append("second")
+
+    first = threading.Thread(target=first_request)
+    first.start()
+    started.wait()
+    # Another environment does not wait
+    with locks.hold(["prod"]):
+        order.append("prod")
+    second = threading.Thread(target=second_request)
+    second.start()
+    second.join(timeout=0.1)
+    assert second.is_alive()
+
+    release.set()
+    first.join()
+    second.join()
+    assert order == ["prod", "first", "second"]
+    assert "Waiting for another request on stage" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize(
+    "argv, expected",
+    [
+        (["status"], []),
+        (["create", "dev", "prod"], ["dev", "prod"]),
+        (["destroy", "--all"], daemon.ENVIRONMENT_CHOICES),
+        (["initialize", "stage"], ["stage"]),
+        (["initialize", "--spec", "envs.yaml"], daemon.ENVIRONMENT_CHOICES),
+    ],
+)
+def test_request_environments(argv, expected):
+    assert daemon.request_environments(daemon.parse_arguments(argv)) == expected
+
+
+def test_forward_without_daemon(tmp_path):
+    stale_socket = tmp_path / "infrabox.sock"
+    assert forward_to_daemon(["status"], stale_socket) is None
+    stale_socket.touch()
+    assert not daemon.daemon_running(stale_socket)
+    assert forward_to_daemon(["status"], stale_socket) is None
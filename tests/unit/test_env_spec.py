@@ -0,0 +1,108 @@
+import re
+
+import pytest
+
+from cli import env_spec
+
+
+@pytest.fixture
+def environments_dir(tmp_path):
+    environments_dir = tmp_path / "environments"
+    (environments_dir / "prod").mkdir(parents=True)
+    (environments_dir / "prod" / "variables.tf").write_text(
+        'variable "vnet_address_space" {\n  default = ["10.0.0.0/16"]\n}\n'
+    )
+    return environments_dir
+
+
+def write_spec(tmp_path, content):
+    spec_file = tmp_path / "envs.yaml"
+    spec_file.write_text(content)
+    return spec_file
+
+
+def load(spec_file, environments_dir, pool="10.0.0.0/8"):
+    return env_spec.load_environment_specs(spec_file, environments_dir, pool, 16, 24)
+
+
+def test_explicit_and_allocated_cidrs(tmp_path, environments_dir):
+    spec_file = write_spec(
+        tmp_path,
+        "defaults:\n"
+        "  location: northeurope\n"
+        "environments:\n"
+        "  stage: {}\n"
+        "  dev:\n"
+        "    vnet_address_space: 10.1.0.0/16\n"
+        "    subnet_address_space: 10.1.1.0/24\n",
+    )
+
+    contexts = load(spec_file, environments_dir)
+
+    assert contexts["dev"]["vnet_address_space"] == "10.1.0.0/16"
+    # Allocated after the explicit CIDRs and the existing prod environment
+    assert contexts["stage"]["vnet_address_space"] == "10.2.0.0/16"
+    assert contexts["stage"]["subnet_address_space"] == "10.2.0.0/24"
+    assert contexts["stage"]["location"] == "northeurope"
+    assert contexts["stage"]["dns_zone_name"] == "Infrabox-stage.com"
+
+
+def test_reports_every_problem_at_once(tmp_path, environments_dir):
+    spec_file = write_spec(
+        tmp_path,
+        "environments:\n"
+        "  dev:\n"
+        "    vnet_address_space: 10.0.0.0/16\n"
+        "    subnet_address_space: 10.0.1.0/24\n"
+        "  stage:\n"
+        "    vnet_address_space: 10.5.0.0/33\n"
+        "    subnet_address_space: 10.5.0.0/24\n",
+    )
+
+    with pytest.raises(env_spec.SpecError) as excinfo:
+        load(spec_file, environments_dir)
+
+    overlap, invalid = excinfo.value.problems
+    assert "overlaps with 10.0.0.0/16 in environment 'prod'" in overlap
+    assert invalid.startswith("stage: Invalid CIDR")
+
+
+def test_spec_environments_overlap_each_other(tmp_path, environments_dir):
+    spec_file = write_spec(
+        tmp_path,
+        "environments:\n"
+        "  dev: {vnet_address_space: 10.1.0.0/16, subnet_address_space: 10.1.0.0/24}\n"
+        "  stage: {vnet_address_space: 10.1.0.0/20, subnet_address_space: 10.1.0.0/24}\n",
+    )
+
+    with pytest.raises(
+        env_spec.SpecError, match=re.escape("stage: CIDR 10.1.0.0/20 overlaps")
+    ):
+        load(spec_file, environments_dir)
+
+
+@pytest.mark.parametrize(
+    "content, problem",
+    [
+        ("environments:\n  prod: {}\n", "prod: environment files already exist"),
+        ("environments:\n  qa: {}\n", "qa: not a supported environment name"),
+        ("environments:\n  dev: {colour: red}\n", "dev: unknown key 'colour'"),
+        (
+            "environments:\n  dev: {vnet_address_space: 10.1.0.0/16}\n",
+            "go together",
+        ),
+        ("environments: {}\n", "defines no environments"),
+        ("- dev\n", "must map `environments`"),
+        ("environments: [\n", "is not valid YAML"),
+    ],
+)
+def test_invalid_specs(tmp_path, environments_dir, content, problem):
+    spec_file = write_spec(tmp_path, content)
+    with pytest.raises(env_spec.SpecError, match=problem):
+        load(spec_file, environments_dir)
+
+
+def test_allocation_needs_a_pool(tmp_path, environments_dir):
+    spec_file = write_spec(tmp_path, "environments:\n  dev: {}\n")
+    with pytest.raises(env_spec.SpecError, match="no --auto-cidr pool"):
+        load(spec_file, environments_dir, pool=None)
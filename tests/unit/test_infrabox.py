@@ -0,0 +1,95 @@
+import subprocess
+import sys
+import types
+
+import pytest
+
+import infrabox
+from cli.utils import INFRA_ROOT
+
+# Cumulative import time of infrabox.py, in microseconds. Importing every
+# command eagerly (Jinja2, asyncio, ...) took about three times this long.
+IMPORT_TIME_BUDGET_US = 60_000
+LAZY_MODULES = ("jinja2", "asyncio", "cli.commands", "cli.infrastructure_templates")
+
+
+def import_times():
+    """Return {module: cumulative microseconds} for a cold `import infrabox`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import infrabox"],
+        cwd=INFRA_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        times[name.strip()] = int(cumulative_us)
+    return times
+
+
+def test_import_does_not_load_command_dependencies():
+    imported = import_times()
+    for module in LAZY_MODULES:
+        assert module not in imported
+
+
+def test_import_time_within_budget():
+    # Best of a few runs, to keep a busy machine from failing the test
+    best = min(import_times()["infrabox"] for _ in range(3))
+    assert best <= IMPORT_TIME_BUDGET_US
+
+
+def test_run_command_imports_only_the_selected_command(monkeypatch):
+    calls = []
+    fake_module = types.SimpleNamespace(run=calls.append)
+    imported = []
+
+    def import_module(name):
+        imported.append(name)
+        return fake_module
+
+    monkeypatch.setattr(infrabox.importlib, "import_module", import_module)
+    args = types.SimpleNamespace(command="destroy")
+    infrabox.run_command(args)
+    assert imported == ["cli.commands.destroy"]
+    assert calls == [args]
+
+
+def test_run_command_unsupported(capsys):
+    infrabox.run_command(types.SimpleNamespace(command="unknown"))
+    assert "Unsupported command" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("command", sorted(infrabox.COMMANDS))
+def test_registered_commands_are_importable(command):
+    module = infrabox.importlib.import_module(infrabox.COMMANDS[command])
+    assert callable(module.run)
+
+
+def test_forward_to_daemon_only_when_running(monkeypatch, tmp_path):
+    forwarded = []
+    client = types.SimpleNamespace(
+        forward_to_daemon=lambda argv, path: forwarded.append((argv, path)) or 0
+    )
+    monkeypatch.setattr(infrabox.importlib, "import_module", lambda _name: client)
+    socket_path = tmp_path / "infrabox.sock"
+    monkeypatch.setattr(infrabox, "DAEMON_SOCKET_PATH", socket_path)
+    monkeypatch.delenv(infrabox.NO_DAEMON_VARIABLE, raising=False)
+    args = types.SimpleNamespace(command="create", trace=None)
+
+    assert infrabox.forward_to_daemon(args, ["create", "dev"]) is None
+    socket_path.touch()
+    assert infrabox.forward_to_daemon(args, ["create", "dev"]) == 0
+    assert forwarded == [(["create", "dev"], socket_path)]
+
+    # Traced, daemon-less and unserved commands run in this process
+    traced = types.SimpleNamespace(command="create", trace="trace.json")
+    assert infrabox.forward_to_daemon(traced, []) is None
+    cache = types.SimpleNamespace(command="cache", trace=None)
+    assert infrabox.forward_to_daemon(cache, []) is None
+    monkeypatch.setenv(infrabox.NO_DAEMON_VARIABLE, "1")
+    assert infrabox.forward_to_daemon(args, []) is None
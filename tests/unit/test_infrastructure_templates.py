@@ -1,3 +1,6 @@
+import os
+import subprocess
+import sys
 from pathlib import Path
 from unittest import mock
 
@@ -210,6 +213,82 @@ def test_render_template_output_path_permission_error(
     assert monkeypatch is not None
     assert fake_env.exists()
     assert template_file.exists()
-    with mock.patch.object(Path, "write_text", side_effect=PermissionError):
-        with pytest.raises(PermissionError):
-            infra_templates.render_template("main.tf.j2", context, output_path)
+    with mock.patch.object(
+        Path, "write_text", side_effect=PermissionError
+    ), pytest.raises(PermissionError):
+        infra_templates.render_template("main.tf.j2", context, output_path)
+
+
+def test_jinja2_loaded_on_first_render():
+    script = (
+        "import sys\n"
+        "import cli.infrastructure_templates as t\n"
+        "assert 'jinja2' not in sys.modules\n"
+        "t.template_environment()\n"
+        "assert 'jinja2' in sys.modules\n"
+    )
+    subprocess.run(
+        [sys.executable, "-c", script], cwd=infra_templates.INFRA_ROOT, check=True
+    )
+
+
+def test_write_if_changed_keeps_identical_file(tmp_path):
+    output_path = tmp_path / "main.tf"
+    output_path.write_text("same")
+    os.utime(output_path, (1, 1))
+
+    assert not infra_templates.write_if_changed(output_path, "same")
+    assert output_path.stat().st_mtime == 1
+
+    assert infra_templates.write_if_changed(output_path, "changed")
+    assert output_path.read_text() == "changed"
+    assert list(tmp_path.iterdir()) == [output_path]
+
+
+@pytest.fixture
+def all_templates(
+    template_file, variables_template, outputs_template, provider_template
+):
+    return [template_file, variables_template, outputs_template, provider_template]
+
+
+def test_render_environment_renders_only_changed_templates(tmp_path, all_templates):
+    env_path = tmp_path / "dev"
+    env_path.mkdir()
+    context = {"name": "A", "var": 1, "output": "o", "provider": "p"}
+
+    statuses = infra_templates.render_environment(env_path, context)
+    assert set(statuses.values()) == {infra_templates.RENDER_WRITTEN}
+    manifest = infra_templates.load_render_manifest(env_path)
+    assert manifest["context"] == context
+
+    # Nothing changed: no template is even rendered
+    with mock.patch.object(infra_templates, "render_template") as render:
+        statuses = infra_templates.render_environment(env_path, context)
+    render.assert_not_called()
+    assert set(statuses.values()) == {infra_templates.RENDER_UNCHANGED}
+
+    all_templates[0].write_text("Bye, {{ name }}!")
+    statuses = infra_templates.render_environment(env_path, context)
+    assert statuses["main.tf.j2"] == infra_templates.RENDER_WRITTEN
+    assert statuses["variables.tf.j2"] == infra_templates.RENDER_UNCHANGED
+    assert (env_path / "main.tf").read_text() == "Bye, A!"
+
+
+def test_render_environment_force_rewrites_nothing_identical(tmp_path, all_templates):
+    env_path = tmp_path / "dev"
+    env_path.mkdir()
+    context = {"name": "A", "var": 1, "output": "o", "provider": "p"}
+    infra_templates.render_environment(env_path, context)
+
+    statuses = infra_templates.render_environment(env_path, context, force=True)
+
+    # Every template is rendered, but identical output is not rewritten
+    assert len(all_templates) == len(statuses)
+    assert set(statuses.values()) == {infra_templates.RENDER_UNCHANGED}
+
+
+def test_load_render_manifest_missing_or_invalid(tmp_path):
+    assert infra_templates.load_render_manifest(tmp_path) is None
+    (tmp_path / infra_templates.RENDER_MANIFEST_FILE).write_text("{not json")
+    assert infra_templates.load_render_manifest(tmp_path) is None
@@ -0,0 +1,185 @@
+import json
+
+import pytest
+
+from cli import inventory
+from cli.tfstate import STATE_FILE_NAME
+
+
+def vm(name, size, environment):
+    return {
+        "module": "module.vm",
+        "mode": "managed",
+        "type": "azurerm_linux_virtual_machine",
+        "name": name,
+        "provider": "azurerm",
+        "instances": [
+            {
+                "attributes": {
+                    "size": size,
+                    "admin_password": "hunter2",
+                    "priority": None,
+                    "tags": {"environment": environment, "owner": "ops"},
+                    "network_interface_ids": ["nic-1"],
+                },
+                "sensitive_attributes": [
+                    [{"type": "get_attr", "value": "admin_password"}]
+                ],
+            }
+        ],
+    }
+
+
+PUBLIC_IP = {
+    "module": "module.networking",
+    "mode": "managed",
+    "type": "azurerm_public_ip",
+    "name": "pip",
+    "provider": "azurerm",
+    "instances": [{"attributes": {"ip_address": "20.1.2.3", "zones": []}}],
+}
+
+
+def write_state(environments_dir, environment, resources, serial=1):
+    env_path = environments_dir / environment
+    env_path.mkdir(exist_ok=True)
+    (env_path / STATE_FILE_NAME).write_text(
+        json.dumps(
+            {"version": 4, "serial": serial, "lineage": "l1", "resources": resources}
+        )
+    )
+
+
+@pytest.fixture
+def environments_dir(tmp_path):
+    environments_dir = tmp_path / "environments"
+    environments_dir.mkdir()
+    write_state(environments_dir, "dev", [vm("vm", "Standard_B1s", "dev"), PUBLIC_IP])
+    write_state(environments_dir, "prod", [vm("vm", "Standard_D2s_v3", "prod")])
+    (environments_dir / "stage").mkdir()  # Never created, so no state
+    return environments_dir
+
+
+@pytest.fixture
+def db(tmp_path):
+    with inventory.open_inventory(tmp_path / "inventory.db") as connection:
+        yield connection
+
+
+def addresses(resources):
+    return [(r["environment"], r["address"]) for r in resources]
+
+
+def test_update_indexes_only_changed_states(environments_dir, db, monkeypatch):
+    assert inventory.update_inventory(db, environments_dir) == {
+        "dev": inventory.INDEXED,
+        "prod": inventory.INDEXED,
+    }
+
+    read = []
+    original = inventory.iter_resources
+    monkeypatch.setattr(
+        inventory,
+        "iter_resources",
+        lambda env_path, **kw: read.append(env_path.name) or original(env_path, **kw),
+    )
+    write_state(environments_dir, "prod", [], serial=2)
+
+    assert inventory.update_inventory(db, environments_dir) == {
+        "dev": inventory.UNCHANGED,
+        "prod": inventory.INDEXED,
+    }
+    assert read == ["prod"]
+    assert addresses(inventory.query_resources(db, environments=["prod"])) == []
+
+
+def test_update_drops_environments_without_state(environments_dir, db):
+    inventory.update_inventory(db, environments_dir)
+    (environments_dir / "prod" / STATE_FILE_NAME).unlink()
+
+    changes = inventory.update_inventory(db, environments_dir)
+
+    assert changes["prod"] == inventory.REMOVED
+    assert {r["environment"] for r in inventory.query_resources(db)} == {"dev"}
+
+
+def test_force_reindexes_everything(environments_dir, db):
+    inventory.update_inventory(db, environments_dir)
+
+    changes = inventory.update_inventory(db, environments_dir, force=True)
+
+    assert set(changes.values()) == {inventory.INDEXED}
+
+
+@pytest.mark.parametrize(
+    "filters, expected",
+    [
+        (
+            {"resource_type": "azurerm_public_ip"},
+            [("dev", "module.networking.azurerm_public_ip.pip")],
+        ),
+        (
+            {"module": "module.vm"},
+            [
+                ("dev", "module.vm.azurerm_linux_virtual_machine.vm"),
+                ("prod", "module.vm.azurerm_linux_virtual_machine.vm"),
+            ],
+        ),
+        (
+            {"attributes": {"size": "Standard_B1s"}},
+            [("dev", "module.vm.azurerm_linux_virtual_machine.vm")],
+        ),
+        (
+            {"attributes": {"ip_address": None}},
+            [("dev", "module.networking.azurerm_public_ip.pip")],
+        ),
+        (
+            {"tags": {"environment": "prod", "owner": "ops"}},
+            [("prod", "module.vm.azurerm_linux_virtual_machine.vm")],
+        ),
+        (
+            {"tags": {"owner": None}, "environments": ["dev"]},
+            [("dev", "module.vm.azurerm_linux_virtual_machine.vm")],
+        ),
+        ({"attributes": {"admin_password": None}}, []),
+        ({"tags": {"owner": "dev"}}, []),
+    ],
+)
+def test_query_resources(environments_dir, db, filters, expected):
+    inventory.update_inventory(db, environments_dir)
+
+    assert addresses(inventory.query_resources(db, **filters)) == expected
+
+
+def test_update_indexes_deposed_objects_apart(environments_dir, db):
+    replaced = vm("vm", "Standard_B1s", "dev")
+    replaced["instances"].append(
+        {"deposed": "00a1b2c3", "attributes": {"size": "Standard_A1"}}
+    )
+    write_state(environments_dir, "dev", [replaced], serial=2)
+
+    inventory.update_inventory(db, environments_dir)
+
+    resources = inventory.query_resources(db, environments=["dev"])
+    assert [(r["address"], r["deposed"]) for r in resources] == [
+        ("module.vm.azurerm_linux_virtual_machine.vm", None),
+        (
+            "module.vm.azurerm_linux_virtual_machine.vm (deposed object 00a1b2c3)",
+            "00a1b2c3",
+        ),
+    ]
+    assert addresses(
+        inventory.query_resources(db, attributes={"size": "Standard_A1"})
+    ) == [
+        ("dev", "module.vm.azurerm_linux_virtual_machine.vm (deposed object 00a1b2c3)")
+    ]
+
+
+def test_open_inventory_recreates_outdated_schema(tmp_path, environments_dir):
+    db_path = tmp_path / "inventory.db"
+    with inventory.open_inventory(db_path) as connection:
+        inventory.update_inventory(connection, environments_dir)
+        connection.execute("PRAGMA user_version = 0")
+
+    with inventory.open_inventory(db_path) as connection:
+        assert inventory.query_resources(connection) == []
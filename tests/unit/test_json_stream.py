@@ -0,0 +1,61 @@
+import io
+import json
+
+import pytest
+
+from cli.json_stream import JsonScanner, iter_array_items
+
+DOCUMENT = {
+    "format_version": "1.2",
+    "planned_values": {
+        "root_module": {"resources": [{"values": {"tags": {"a": 'q\\"}]{['}}}]},
+        "escaped": "trailing backslash \\",
+    },
+    "resource_changes": [
+        {"address": "azurerm_resource_group.main", "values": [1, {"b": None}]},
+        {"address": 'odd\\"name', "count": -1.5e3, "flag": False},
+    ],
+    "errored": False,
+    "serial": 12,
+}
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 4096])
+def test_iter_array_items_yields_decoded_items(chunk_size):
+    stream = io.StringIO(json.dumps(DOCUMENT))
+    items = list(iter_array_items(stream, "resource_changes", chunk_size))
+    assert items == DOCUMENT["resource_changes"]
+
+
+def test_iter_array_items_missing_key_yields_nothing():
+    stream = io.StringIO(json.dumps({"other": [1, 2]}))
+    assert list(iter_array_items(stream, "resource_changes")) == []
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 4096])
+def test_scanner_reads_selected_values_and_skips_the_rest(chunk_size):
+    scanner = JsonScanner(io.StringIO(json.dumps(DOCUMENT, indent=2)), chunk_size)
+    values = {}
+    for key in scanner.iter_object():
+        if key in {"format_version", "errored", "serial"}:
+            values[key] = scanner.read_value()
+    assert values == {"format_version": "1.2", "errored": False, "serial": 12}
+
+
+def test_scanner_keeps_only_a_small_buffer():
+    items = [{"address": f"resource.{i}", "padding": "x" * 100} for i in range(2000)]
+    stream = io.StringIO(json.dumps({"resource_changes": items}))
+    chunk_size = 256
+    scanner = JsonScanner(stream, chunk_size=chunk_size)
+    largest = 0
+    for _key in scanner.iter_object():
+        for _ in scanner.iter_array():
+            scanner.read_value()
+            largest = max(largest, len(scanner.buffer))
+    assert largest < 4 * chunk_size
+
+
+def test_scanner_rejects_truncated_documents():
+    stream = io.StringIO('{"resource_changes": [{"address": "a"')
+    with pytest.raises(ValueError, match="Unexpected end"):
+        list(iter_array_items(stream, "resource_changes"))
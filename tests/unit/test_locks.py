@@ -0,0 +1,103 @@
+import asyncio
+import threading
+
+import pytest
+
+from cli import locks
+
+
+@pytest.fixture
+def locks_dir():
+    return locks.LOCKS_DIR
+
+
+def test_file_lock_records_holder(locks_dir):
+    with locks.file_lock("dev", purpose="create dev"):
+        holder = locks.lock_holder(locks_dir / "dev.lock")
+
+    assert holder.startswith("pid ")
+    assert "create dev" in holder
+
+
+def test_file_lock_no_wait_raises_when_held():
+    with locks.file_lock("dev", purpose="create dev"), pytest.raises(
+        locks.LockBusyError, match=r"dev is locked.*create dev"
+    ), locks.file_lock("dev", wait=False):
+        pass
+
+    # Released once the holder is done
+    with locks.file_lock("dev", wait=False):
+        pass
+
+
+def test_file_lock_waits_for_holder(capsys):
+    acquired, release = threading.Event(), threading.Event()
+    order = []
+
+    def holder():
+        with locks.file_lock("dev", purpose="destroy dev"):
+            acquired.set()
+            release.wait(5)
+            order.append("holder")
+
+    thread = threading.Thread(target=holder)
+    thread.start()
+    acquired.wait(5)
+    threading.Timer(0.05, release.set).start()
+
+    with locks.file_lock("dev"):
+        order.append("waiter")
+    thread.join()
+
+    assert order == ["holder", "waiter"]
+    assert "Waiting for the dev lock held by pid" in capsys.readouterr().out
+
+
+def test_environment_locks_hold_every_environment():
+    with locks.environment_locks(["stage", "dev", "stage"]):
+        for environment in ("dev", "stage"):
+            with pytest.raises(locks.LockBusyError), locks.file_lock(
+                environment, wait=False
+            ):
+                pass
+
+    with locks.file_lock("prod", wait=False):
+        pass
+
+
+def test_cidr_reservation_lock_is_independent_of_environments():
+    with locks.environment_locks(["dev"]), locks.cidr_reservation_lock(), pytest.raises(
+        locks.LockBusyError, match=locks.CIDR_LOCK_NAME
+    ), locks.cidr_reservation_lock(wait=False):
+        pass
+
+
+def test_exit_if_locked(capsys):
+    with pytest.raises(SystemExit) as excinfo, locks.exit_if_locked():
+        raise locks.LockBusyError("dev is locked by another InfraBox run")
+
+    assert excinfo.value.code == 1
+    assert "❌ dev is locked by another InfraBox run" in capsys.readouterr().out
+
+
+def test_file_lock_async_waits_without_blocking_the_loop(capsys):
+    order = []
+
+    async def holder():
+        async with locks.file_lock_async("plugin-cache", purpose="init dev"):
+            order.append("first")
+            await asyncio.sleep(0.1)
+            order.append("first done")
+
+    async def waiter():
+        await asyncio.sleep(0.01)
+        async with locks.file_lock_async("plugin-cache"):
+            order.append("second")
+
+    async def main():
+        await asyncio.gather(holder(), waiter())
+
+    asyncio.run(main())
+
+    assert order == ["first", "first done", "second"]
+    assert "Waiting for the plugin-cache lock held by pid" in capsys.readouterr().out
@@ -0,0 +1,81 @@
+import io
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from cli import parallel, utils
+
+
+def test_prefixed_output_prefixes_complete_lines():
+    stream = io.StringIO()
+    output = parallel.PrefixedOutput(stream)
+    utils.set_output_prefix("dev")
+    try:
+        output.write("first line\nsecond ")
+        output.write("line\n")
+        output.write("partial")
+        output.flush()
+    finally:
+        utils.set_output_prefix(None)
+    output.write("unprefixed\n")
+    assert stream.getvalue() == (
+        "[dev] first line\n[dev] second line\n[dev] partial\nunprefixed\n"
+    )
+
+
+def test_run_for_environments_single_environment_runs_inline():
+    def fail(_env):
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError, match="boom"):
+        parallel.run_for_environments(fail, ["dev"], 4)
+
+
+def test_run_for_environments_collects_results_and_errors(capsys):
+    def work(env):
+        print(f"working on {env}")
+        if env == "prod":
+            raise ValueError("bad prod")
+        return env.upper()
+
+    results, errors = parallel.run_for_environments(work, ["dev", "stage", "prod"], 2)
+
+    assert results == {"dev": "DEV", "stage": "STAGE"}
+    assert str(errors["prod"]) == "bad prod"
+    out = capsys.readouterr().out
+    assert "[stage] working on stage" in out
+
+
+def test_run_for_environments_respects_job_limit():
+    lock = threading.Lock()
+    state = {"running": 0, "peak": 0}
+
+    def work(_env):
+        with lock:
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+        time.sleep(0.02)
+        with lock:
+            state["running"] -= 1
+
+    jobs = 2
+    parallel.run_for_environments(work, ["a", "b", "c", "d", "e"], jobs)
+    assert state["peak"] <= jobs
+
+
+def test_resolve_environments(tmp_path):
+    for env in ["prod", "dev", "custom"]:
+        (tmp_path / env).mkdir()
+    (tmp_path / "stage").write_text("not a directory")
+
+    args = SimpleNamespace(all=True, environments=[])
+    assert parallel.resolve_environments(args, tmp_path) == ["dev", "prod"]
+    args = SimpleNamespace(all=False, environments=["stage"])
+    assert parallel.resolve_environments(args, tmp_path) == ["stage"]
+
+
+def test_describe_error():
+    assert parallel.describe_error(SystemExit(1)) == "❌ failed (exit code 1)"
+    assert parallel.describe_error(ValueError("x")) == "❌ failed: x"
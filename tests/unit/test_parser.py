@@ -12,19 +12,23 @@ from cli import parser
     [
         (
             ["prog", "create", "dev"],
-            {"command": "create", "environment": "dev", "dry_run": False},
+            {"command": "create", "environments": ["dev"], "dry_run": False},
         ),
         (
             ["prog", "create", "stage", "--dry-run"],
-            {"command": "create", "environment": "stage", "dry_run": True},
+            {"command": "create", "environments": ["stage"], "dry_run": True},
+        ),
+        (
+            ["prog", "create", "prod", "--force-init"],
+            {"command": "create", "environments": ["prod"], "force_init": True},
         ),
         (
             ["prog", "destroy", "dev"],
-            {"command": "destroy", "environment": "dev", "dry_run": False},
+            {"command": "destroy", "environments": ["dev"], "dry_run": False},
         ),
         (
             ["prog", "destroy", "stage", "--dry-run"],
-            {"command": "destroy", "environment": "stage", "dry_run": True},
+            {"command": "destroy", "environments": ["stage"], "dry_run": True},
         ),
         (
             ["prog", "initialize"],
@@ -38,6 +42,178 @@ from cli import parser
             ["prog", "initialize", "stage", "--dry-run"],
             {"command": "initialize", "environment": "stage", "dry_run": True},
         ),
+        (
+            ["prog", "create", "dev", "stage", "prod", "--jobs", "2"],
+            {"environments": ["dev", "stage", "prod"], "all": False, "jobs": 2},
+        ),
+        (
+            ["prog", "destroy", "--all"],
+            {"command": "destroy", "environments": [], "all": True, "jobs": 4},
+        ),
+        (
+            ["prog", "create", "dev", "dev"],
+            {"environments": ["dev"]},
+        ),
+        (
+            ["prog", "initialize", "stage", "--auto-cidr"],
+            {
+                "auto_cidr": "10.0.0.0/8",
+                "prefix_length": 16,
+                "subnet_prefix_length": 24,
+            },
+        ),
+        (
+            [
+                "prog",
+                "initialize",
+                "--auto-cidr",
+                "172.16.0.0/12",
+                "--prefix-length",
+                "20",
+            ],
+            {"auto_cidr": "172.16.0.0/12", "prefix_length": 20},
+        ),
+        (
+            ["prog", "cache", "prune", "--dry-run"],
+            {"command": "cache", "action": "prune", "dry_run": True},
+        ),
+        (
+            ["prog", "create", "dev", "--trace", "trace.json"],
+            {"command": "create", "trace": "trace.json"},
+        ),
+        (
+            ["prog", "initialize", "dev", "--trace", "trace.json"],
+            {"command": "initialize", "trace": "trace.json"},
+        ),
+        (
+            ["prog", "cache", "stats"],
+            {"command": "cache", "trace": None},
+        ),
+        (
+            ["prog", "status", "--trace", "trace.json"],
+            {"command": "status", "trace": "trace.json"},
+        ),
+        (
+            ["prog", "state", "ls", "dev", "--trace", "trace.json"],
+            {"command": "state", "state_command": "ls", "trace": "trace.json"},
+        ),
+        (
+            ["prog", "state", "show", "dev", "azurerm_resource_group.main"],
+            {"command": "state", "state_command": "show", "trace": None},
+        ),
+        (
+            ["prog", "inventory", "--trace", "trace.json"],
+            {"command": "inventory", "trace": "trace.json"},
+        ),
+        (
+            ["prog", "outputs", "dev", "--trace", "trace.json"],
+            {"command": "outputs", "trace": "trace.json"},
+        ),
+        (
+            ["prog", "serve", "--trace", "trace.json"],
+            {"command": "serve", "trace": "trace.json"},
+        ),
+        (
+            ["prog", "drift", "--trace", "trace.json"],
+            {"command": "drift", "trace": "trace.json"},
+        ),
+        (
+            ["prog", "initialize", "--spec", "envs.yaml", "--auto-cidr", "--jobs", "8"],
+            {"spec": "envs.yaml", "auto_cidr": "10.0.0.0/8", "jobs": 8},
+        ),
+        (
+            ["prog", "create", "dev", "--module", "networking", "--module", "dns"],
+            {"modules": ["networking", "dns"]},
+        ),
+        (
+            ["prog", "create", "dev"],
+            {"modules": None},
+        ),
+        (
+            ["prog", "create", "dev", "--refresh-ttl", "15m"],
+            {"refresh_ttl": 900},
+        ),
+        (
+            ["prog", "destroy", "dev", "--refresh-ttl", "90"],
+            {"refresh_ttl": 90},
+        ),
+        (
+            ["prog", "create", "dev"],
+            {"refresh_ttl": None},
+        ),
+        (
+            ["prog", "create", "dev", "--parallelism", "20", "--adaptive-parallelism"],
+            {"parallelism": 20, "adaptive_parallelism": True},
+        ),
+        (
+            ["prog", "destroy", "dev"],
+            {"parallelism": None, "adaptive_parallelism": False},
+        ),
+        (
+            ["prog", "create", "dev"],
+            {"wait": True},
+        ),
+        (
+            ["prog", "destroy", "dev", "--no-wait"],
+            {"wait": False},
+        ),
+        (
+            ["prog", "initialize", "dev", "--no-wait"],
+            {"wait": False},
+        ),
+        (
+            ["prog", "status"],
+            {"command": "status", "environments": [], "all": True},
+        ),
+        (
+            ["prog", "status", "dev"],
+            {"command": "status", "environments": ["dev"], "all": False},
+        ),
+        (
+            ["prog", "drift"],
+            {"command": "drift", "all": True, "timeout": 600, "watch": None},
+        ),
+        (
+            ["prog", "drift", "dev", "--watch", "1h", "--timeout", "5m"],
+            {"environments": ["dev"], "watch": 3600, "timeout": 300},
+        ),
+        (
+            ["prog", "outputs", "dev"],
+            {"command": "outputs", "environment": "dev", "name": None, "json": False},
+        ),
+        (
+            ["prog", "outputs", "prod", "vm_public_ip", "--json"],
+            {"environment": "prod", "name": "vm_public_ip", "json": True},
+        ),
+        (
+            ["prog", "state", "ls", "dev", "--type", "azurerm_subnet"],
+            {"command": "state", "state_command": "ls", "type": "azurerm_subnet"},
+        ),
+        (
+            ["prog", "state", "show", "dev", "azurerm_resource_group.main"],
+            {"state_command": "show", "address": "azurerm_resource_group.main"},
+        ),
+        (
+            [
+                "prog",
+                "inventory",
+                "--tag",
+                "owner=ops",
+                "--attr",
+                "size",
+                "--env",
+                "dev",
+            ],
+            {"tags": ["owner=ops"], "attributes": ["size"], "environments": ["dev"]},
+        ),
+        (
+            ["prog", "serve", "--socket", "/tmp/ib.sock"],
+            {"command": "serve", "socket": "/tmp/ib.sock", "trace": None},
+        ),
+        (
+            ["prog", "regenerate", "--all", "--force"],
+            {"command": "regenerate", "all": True, "force": True, "dry_run": False},
+        ),
     ],
 )
 def test_parse_arguments_valid(monkeypatch, argv, expected):
@@ -56,6 +232,14 @@ def test_parse_arguments_valid(monkeypatch, argv, expected):
         (["prog", "create", "bar"], "invalid choice: 'bar'"),
         (["prog", "destroy", "pseudo"], "invalid choice: 'pseudo'"),
         (["prog", "initialize", "foo"], "invalid choice: 'foo'"),
+        (["prog", "cache", "clear"], "invalid choice: 'clear'"),
+        (["prog", "regenerate"], "the following arguments are required: environment"),
+        (["prog", "status", "qa"], "invalid choice: 'qa'"),
+        (["prog", "create", "dev", "--all"], "not allowed with explicit"),
+        (["prog", "create", "dev", "--jobs", "0"], "must be at least 1"),
+        (["prog", "create", "dev", "--refresh-ttl", "soon"], "invalid duration"),
+        (["prog", "destroy", "dev", "--parallelism", "0"], "must be at least 1"),
+        (["prog", "create", "dev", "--refresh-ttl=-5m"], "must not be negative"),
     ],
 )
 def test_parse_arguments_invalid(monkeypatch, argv, error_text):
@@ -83,6 +267,14 @@ def test_parse_arguments_help(monkeypatch):
         assert excinfo.value.code == 0
 
 
+def test_top_level_help_lists_every_subcommand(capsys):
+    with pytest.raises(SystemExit):
+        parser.parse_arguments(["--help"])
+
+    out = capsys.readouterr().out
+    assert all(command in out for command in parser.SUBCOMMAND_PARSERS)
+
+
 def test_parse_arguments_extra_flags(monkeypatch):
     # Unknown flags should cause error
     monkeypatch.setattr(sys, "argv", ["prog", "create", "dev", "--unknown"])
@@ -0,0 +1,114 @@
+import contextlib
+import io
+import json
+
+import pytest
+
+from cli import plan_summary
+
+
+def resource_change(address, actions, module=None):
+    change = {
+        "address": address,
+        "type": address.split(".")[-2],
+        "change": {"actions": actions},
+    }
+    if module:
+        change["module_address"] = module
+    return change
+
+
+PLAN = {
+    "format_version": "1.2",
+    "planned_values": {"root_module": {}},
+    "resource_changes": [
+        resource_change("azurerm_resource_group.main", ["create"]),
+        resource_change(
+            "module.network.azurerm_subnet.main", ["delete", "create"], "module.network"
+        ),
+        resource_change(
+            "module.network.azurerm_virtual_network.main", ["update"], "module.network"
+        ),
+        resource_change("azurerm_storage_account.logs", ["delete"]),
+        resource_change("azurerm_key_vault.main", ["no-op"]),
+        resource_change("data.azurerm_client_config.current", ["read"]),
+    ],
+}
+
+
+@pytest.fixture
+def fake_show(monkeypatch):
+    calls = []
+
+    @contextlib.contextmanager
+    def show(env_path, plan_file):
+        calls.append((env_path, plan_file))
+        yield io.StringIO(json.dumps(PLAN))
+
+    monkeypatch.setattr(plan_summary, "terraform_show_json", show)
+    return calls
+
+
+@pytest.mark.parametrize(
+    "actions,expected",
+    [
+        (["create"], "create"),
+        (["update"], "update"),
+        (["delete"], "destroy"),
+        (["delete", "create"], "replace"),
+        (["create", "delete"], "replace"),
+        (["no-op"], None),
+        (["read"], None),
+    ],
+)
+def test_change_action(actions, expected):
+    assert plan_summary.change_action(actions) == expected
+
+
+def test_summarize_plan_counts_by_module_and_type():
+    summary = plan_summary.summarize_plan(io.StringIO(json.dumps(PLAN)))
+    assert summary["counts"] == {"create": 1, "update": 1, "replace": 1, "destroy": 1}
+    assert summary["modules"]["root"]["azurerm_storage_account"]["destroy"] == 1
+    assert summary["modules"]["module.network"]["azurerm_subnet"]["replace"] == 1
+    assert "azurerm_key_vault" not in summary["modules"]["root"]
+    assert summary["replacements"] == ["module.network.azurerm_subnet.main"]
+
+
+def test_load_plan_summary_summarizes_the_saved_plan(tmp_path, fake_show):
+    plan_file = tmp_path / "infrabox.tfplan"
+    plan_file.write_bytes(b"plan")
+
+    summary = plan_summary.load_plan_summary(tmp_path, str(plan_file))
+
+    assert summary == plan_summary.summarize_plan(io.StringIO(json.dumps(PLAN)))
+    assert fake_show == [(tmp_path, str(plan_file))]
+
+
+def test_load_plan_summary_missing_plan_returns_none(tmp_path, fake_show):
+    assert plan_summary.load_plan_summary(tmp_path, str(tmp_path / "none")) is None
+    assert fake_show == []
+
+
+def test_load_plan_summary_show_failure(monkeypatch, tmp_path, capsys):
+    @contextlib.contextmanager
+    def failing_show(_env_path, _plan_file):
+        raise RuntimeError("terraform show exited with code 1")
+        yield
+
+    monkeypatch.setattr(plan_summary, "terraform_show_json", failing_show)
+    plan_file = tmp_path / "infrabox.tfplan"
+    plan_file.write_bytes(b"plan")
+    assert plan_summary.load_plan_summary(tmp_path, str(plan_file)) is None
+    assert "Could not summarize" in capsys.readouterr().out
+
+
+def test_print_plan_summary_flags_replacements(capsys):
+    summary = plan_summary.summarize_plan(io.StringIO(json.dumps(PLAN)))
+    plan_summary.print_plan_summary("dev", summary)
+    out = capsys.readouterr().out
+    assert (
+        "Plan summary for dev: 1 to create, 1 to update, 1 to replace, 1 to destroy"
+        in out
+    )
+    assert "module.network  azurerm_subnet           -/+1" in out
+    assert "-/+ module.network.azurerm_subnet.main" in out
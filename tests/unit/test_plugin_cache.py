@@ -0,0 +1,104 @@
+import json
+
+import pytest
+
+from cli import plugin_cache
+
+PROVIDER_SIZE = 10
+
+LOCK_CONTENT = """
+provider "registry.terraform.io/hashicorp/azurerm" {
+  version     = "3.117.1"
+  constraints = "~> 3.0"
+  hashes = [
+    "h1:abc=",
+  ]
+}
+"""
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    cache = tmp_path / "cache"
+    for version in ["3.117.1", "3.100.0"]:
+        version_dir = cache / "registry.terraform.io" / "hashicorp" / "azurerm"
+        version_dir = version_dir / version / "linux_amd64"
+        version_dir.mkdir(parents=True)
+        (version_dir / "terraform-provider-azurerm").write_bytes(b"x" * PROVIDER_SIZE)
+    return cache
+
+
+@pytest.fixture
+def environments_dir(tmp_path):
+    envs = tmp_path / "environments"
+    (envs / "dev").mkdir(parents=True)
+    (envs / "dev" / ".terraform.lock.hcl").write_text(LOCK_CONTENT)
+    (envs / "stage").mkdir()
+    return envs
+
+
+def test_terraform_env_sets_plugin_cache_dir(tmp_path):
+    env = plugin_cache.terraform_env(tmp_path)
+    assert env["TF_PLUGIN_CACHE_DIR"] == str(tmp_path)
+
+
+def test_locked_providers(environments_dir):
+    lock_file = environments_dir / "dev" / ".terraform.lock.hcl"
+    assert plugin_cache.locked_providers(lock_file) == {
+        ("registry.terraform.io/hashicorp/azurerm", "3.117.1")
+    }
+    assert plugin_cache.locked_providers(environments_dir / "missing.hcl") == set()
+
+
+def test_cached_providers(cache_dir):
+    assert sorted(plugin_cache.cached_providers(cache_dir)) == [
+        ("registry.terraform.io/hashicorp/azurerm", "3.100.0"),
+        ("registry.terraform.io/hashicorp/azurerm", "3.117.1"),
+    ]
+
+
+def test_record_lookups_counts_hits_and_misses(tmp_path, environments_dir, cache_dir):
+    stats_file = tmp_path / "stats.json"
+    plugin_cache.record_lookups(environments_dir / "dev", cache_dir, stats_file)
+    plugin_cache.record_lookups(environments_dir / "dev", tmp_path / "new", stats_file)
+    plugin_cache.record_lookups(environments_dir / "stage", cache_dir, stats_file)
+    assert json.loads(stats_file.read_text()) == {"hits": 1, "misses": 1}
+
+
+def test_record_lookups_reports_full_hits(tmp_path, environments_dir, cache_dir):
+    stats_file = tmp_path / "stats.json"
+    assert plugin_cache.record_lookups(environments_dir / "dev", cache_dir, stats_file)
+    assert not plugin_cache.record_lookups(
+        environments_dir / "dev", tmp_path / "new", stats_file
+    )
+    assert not plugin_cache.record_lookups(
+        environments_dir / "stage", cache_dir, stats_file
+    )
+
+
+def test_cache_stats(tmp_path, cache_dir):
+    stats_file = tmp_path / "stats.json"
+    stats_file.write_text(json.dumps({"hits": 3, "misses": 1}))
+    summary = plugin_cache.cache_stats(cache_dir, stats_file)
+    assert summary["size_bytes"] == 2 * PROVIDER_SIZE
+    assert sorted(summary["providers"]) == sorted(
+        plugin_cache.cached_providers(cache_dir)
+    )
+    assert summary["hit_rate"] == pytest.approx(3 / 4)
+
+
+def test_cache_stats_without_lookups(tmp_path):
+    summary = plugin_cache.cache_stats(tmp_path / "cache", tmp_path / "stats.json")
+    assert summary["size_bytes"] == 0
+    assert summary["hit_rate"] is None
+
+
+@pytest.mark.parametrize("dry_run", [False, True])
+def test_prune_cache_evicts_unreferenced_versions(environments_dir, cache_dir, dry_run):
+    evicted, freed = plugin_cache.prune_cache(
+        environments_dir, cache_dir, dry_run=dry_run
+    )
+    assert evicted == [("registry.terraform.io/hashicorp/azurerm", "3.100.0")]
+    assert freed == PROVIDER_SIZE
+    remaining = plugin_cache.cached_providers(cache_dir)
+    assert len(remaining) == (2 if dry_run else 1)
@@ -0,0 +1,72 @@
+import os
+from unittest import mock
+
+import jinja2
+import pytest
+
+from cli import template_cache
+
+
+@pytest.fixture
+def templates_dir(tmp_path):
+    directory = tmp_path / "templates"
+    directory.mkdir()
+    (directory / "main.tf.j2").write_text('name = "{{ name }}"\n')
+    return directory
+
+
+def make_environment(templates_dir, cache):
+    return jinja2.Environment(
+        loader=jinja2.FileSystemLoader(templates_dir), bytecode_cache=cache
+    )
+
+
+def test_second_environment_skips_compilation(tmp_path, templates_dir):
+    cache = template_cache.TemplateBytecodeCache(tmp_path / "cache")
+    first = make_environment(templates_dir, cache)
+    assert first.get_template("main.tf.j2").render(name="a") == 'name = "a"'
+    assert len(list((tmp_path / "cache").iterdir())) == 1
+
+    second = make_environment(templates_dir, cache)
+    with mock.patch.object(second, "compile", wraps=second.compile) as compile_:
+        assert second.get_template("main.tf.j2").render(name="b") == 'name = "b"'
+    compile_.assert_not_called()
+
+
+def test_changed_template_is_recompiled(tmp_path, templates_dir):
+    cache = template_cache.TemplateBytecodeCache(tmp_path / "cache")
+    make_environment(templates_dir, cache).get_template("main.tf.j2")
+    (templates_dir / "main.tf.j2").write_text('id = "{{ name }}"\n')
+
+    environment = make_environment(templates_dir, cache)
+    assert environment.get_template("main.tf.j2").render(name="x") == 'id = "x"'
+    # Both versions stay cached, as each is keyed by its content
+    first_version, second_version = (tmp_path / "cache").iterdir()
+    assert first_version != second_version
+
+
+def test_cache_key_depends_on_content_and_jinja_version():
+    key = template_cache.template_cache_key("main.tf.j2", "a", "3.1.6")
+    assert key == template_cache.template_cache_key("main.tf.j2", "a", "3.1.6")
+    assert key != template_cache.template_cache_key("main.tf.j2", "b", "3.1.6")
+    assert key != template_cache.template_cache_key("main.tf.j2", "a", "3.2.0")
+
+
+def test_eviction_removes_least_recently_used(tmp_path):
+    cache = template_cache.TemplateBytecodeCache(tmp_path, max_bytes=25)
+    for age, name in enumerate(["old", "recent", "newest"]):
+        path = tmp_path / f"{name}{template_cache.CACHE_FILE_SUFFIX}"
+        path.write_bytes(b"x" * 10)
+        os.utime(path, (1000 + age, 1000 + age))
+
+    cache.evict()
+    remaining = sorted(p.stem for p in tmp_path.iterdir())
+    assert remaining == ["newest", "recent"]
+
+
+def test_unwritable_cache_still_renders(tmp_path, templates_dir):
+    blocker = tmp_path / "cache"
+    blocker.write_text("not a directory")
+    cache = template_cache.TemplateBytecodeCache(blocker)
+    environment = make_environment(templates_dir, cache)
+    assert environment.get_template("main.tf.j2").render(name="a") == 'name = "a"'
@@ -1,8 +1,23 @@
+import subprocess
+import time
 from unittest import mock
 
 import pytest
 
 import cli.terraform_utils as tf_utils
+from cli import locks
+from cli.adaptive_parallelism import remembered_parallelism
+
+FAKE_TF_ENV = {"TF_PLUGIN_CACHE_DIR": "/cache"}
+PARALLELISM = 16
+
+
+@pytest.fixture(autouse=True)
+def fake_plugin_cache(monkeypatch):
+    monkeypatch.setattr(tf_utils, "terraform_env", lambda: FAKE_TF_ENV)
+    record_lookups = mock.Mock()
+    monkeypatch.setattr(tf_utils, "record_lookups", record_lookups)
+    return record_lookups
 
 
 @pytest.fixture
@@ -11,24 +26,48 @@ def fake_env_path(tmp_path):
 
 
 def test_terraform_init_calls_run_cmd(fake_env_path):
-    with mock.patch("cli.terraform_utils.run_cmd") as run_cmd:
+    with mock.patch("cli.terraform_utils.run_cmd_async") as run_cmd:
         tf_utils.terraform_init(fake_env_path, dry_run=True)
         run_cmd.assert_called_once_with(
             ["terraform", "init", "-input=false"],
             cwd=fake_env_path,
             dry_run=True,
             capture_output=True,
+            env=FAKE_TF_ENV,
+            timeout=None,
         )
 
 
+@pytest.mark.parametrize("cache_hit", [False, True])
+def test_terraform_init_holds_cache_lock_only_on_miss(
+    fake_env_path, fake_plugin_cache, cache_hit
+):
+    fake_plugin_cache.return_value = cache_hit
+    held = []
+
+    async def fake_run_cmd(*_args, **_kwargs):
+        try:
+            with locks.file_lock(tf_utils.PLUGIN_CACHE_LOCK_NAME, wait=False):
+                held.append(False)
+        except locks.LockBusyError:
+            held.append(True)
+
+    with mock.patch("cli.terraform_utils.run_cmd_async", fake_run_cmd):
+        tf_utils.terraform_init(fake_env_path)
+
+    assert held == [not cache_hit]
+
+
 def test_terraform_validate_calls_run_cmd(fake_env_path):
-    with mock.patch("cli.terraform_utils.run_cmd") as run_cmd:
+    with mock.patch("cli.terraform_utils.run_cmd_async") as run_cmd:
         tf_utils.terraform_validate(fake_env_path, dry_run=False)
         run_cmd.assert_called_once_with(
             ["terraform", "validate"],
             cwd=fake_env_path,
             dry_run=False,
             capture_output=True,
+            env=FAKE_TF_ENV,
+            timeout=None,
         )
 
 
@@ -40,13 +79,15 @@ def test_terraform_validate_calls_run_cmd(fake_env_path):
     ],
 )
 def test_terraform_plan_calls_run_cmd(fake_env_path, destroy, expected_cmd):
-    with mock.patch("cli.terraform_utils.run_cmd") as run_cmd:
+    with mock.patch("cli.terraform_utils.run_cmd_async") as run_cmd:
         tf_utils.terraform_plan(fake_env_path, destroy=destroy, dry_run=True)
         run_cmd.assert_called_once_with(
             expected_cmd,
             cwd=fake_env_path,
             dry_run=True,
             capture_output=False,
+            env=FAKE_TF_ENV,
+            timeout=None,
         )
 
 
@@ -58,13 +99,16 @@ def test_terraform_plan_calls_run_cmd(fake_env_path, destroy, expected_cmd):
     ],
 )
 def test_terraform_apply_calls_run_cmd(fake_env_path, destroy, expected_cmd):
-    with mock.patch("cli.terraform_utils.run_cmd") as run_cmd:
+    with mock.patch("cli.terraform_utils.run_cmd_async") as run_cmd:
         tf_utils.terraform_apply(fake_env_path, destroy=destroy, dry_run=False)
         run_cmd.assert_called_once_with(
             expected_cmd,
             cwd=fake_env_path,
             dry_run=False,
             capture_output=False,
+            env=FAKE_TF_ENV,
+            timeout=None,
+            on_line=None,
         )
 
 
@@ -122,32 +166,358 @@ def test_terraform_state_has_changes_dry_run(
         cwd=fake_env_path,
         dry_run=True,
         capture_output=False,
+        env=FAKE_TF_ENV,
     )
 
 
 def test_terraform_plan_returns_run_cmd_result(fake_env_path):
     fake_result = object()
-    with mock.patch("cli.terraform_utils.run_cmd", return_value=fake_result):
+    with mock.patch("cli.terraform_utils.run_cmd_async", return_value=fake_result):
         result = tf_utils.terraform_plan(fake_env_path, destroy=False, dry_run=False)
         assert result is fake_result
 
 
 def test_terraform_apply_returns_run_cmd_result(fake_env_path):
     fake_result = object()
-    with mock.patch("cli.terraform_utils.run_cmd", return_value=fake_result):
+    with mock.patch("cli.terraform_utils.run_cmd_async", return_value=fake_result):
         result = tf_utils.terraform_apply(fake_env_path, destroy=True, dry_run=True)
         assert result is fake_result
 
 
 def test_terraform_init_returns_run_cmd_result(fake_env_path):
     fake_result = object()
-    with mock.patch("cli.terraform_utils.run_cmd", return_value=fake_result):
+    with mock.patch("cli.terraform_utils.run_cmd_async", return_value=fake_result):
         result = tf_utils.terraform_init(fake_env_path, dry_run=False)
         assert result is fake_result
 
 
 def test_terraform_validate_returns_run_cmd_result(fake_env_path):
     fake_result = object()
-    with mock.patch("cli.terraform_utils.run_cmd", return_value=fake_result):
+    with mock.patch("cli.terraform_utils.run_cmd_async", return_value=fake_result):
         result = tf_utils.terraform_validate(fake_env_path, dry_run=True)
         assert result is fake_result
+
+
+def test_terraform_plan_saves_plan_file(fake_env_path):
+    with mock.patch("cli.terraform_utils.run_cmd_async") as run_cmd:
+        tf_utils.terraform_plan(fake_env_path, plan_file="env/infrabox.tfplan")
+        run_cmd.assert_called_once_with(
+            ["terraform", "plan", "-detailed-exitcode", "-out=env/infrabox.tfplan"],
+            cwd=fake_env_path,
+            dry_run=False,
+            capture_output=False,
+            env=FAKE_TF_ENV,
+            timeout=None,
+        )
+
+
+def test_terraform_plan_targets(fake_env_path):
+    with mock.patch("cli.terraform_utils.run_cmd_async") as run_cmd:
+        tf_utils.terraform_plan(
+            fake_env_path,
+            plan_file="env/infrabox.tfplan",
+            targets=["module.networking", "module.storage_account"],
+        )
+        assert run_cmd.call_args.args[0] == [
+            "terraform",
+            "plan",
+            "-detailed-exitcode",
+            "-out=env/infrabox.tfplan",
+            "-target=module.networking",
+            "-target=module.storage_account",
+        ]
+
+
+def test_terraform_plan_without_refresh(fake_env_path):
+    with mock.patch("cli.terraform_utils.run_cmd_async") as run_cmd:
+        tf_utils.terraform_plan(fake_env_path, refresh=False)
+        assert run_cmd.call_args.args[0] == [
+            "terraform",
+            "plan",
+            "-detailed-exitcode",
+            "-refresh=false",
+        ]
+
+
+def test_terraform_plan_refresh_only(fake_env_path):
+    with mock.patch("cli.terraform_utils.run_cmd_async") as run_cmd:
+        timeout = 30
+        tf_utils.terraform_plan(fake_env_path, timeout=timeout, refresh_only=True)
+        assert run_cmd.call_args.args[0] == [
+            "terraform",
+            "plan",
+            "-detailed-exitcode",
+            "-refresh-only",
+        ]
+        assert run_cmd.call_args.kwargs["timeout"] == timeout
+
+
+@pytest.mark.parametrize(
+    "age, ttl, expected",
+    [
+        (None, 300, (True, "full refresh (never refreshed)")),
+        (60, 300, (False, "without refresh: state was fully refreshed 60s ago")),
+        (600, 300, (True, "full refresh (last refreshed 600s ago)")),
+        (60, None, (True, "Planning with a full refresh.")),
+    ],
+)
+def test_plan_refresh_mode(capsys, fake_env_path, age, ttl, expected):
+    expected_refresh, expected_output = expected
+    if age is not None:
+        tf_utils.record_full_refresh(fake_env_path, when=time.time() - age)
+
+    assert tf_utils.plan_refresh_mode(fake_env_path, ttl) is expected_refresh
+    assert expected_output in capsys.readouterr().out
+
+
+@pytest.mark.parametrize(
+    "returncode, targets, recorded",
+    [
+        (tf_utils.TERRAFORM_CHANGES_DETECTED_CODE, None, True),
+        (tf_utils.TERRAFORM_NO_CHANGES_DETECTED_CODE, None, True),
+        (1, None, False),
+        (tf_utils.TERRAFORM_CHANGES_DETECTED_CODE, ["module.networking"], False),
+    ],
+)
+def test_terraform_plan_status_records_full_refresh(
+    fake_env_path, returncode, targets, recorded
+):
+    result = mock.Mock(returncode=returncode)
+    with mock.patch("cli.terraform_utils.terraform_plan", return_value=result):
+        tf_utils.terraform_plan_status(fake_env_path, targets=targets)
+
+    assert (tf_utils.last_full_refresh(fake_env_path) is not None) is recorded
+
+
+def test_terraform_plan_status_skips_refresh_within_ttl(fake_env_path):
+    tf_utils.record_full_refresh(fake_env_path, when=time.time() - 10)
+    result = mock.Mock(returncode=tf_utils.TERRAFORM_CHANGES_DETECTED_CODE)
+    with mock.patch(
+        "cli.terraform_utils.terraform_plan", return_value=result
+    ) as terraform_plan:
+        tf_utils.terraform_plan_status(fake_env_path, refresh_ttl=300)
+
+    assert terraform_plan.call_args.kwargs["refresh"] is False
+
+
+def test_module_targets(tmp_path):
+    (tmp_path / "main.tf").write_text(
+        'module "networking" {\n  source = "../x"\n}\n'
+        '  module "storage_account" {}\n# module "commented" is not declared\n'
+    )
+
+    assert tf_utils.declared_modules(tmp_path) == ["networking", "storage_account"]
+    assert tf_utils.module_targets(
+        tmp_path, ["storage_account", "storage_account"]
+    ) == ["module.storage_account"]
+    with pytest.raises(ValueError, match="Unknown module"):
+        tf_utils.module_targets(tmp_path, ["virtual_machine"])
+
+
+@pytest.mark.parametrize("destroy", [False, True])
+def test_terraform_apply_uses_saved_plan(fake_env_path, destroy):
+    result = mock.Mock(returncode=0)
+    with mock.patch(
+        "cli.terraform_utils.run_cmd_async", return_value=result
+    ) as run_cmd:
+        tf_utils.terraform_apply(
+            fake_env_path, destroy=destroy, plan_file="env/infrabox.tfplan"
+        )
+        run_cmd.assert_called_once_with(
+            ["terraform", "apply", "-input=false", "env/infrabox.tfplan"],
+            cwd=fake_env_path,
+            dry_run=False,
+            capture_output=False,
+            env=FAKE_TF_ENV,
+            timeout=None,
+            on_line=None,
+        )
+
+
+def test_terraform_parallelism_options(fake_env_path):
+    with mock.patch("cli.terraform_utils.run_cmd_async") as run_cmd:
+        tf_utils.terraform_plan(fake_env_path, plan_file="p", parallelism=4)
+        assert run_cmd.call_args.args[0] == [
+            "terraform",
+            "plan",
+            "-detailed-exitcode",
+            "-out=p",
+            "-parallelism=4",
+        ]
+        tf_utils.terraform_apply(fake_env_path, plan_file="p", parallelism=4)
+        assert run_cmd.call_args.args[0] == [
+            "terraform",
+            "apply",
+            "-input=false",
+            "-parallelism=4",
+            "p",
+        ]
+
+
+def test_terraform_apply_adapts_parallelism(capsys, fake_env_path):
+    async def throttled_apply(cmd, **kwargs):
+        kwargs["on_line"]("Error: retrying after 429 Too Many Requests\n")
+        kwargs["on_line"]("module.networking: Creation complete\n")
+        return mock.Mock(returncode=0, cmd=cmd)
+
+    with mock.patch("cli.terraform_utils.run_cmd_async", throttled_apply):
+        result = tf_utils.terraform_apply(
+            fake_env_path, plan_file="p", parallelism=16, adaptive_parallelism=True
+        )
+
+    assert "-parallelism=16" in result.cmd
+    assert "next run uses -parallelism=8 (was 16)" in capsys.readouterr().out
+    assert remembered_parallelism(fake_env_path) == 16 // 2
+
+
+def test_terraform_apply_keeps_parallelism_after_failure(capsys, fake_env_path):
+    failed = mock.Mock(returncode=1)
+    with mock.patch("cli.terraform_utils.run_cmd_async", return_value=failed):
+        tf_utils.terraform_apply(
+            fake_env_path, parallelism=PARALLELISM, adaptive_parallelism=True
+        )
+
+    assert "next run uses" not in capsys.readouterr().out
+    assert remembered_parallelism(fake_env_path) == PARALLELISM
+
+
+def test_terraform_apply_discards_stale_plan(capsys, tmp_path):
+    plan_file = tmp_path / tf_utils.PLAN_FILE_NAME
+    plan_file.write_text("plan")
+    result = mock.Mock(returncode=1)
+    with mock.patch("cli.terraform_utils.run_cmd_async", return_value=result):
+        tf_utils.terraform_apply(tmp_path, plan_file=str(plan_file))
+    assert not plan_file.exists()
+    assert "stale" in capsys.readouterr().out
+
+
+def test_discard_plan_missing_file_is_noop(tmp_path):
+    tf_utils.discard_plan(str(tmp_path / "missing.tfplan"))
+    tf_utils.discard_plan(None)
+
+
+@pytest.fixture
+def initialized_env(tmp_path):
+    module_dir = tmp_path / "modules" / "networking"
+    module_dir.mkdir(parents=True)
+    (module_dir / "main.tf").write_text('resource "x" "y" {}')
+    env_path = tmp_path / "environments" / "dev"
+    env_path.mkdir(parents=True)
+    (env_path / "main.tf").write_text(
+        'module "networking" {\n  source = "../../modules/networking"\n}\n'
+    )
+    (env_path / "provider.tf").write_text('provider "azurerm" {}')
+    (env_path / ".terraform.lock.hcl").write_text("# lock")
+    (env_path / ".terraform" / "providers").mkdir(parents=True)
+    (env_path / ".terraform" / "modules").mkdir()
+    (env_path / ".terraform" / "modules" / "modules.json").write_text("{}")
+    return env_path
+
+
+def test_module_sources(initialized_env):
+    assert tf_utils.module_sources(initialized_env) == ["../../modules/networking"]
+
+
+def test_init_fingerprint_tracks_module_tree(initialized_env):
+    before = tf_utils.init_fingerprint(initialized_env)
+    assert tf_utils.init_fingerprint(initialized_env) == before
+    module_file = initialized_env.parent.parent / "modules" / "networking" / "main.tf"
+    module_file.write_text('resource "x" "z" {}')
+    assert tf_utils.init_fingerprint(initialized_env) != before
+
+
+def test_terraform_dir_intact(initialized_env):
+    assert tf_utils.terraform_dir_intact(initialized_env) is True
+    (initialized_env / ".terraform" / "modules" / "modules.json").unlink()
+    assert tf_utils.terraform_dir_intact(initialized_env) is False
+
+
+def test_terraform_init_if_needed_skips_when_unchanged(initialized_env, capsys):
+    result = mock.Mock(returncode=0)
+    with mock.patch("cli.terraform_utils.terraform_init", return_value=result) as init:
+        assert tf_utils.terraform_init_if_needed(initialized_env) is result
+        assert tf_utils.terraform_init_if_needed(initialized_env) is None
+        init.assert_called_once_with(initialized_env, dry_run=False, timeout=None)
+    assert "Skipping terraform init" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("change", ["force", "lock_file", "terraform_dir"])
+def test_terraform_init_if_needed_reruns(initialized_env, change):
+    result = mock.Mock(returncode=0)
+    with mock.patch("cli.terraform_utils.terraform_init", return_value=result) as init:
+        tf_utils.terraform_init_if_needed(initialized_env)
+        if change == "lock_file":
+            (initialized_env / ".terraform.lock.hcl").write_text("# updated")
+        elif change == "terraform_dir":
+            (initialized_env / ".terraform" / "providers").rmdir()
+        tf_utils.terraform_init_if_needed(initialized_env, force=change == "force")
+        assert (
+            init.call_args_list
+            == [mock.call(initialized_env, dry_run=False, timeout=None)] * 2
+        )
+
+
+def test_terraform_init_if_needed_failed_init_not_recorded(initialized_env):
+    with mock.patch(
+        "cli.terraform_utils.terraform_init", return_value=mock.Mock(returncode=1)
+    ) as init:
+        tf_utils.terraform_init_if_needed(initialized_env)
+        tf_utils.terraform_init_if_needed(initialized_env)
+        assert (
+            init.call_args_list
+            == [mock.call(initialized_env, dry_run=False, timeout=None)] * 2
+        )
+
+
+def test_terraform_init_records_plugin_cache_lookups(fake_env_path, fake_plugin_cache):
+    with mock.patch("cli.terraform_utils.run_cmd_async"):
+        tf_utils.terraform_init(fake_env_path)
+        tf_utils.terraform_init(fake_env_path, dry_run=True)
+    fake_plugin_cache.assert_called_once_with(fake_env_path)
+
+
+def fake_json_command(returncode, output=b"", stderr=""):
+    calls = []
+
+    async def run(cmd, **kwargs):
+        calls.append((cmd, kwargs))
+        kwargs["stdout"].write(output)
+        return subprocess.CompletedProcess(cmd, returncode, stdout="", stderr=stderr)
+
+    return run, calls
+
+
+def test_terraform_output_json(fake_env_path):
+    run, calls = fake_json_command(0, b'{"vm_public_ip": {"value": "20.1.2.3"}}')
+    with mock.patch("cli.terraform_utils.run_cmd_async", run):
+        outputs = tf_utils.terraform_output_json(fake_env_path)
+
+    assert outputs == {"vm_public_ip": {"value": "20.1.2.3"}}
+    [(cmd, kwargs)] = calls
+    assert cmd == ["terraform", "output", "-json"]
+    assert kwargs["cwd"] == fake_env_path
+
+
+def test_terraform_output_json_failure(fake_env_path):
+    run, _calls = fake_json_command(1, stderr="Error: no state\n")
+    with mock.patch("cli.terraform_utils.run_cmd_async", run), pytest.raises(
+        RuntimeError, match="exited with code 1: Error: no state"
+    ):
+        tf_utils.terraform_output_json(fake_env_path)
+
+
+def test_terraform_show_json_streams_the_plan(fake_env_path):
+    run, calls = fake_json_command(0, b'{"resource_changes": []}')
+    with mock.patch(
+        "cli.terraform_utils.run_cmd_async", run
+    ), tf_utils.terraform_show_json(fake_env_path, "p") as stream:
+        assert stream.read() == '{"resource_changes": []}'
+    assert calls[0][0] == ["terraform", "show", "-json", "p"]
+
+
+def test_terraform_show_json_failure(fake_env_path):
+    run, _calls = fake_json_command(1)
+    with mock.patch("cli.terraform_utils.run_cmd_async", run), pytest.raises(
+        RuntimeError, match="terraform show exited with code 1"
+    ), tf_utils.terraform_show_json(fake_env_path, "p"):
+        pass
@@ -0,0 +1,157 @@
+import io
+import json
+
+from cli import tfstate
+
+
+def test_read_state_identity(tmp_path):
+    state_file = tmp_path / tfstate.STATE_FILE_NAME
+    state_file.write_text(
+        json.dumps(
+            {
+                "version": 4,
+                "serial": 12,
+                "lineage": "3f2a",
+                "resources": [{"type": "azurerm_resource_group"}],
+            }
+        )
+    )
+
+    assert tfstate.read_state_identity(state_file) == ("3f2a", 12)
+
+
+def test_read_state_identity_stops_after_the_head(tmp_path):
+    state_file = tmp_path / tfstate.STATE_FILE_NAME
+    # Anything after the identity is never read, even if it is truncated
+    state_file.write_text(
+        '{"version": 4, "lineage": "3f2a", "serial": 1, "resources": ['
+    )
+
+    assert tfstate.read_state_identity(state_file) == ("3f2a", 1)
+
+
+STATE = {
+    "version": 4,
+    "serial": 7,
+    "lineage": "3f2a",
+    "outputs": {},
+    "resources": [
+        {
+            "mode": "managed",
+            "type": "azurerm_resource_group",
+            "name": "main",
+            "provider": 'provider["registry.terraform.io/hashicorp/azurerm"]',
+            "instances": [{"schema_version": 0, "attributes": {"name": "rg-dev"}}],
+        },
+        {
+            "module": "module.networking",
+            "mode": "managed",
+            "type": "azurerm_subnet",
+            "name": "subnet",
+            "provider": 'provider["registry.terraform.io/hashicorp/azurerm"]',
+            "instances": [
+                {"index_key": 0, "attributes": {"address_prefixes": ["10.0.1.0/24"]}},
+                {"index_key": "b", "attributes": {"address_prefixes": ["10.0.2.0/24"]}},
+            ],
+        },
+        {
+            "module": "module.vm",
+            "mode": "data",
+            "type": "azurerm_image",
+            "name": "ubuntu",
+            "provider": 'provider["registry.terraform.io/hashicorp/azurerm"]',
+            "instances": [
+                {
+                    "attributes": {
+                        "admin_password": "hunter2",
+                        "location": "westeurope",
+                    },
+                    "sensitive_attributes": [
+                        [{"type": "get_attr", "value": "admin_password"}]
+                    ],
+                }
+            ],
+        },
+    ],
+}
+
+
+def write_state(env_path, state=None):
+    (env_path / tfstate.STATE_FILE_NAME).write_text(json.dumps(state or STATE))
+
+
+def test_resource_addresses(tmp_path):
+    write_state(tmp_path)
+
+    assert tfstate.resource_addresses(tmp_path) == [
+        "azurerm_resource_group.main",
+        "module.networking.azurerm_subnet.subnet[0]",
+        'module.networking.azurerm_subnet.subnet["b"]',
+        "module.vm.data.azurerm_image.ubuntu",
+    ]
+    assert tfstate.resource_addresses(tmp_path, module="module.vm") == [
+        "module.vm.data.azurerm_image.ubuntu"
+    ]
+    assert tfstate.resource_addresses(
+        tmp_path, resource_type="azurerm_resource_group"
+    ) == ["azurerm_resource_group.main"]
+
+
+def test_module_addresses(tmp_path):
+    write_state(tmp_path)
+
+    assert tfstate.module_addresses(tmp_path) == ["module.networking", "module.vm"]
+
+
+def test_iter_resources_skips_attributes_unless_asked(tmp_path):
+    write_state(tmp_path)
+
+    assert all("attributes" not in r for r in tfstate.iter_resources(tmp_path))
+    with_attributes = list(tfstate.iter_resources(tmp_path, attributes=True))
+    assert with_attributes[0]["attributes"] == {"name": "rg-dev"}
+    assert with_attributes[3]["sensitive"] == ["admin_password"]
+
+
+def test_show_resource_decodes_only_the_requested_instance(tmp_path):
+    write_state(tmp_path)
+
+    instance = tfstate.show_resource(
+        tmp_path, 'module.networking.azurerm_subnet.subnet["b"]'
+    )
+
+    assert instance["attributes"] == {"address_prefixes": ["10.0.2.0/24"]}
+    assert instance["module"] == "module.networking"
+    assert instance["index_key"] == "b"
+    assert tfstate.show_resource(tmp_path, "azurerm_subnet.missing") is None
+
+
+def test_iter_state_resources_reads_in_small_chunks():
+    stream = io.StringIO(json.dumps(STATE))
+
+    addresses = [
+        r["address"] for r in tfstate.iter_state_resources(stream, chunk_size=16)
+    ]
+
+    whole = io.StringIO(json.dumps(STATE))
+    assert addresses == [r["address"] for r in tfstate.iter_state_resources(whole)]
+    assert len(addresses) == len(set(addresses))
+
+
+def test_deposed_objects_get_their_own_address(tmp_path):
+    state = json.loads(json.dumps(STATE))
+    state["resources"][0]["instances"].append(
+        {"deposed": "00a1b2c3", "attributes": {"name": "rg-dev-old"}}
+    )
+    write_state(tmp_path, state)
+
+    addresses = tfstate.resource_addresses(
+        tmp_path, resource_type="azurerm_resource_group"
+    )
+    deposed = "azurerm_resource_group.main (deposed object 00a1b2c3)"
+    assert addresses == ["azurerm_resource_group.main", deposed]
+    current = tfstate.show_resource(tmp_path, "azurerm_resource_group.main")
+    assert current["attributes"] == {"name": "rg-dev"}
+    assert current["deposed"] is None
+    old = tfstate.show_resource(tmp_path, deposed)
+    assert old["attributes"] == {"name": "rg-dev-old"}
+    assert old["deposed"] == "00a1b2c3"
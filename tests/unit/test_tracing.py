@@ -0,0 +1,110 @@
+import json
+import threading
+
+import pytest
+
+from cli import tracing
+
+
+@pytest.fixture(autouse=True)
+def reset_tracing():
+    yield
+    tracing.stop_tracing()
+
+
+def test_span_is_noop_when_tracing_is_off():
+    with tracing.span("terraform init", "dev"):
+        pass
+    assert tracing.stop_tracing() == []
+
+
+def test_span_records_nested_phases():
+    tracing.start_tracing()
+    with tracing.span("create"), tracing.span("terraform plan", "dev"):
+        pass
+    spans = tracing.stop_tracing()
+
+    assert [s["name"] for s in spans] == ["terraform plan", "create"]
+    inner, outer = spans
+    assert inner["environment"] == "dev"
+    assert outer["environment"] is None
+    assert outer["start_ns"] <= inner["start_ns"]
+    assert outer["duration_ns"] >= inner["duration_ns"]
+
+
+def test_span_records_failed_phase():
+    tracing.start_tracing()
+    with pytest.raises(RuntimeError), tracing.span("terraform apply", "dev"):
+        raise RuntimeError("apply failed")
+    assert [s["name"] for s in tracing.stop_tracing()] == ["terraform apply"]
+
+
+def test_span_defaults_to_thread_output_prefix(monkeypatch):
+    monkeypatch.setattr(tracing, "get_output_prefix", lambda: "stage")
+    tracing.start_tracing()
+    with tracing.span("terraform validate"):
+        pass
+    assert tracing.stop_tracing()[0]["environment"] == "stage"
+
+
+def test_write_trace_emits_chrome_trace_events(tmp_path):
+    tracing.start_tracing()
+    with tracing.span("create"):
+
+        def plan_stage():
+            with tracing.span("terraform plan", "stage"):
+                pass
+
+        worker = threading.Thread(target=plan_stage)
+        worker.start()
+        worker.join()
+        with tracing.span("terraform init", "dev"):
+            pass
+    trace_file = tmp_path / "trace.json"
+    tracing.write_trace(tracing.stop_tracing(), trace_file)
+
+    trace = json.loads(trace_file.read_text())
+    events = {e["name"]: e for e in trace["traceEvents"]}
+    assert events["terraform init"]["ph"] == "X"
+    assert events["terraform init"]["args"] == {"environment": "dev"}
+    assert events["terraform init"]["dur"] >= 0
+    assert events["terraform plan"]["tid"] != events["terraform init"]["tid"]
+    thread_names = {
+        e["tid"]: e["args"]["name"] for e in trace["traceEvents"] if e["ph"] == "M"
+    }
+    assert thread_names[events["terraform plan"]["tid"]] == "stage"
+    assert thread_names[events["terraform init"]["tid"]] == "dev"
+
+
+def test_print_phase_table_totals_by_phase_and_environment(capsys):
+    spans = [
+        {
+            "name": "terraform plan",
+            "environment": "dev",
+            "start_ns": 0,
+            "duration_ns": 1_000_000_000,
+            "thread": 1,
+        },
+        {
+            "name": "terraform plan",
+            "environment": "dev",
+            "start_ns": 5,
+            "duration_ns": 500_000_000,
+            "thread": 1,
+        },
+        {
+            "name": "confirmation",
+            "environment": None,
+            "start_ns": 9,
+            "duration_ns": 250_000_000,
+            "thread": 1,
+        },
+    ]
+    assert tracing.phase_durations(spans) == [
+        ("terraform plan", "dev", 2, 1.5),
+        ("confirmation", "", 1, 0.25),
+    ]
+    tracing.print_phase_table(spans)
+    out = capsys.readouterr().out
+    assert "Phase timings" in out
+    assert "terraform plan  dev              2    1.500" in out
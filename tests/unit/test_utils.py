@@ -1,6 +1,7 @@
 import os
 import re
-import types
+import sys
+from unittest import mock
 
 import pytest
 
@@ -111,13 +112,16 @@ def test_check_cidr_overlap_with_overlap(tmp_path):
     assert "overlaps" in str(e.value)
 
 
-def test_run_cmd_normal(monkeypatch, tmp_path):
-    fake_result = types.SimpleNamespace(stdout="output", returncode=0)
-    monkeypatch.setattr("subprocess.run", lambda *_a, **_k: fake_result)
+def test_run_cmd_normal(tmp_path, capsys):
     result = utils.run_cmd(
-        ["echo", "hi"], str(tmp_path), dry_run=False, capture_output=True
+        [sys.executable, "-c", "print('output')"],
+        str(tmp_path),
+        dry_run=False,
+        capture_output=True,
     )
-    assert result.stdout == "output"
+    assert result.returncode == 0
+    assert result.stdout == "output\n"
+    assert "output" in capsys.readouterr().out
 
 
 def test_run_cmd_dry_run(capsys, tmp_path):
@@ -127,13 +131,16 @@ def test_run_cmd_dry_run(capsys, tmp_path):
     assert result is None
 
 
-def test_run_cmd_capture_output_false(monkeypatch, tmp_path):
-    fake_result = types.SimpleNamespace(stdout="output", returncode=0)
-    monkeypatch.setattr("subprocess.run", lambda *_a, **_k: fake_result)
+def test_run_cmd_capture_output_false(tmp_path):
     result = utils.run_cmd(
-        ["echo", "hi"], str(tmp_path), dry_run=False, capture_output=False
+        [sys.executable, "-c", "print('output')"],
+        str(tmp_path),
+        dry_run=False,
+        capture_output=False,
     )
-    assert result.stdout == "output"
+    assert result.returncode == 0
+    assert result.stdout is None
+    assert not (tmp_path / ".infrabox").exists()
 
 
 def test_prompt_input_normal(monkeypatch):
@@ -169,3 +176,39 @@ def test_prompt_with_default_default(monkeypatch):
 def test_prompt_user_confirmation(monkeypatch, user_input, default, expected):
     monkeypatch.setattr("builtins.input", lambda _prompt: user_input)
     assert utils.prompt_user_confirmation("Proceed?", default=default) == expected
+
+
+def test_prompts_read_from_the_thread_console(monkeypatch):
+    monkeypatch.setattr("builtins.input", lambda _prompt: pytest.fail("not a tty"))
+    console = mock.Mock()
+    console.input.return_value = "yes"
+    utils.set_console(console)
+    try:
+        assert utils.prompt_user_confirmation("Proceed?") is True
+    finally:
+        utils.set_console(None)
+    console.input.assert_called_once_with("Proceed? [y/N]: ")
+
+
+def test_warm_cidr_registry_is_reused_and_refreshed(monkeypatch, tmp_path):
+    monkeypatch.setattr(utils, "_warm_registries", None)
+    utils.keep_cidr_registries_warm()
+    registry = utils.load_cidr_registry(tmp_path)
+    (tmp_path / "dev").mkdir()
+    (tmp_path / "dev" / "main.tf").write_text('vnet_cidr = "10.9.0.0/16"\n')
+
+    assert utils.load_cidr_registry(tmp_path) is registry
+    with pytest.raises(ValueError, match=re.escape("overlaps with 10.9.0.0/16")):
+        utils.check_cidr_overlap("10.9.1.0/24", "stage", tmp_path)
+
+
+def test_run_cmd_streams_passthrough_output_when_prefixed(tmp_path, capsys):
+    utils.set_output_prefix("dev")
+    try:
+        result = utils.run_cmd(
+            [sys.executable, "-c", "print('hi')"], str(tmp_path), capture_output=False
+        )
+    finally:
+        utils.set_output_prefix(None)
+    assert result.stdout == "hi\n"
+    assert "hi" in capsys.readouterr().out